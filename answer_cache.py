@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+from metrics import ANSWER_CACHE_BYTES, ANSWER_CACHE_LOOKUPS
+
+
+class _Entry:
+    def __init__(self, text, generation_s):
+        self.text = text
+        self.generation_s = generation_s
+        self.size = len(text.encode("utf-8"))
+
+
+class AnswerCache:
+    """Finished Markdown answers by fingerprint, least recently used evicted past max_bytes.
+
+    Entries belong to one ingest version - the first lookup with a new version drops
+    everything, since a refresh can change any answer. Per worker, like the other caches.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, max_entry_bytes=64 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.version = None
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                ANSWER_CACHE_LOOKUPS.labels("invalidated").inc(len(self._entries))
+            self._entries.clear()
+            self.bytes = 0
+            self.version = version
+            ANSWER_CACHE_BYTES.set(0)
+
+    def get(self, key, version):
+        """The cached entry (text, generation_s) or None."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                ANSWER_CACHE_LOOKUPS.labels("miss").inc()
+                return None
+            self._entries.move_to_end(key)
+            ANSWER_CACHE_LOOKUPS.labels("hit").inc()
+            return entry
+
+    def put(self, key, text, generation_s, version):
+        if not text or len(text.encode("utf-8")) > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            entry = self._entries[key] = _Entry(text, generation_s)
+            self.bytes += entry.size
+            ANSWER_CACHE_LOOKUPS.labels("stored").inc()
+            while self.bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+                ANSWER_CACHE_LOOKUPS.labels("evicted").inc()
+            ANSWER_CACHE_BYTES.set(self.bytes)
@@ -0,0 +1,99 @@
+"""Batch throughput of the JSON /ask endpoint.
+
+Boots the Flask app against a local DuckDB file loaded from the CSVs under data/, swaps
+Gemini for the fake chat model and POSTs one batch of questions per batch concurrency
+level. --duplicates repeats each distinct question, which the batch answers only once.
+
+    python -m benchmarks.ask_batch --batch 32 --concurrency 1 2 4 8
+    python -m benchmarks.ask_batch --batch 32 --duplicates 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.chat_latency import DEFAULT_QUESTIONS, REPO_DIR, build_local_db, git_commit, percentile
+
+
+def batch_questions(size, duplicates):
+    # numbered variants of the default questions, so only --duplicates makes them repeat
+    distinct = max(1, size // duplicates)
+    questions = [f"{DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)]} (#{i})" for i in range(distinct)]
+    return [questions[i % distinct] for i in range(size)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=32, help="questions per /ask request")
+    parser.add_argument("--duplicates", type=int, default=1, help="copies of each distinct question in the batch")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--tool-call-latency", type=float, default=0.5, help="fake SQL-generation latency (s)")
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    db_path = Path(tempfile.mkdtemp()) / "fbref_ask.duckdb"
+    build_local_db(db_path)
+
+    # chatbot reads its config at import - give the scheduler room for the largest level
+    os.environ["DUCKDB_PATH"] = str(db_path)
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.environ["LLM_MAX_CONCURRENCY"] = str(max(args.concurrency))
+    os.environ["ASK_MAX_BATCH"] = str(args.batch)
+    sys.path.insert(0, str(REPO_DIR))
+    import chatbot
+    from benchmarks.fake_llm import FakeChatModel
+
+    chatbot.init_app(FakeChatModel(
+        tool_call_latency=args.tool_call_latency,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+    ))
+    server = make_server("127.0.0.1", 0, chatbot.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    questions = batch_questions(args.batch, args.duplicates)
+    results = {}
+    for concurrency in args.concurrency:
+        chatbot.ASK_BATCH_CONCURRENCY = concurrency
+        chatbot.ask_executor = None
+        start = time.perf_counter()
+        response = requests.post(f"{base_url}/ask", json={"questions": questions}, timeout=600)
+        wall = time.perf_counter() - start
+        response.raise_for_status()
+        answers = response.json()["answers"]
+        totals = [a["timings"]["total_ms"] for a in answers if not a["shared"]]
+        results[concurrency] = {
+            "wall_s": round(wall, 3),
+            "questions_per_s": round(len(questions) / wall, 2),
+            "answered": sum(1 for a in answers if "answer" in a),
+            "errors": sum(1 for a in answers if "error" in a),
+            "shared": sum(1 for a in answers if a["shared"]),
+            "question_p50_ms": percentile(totals, 50),
+            "question_p99_ms": percentile(totals, 99),
+        }
+        r = results[concurrency]
+        print(f"concurrency {concurrency:>3}: {r['answered']}/{len(questions)} answered in {r['wall_s']} s "
+              f"({r['questions_per_s']} q/s, {r['shared']} shared), per question p50 {r['question_p50_ms']} ms "
+              f"p99 {r['question_p99_ms']} ms")
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
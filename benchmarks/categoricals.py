@@ -0,0 +1,118 @@
+"""Storage size and query latency of ENUM vs VARCHAR categorical columns.
+
+Builds the five-league DuckDB file of benchmarks.similarity_search (--copies scales the
+rows), then two copies of every stats table: one with team / nation / position /
+competition / season as plain VARCHAR, one encoded by categoricals.encode_categoricals.
+Reports the storage each file uses and the latency of the filter / group-by / join
+shapes the generated SQL uses across all leagues.
+
+    python -m benchmarks.categoricals --copies 20 --repeats 30
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+
+from benchmarks.chat_latency import git_commit, percentile
+from benchmarks.similarity_search import build_league_db
+from categoricals import CATEGORICAL_TYPES, encode_categoricals, quote
+from query_templates import TABLE_NAME_RE
+from scraping_functions.standardized_scraping_function import LEAGUE_ID_MAP
+
+
+def union_all(stat_type):
+    return " UNION ALL ".join(
+        f'SELECT * FROM main."{stat_type}_{competition.replace("-", "_")}_2024_2025"' for competition in LEAGUE_ID_MAP
+    )
+
+
+QUERIES = {
+    "group_by_team": f"SELECT team, sum(goals) FROM ({union_all('standard')}) GROUP BY team ORDER BY 2 DESC LIMIT 10",
+    "filter_team": f"SELECT name, goals, assists FROM ({union_all('standard')}) WHERE team = 'Arsenal'",
+    "filter_nation_group_position": f"""
+        SELECT position, count(*), avg(minutes) FROM ({union_all('standard')}) WHERE nation = 'ENG' GROUP BY position""",
+    "group_by_competition_season": f"""
+        SELECT competition, season, avg(goals) FROM ({union_all('standard')}) GROUP BY competition, season""",
+    "join_on_name_team": f"""
+        SELECT s.team, sum(s.goals), sum(d.tackles) FROM ({union_all('standard')}) s
+        JOIN ({union_all('defensive')}) d ON d.name = s.name AND d.team = s.team AND d.competition = s.competition
+        GROUP BY s.team ORDER BY 2 DESC LIMIT 10""",
+}
+
+
+def copy_tables(source, target, encode):
+    """Copy every stats table of source into a fresh file, categorical columns as text (or ENUMs)."""
+    con = duckdb.connect(str(target))
+    con.execute(f"ATTACH '{source}' AS src (READ_ONLY)")
+    tables = [t for (t,) in con.execute(
+        "SELECT table_name FROM duckdb_tables() WHERE database_name = 'src' AND schema_name = 'main'"
+    ).fetchall() if TABLE_NAME_RE.match(t)]
+    for table in tables:
+        columns = con.execute(f"DESCRIBE src.main.{quote(table)}").fetchall()
+        select = ", ".join(
+            f"CAST({quote(c)} AS VARCHAR) AS {quote(c)}" if c in CATEGORICAL_TYPES else quote(c) for c, *_ in columns
+        )
+        con.execute(f"CREATE TABLE main.{quote(table)} AS SELECT {select} FROM src.main.{quote(table)}")
+    con.execute("DETACH src")
+    if encode:
+        encode_categoricals(con)
+    con.execute("CHECKPOINT")
+    size = con.execute("PRAGMA database_size").fetchdf().iloc[0]
+    con.close()
+    return {"used_mb": round(int(size["used_blocks"]) * int(size["block_size"]) / 1e6, 2),
+            "file_mb": round(target.stat().st_size / 1e6, 2)}
+
+
+def time_query(con, sql, repeats):
+    con.execute(sql).fetchall()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        con.execute(sql).fetchall()
+        timings.append(time.perf_counter() - start)
+    return round(percentile(timings, 50) * 1000, 3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=20, help="copies of the Premier League players per league")
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    work = Path(tempfile.mkdtemp())
+    source = work / "source.duckdb"
+    build_league_db(source, args.copies)
+
+    results = {"storage": {}, "queries": {}}
+    paths = {"varchar": work / "varchar.duckdb", "enum": work / "enum.duckdb"}
+    for variant, path in paths.items():
+        results["storage"][variant] = copy_tables(source, path, encode=variant == "enum")
+    with duckdb.connect(str(paths["varchar"]), read_only=True) as con:
+        results["rows_per_league"] = con.execute(
+            'SELECT count(*) FROM main."standard_Premier_League_2024_2025"'
+        ).fetchone()[0]
+
+    for variant, path in paths.items():
+        with duckdb.connect(str(path), read_only=True) as con:
+            for label, sql in QUERIES.items():
+                results["queries"].setdefault(label, {})[variant] = time_query(con, sql, args.repeats)
+
+    print(f"{results['rows_per_league']} rows per league and stat table")
+    for variant, size in results["storage"].items():
+        print(f"{variant:>8}: {size['used_mb']} MB used ({size['file_mb']} MB file)")
+    for label, r in results["queries"].items():
+        print(f"{label:>30}: varchar {r['varchar']} ms  enum {r['enum']} ms  ({r['varchar'] / r['enum']:.2f}x)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
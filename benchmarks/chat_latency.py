@@ -0,0 +1,284 @@
+"""Offline end-to-end latency benchmark for /chat.
+
+Boots the Flask app against a local DuckDB file loaded from the CSVs under data/,
+swaps Gemini for a deterministic fake chat model, and drives concurrent SSE clients.
+
+    python -m benchmarks.chat_latency --clients 8 --requests 64 --output bench.json
+    python -m benchmarks.chat_latency --mode both     # two-chain vs single-round-trip
+    python -m benchmarks.chat_latency --clients 32 --fake-rpm 60 --fake-max-concurrency 4   # overload
+    python -m benchmarks.chat_latency --llm-path      # every question through SQL generation + answer LLM
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from werkzeug.serving import make_server
+
+from bootstrap import bootstrap_db
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_QUESTIONS = [
+    "Who has the most goals in the Premier League?",
+    "How many assists did Bukayo Saka have?",
+    "Who is the most creative midfielder in the league?",
+    "Which defenders are the best at winning the ball back?",
+    "Compare Salah and Palmer",
+    "Is Saliba an elite defender?",
+]
+
+STAGES = ["history_io", "sql_generation", "sql_execution", "answer_generation"]
+MODES = {"two-chain": False, "single-round-trip": True}
+
+
+def build_local_db(path):
+    """Load the bundled CSV snapshots into a local DuckDB file, in ingest.py's table layout."""
+    bootstrap_db(path, derived=False)
+
+
+class StageRecorder:
+    """Accumulates stage durations per request thread; flushed when the answer is saved."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.requests = []
+
+    def add(self, stage, seconds):
+        stages = getattr(self.local, "stages", None)
+        if stages is None:
+            stages = self.local.stages = {}
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def flush(self):
+        stages = getattr(self.local, "stages", None) or {}
+        self.local.stages = {}
+        with self.lock:
+            self.requests.append(stages)
+
+    def wrap(self, stage, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+
+def install_probes(chatbot, recorder):
+    """Wrap the chatbot's history and SQL functions so each stage gets timed."""
+    save_message = chatbot.save_message
+
+    def save_and_flush(session_id, role, content):
+        start = time.perf_counter()
+        save_message(session_id, role, content)
+        recorder.add("history_io", time.perf_counter() - start)
+        # the assistant message is the last write of a request
+        if role == "assistant":
+            recorder.flush()
+
+    chatbot.save_message = save_and_flush
+    chatbot.get_session_history = recorder.wrap("history_io", chatbot.get_session_history)
+    chatbot.execute_tool_calls = recorder.wrap("sql_execution", chatbot.execute_tool_calls)
+    if chatbot.template_library:
+        chatbot.template_library.run = recorder.wrap("sql_execution", chatbot.template_library.run)
+
+
+def disable_shortcuts(chatbot):
+    """Send every request down the LLM path. The default questions are otherwise mostly
+    answered by a template, fast_render, the answer cache or a shared in-flight stream,
+    and answer_generation ends up with n=0."""
+    chatbot.template_library = None
+    chatbot.FAST_RENDER = False
+    chatbot.ANSWER_CACHE = False
+    chatbot.SINGLE_FLIGHT = False
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # nearest-rank percentile
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+        "p90_ms": round(percentile(values, 90) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+        "max_ms": round(max(values) * 1000, 2) if values else None,
+    }
+
+
+def run_client(base_url, questions, n_requests, busy_message=None):
+    """One SSE client with its own session cookie; returns per-request timings."""
+    http = requests.Session()
+    timings = []
+    for i in range(n_requests):
+        question = questions[i % len(questions)]
+        start = time.perf_counter()
+        ttft = None
+        frames = 0
+        rejected = False
+        error = None
+        try:
+            with http.get(f"{base_url}/chat", params={"message": question}, stream=True, timeout=120) as response:
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        if event == "end-of-stream":
+                            break
+                        payload = json.loads(line[5:].strip())
+                        if isinstance(payload, dict) and payload.get("type") == "token":
+                            frames += 1
+                            if ttft is None:
+                                ttft = time.perf_counter() - start
+                        elif isinstance(payload, dict) and payload.get("content") == busy_message:
+                            rejected = True
+                    elif not line:
+                        event = None
+        except Exception as e:
+            error = str(e)
+        timings.append({
+            "question": question,
+            "ttft": ttft,
+            "total": time.perf_counter() - start,
+            "token_frames": frames,
+            "rejected": rejected,
+            "error": error,
+        })
+    return timings
+
+
+def run_mode(chatbot, recorder, base_url, questions, args):
+    """Drive the running app with concurrent clients and summarize the timings."""
+    per_client = [args.requests // args.clients + (1 if i < args.requests % args.clients else 0) for i in range(args.clients)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        futures = [pool.submit(run_client, base_url, questions, n, chatbot.BUSY_MESSAGE) for n in per_client if n]
+        timings = [t for future in futures for t in future.result()]
+    wall = time.perf_counter() - start
+
+    ok = [t for t in timings if not t["error"] and not t["rejected"]]
+    return {
+        "wall_s": round(wall, 3),
+        "ok": len(ok),
+        "rejected": sum(1 for t in timings if t["rejected"]),
+        "errors": sum(1 for t in timings if t["error"]),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else None,
+        "ttft": summarize([t["ttft"] for t in ok if t["ttft"] is not None]),
+        "total": summarize([t["total"] for t in ok]),
+        "stages": {
+            stage: summarize([r[stage] for r in recorder.requests if stage in r])
+            for stage in STAGES
+        },
+        "template_coverage": chatbot.template_library.coverage_report() if chatbot.template_library else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4, help="concurrent SSE clients")
+    parser.add_argument("--requests", type=int, default=32, help="total requests across all clients")
+    parser.add_argument("--tool-call-latency", type=float, default=0.5, help="fake SQL-generation latency (s)")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="fake answer latency before the first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--fake-rpm", type=int, default=0, help="requests per minute the fake model accepts (0 = no limit)")
+    parser.add_argument("--fake-max-concurrency", type=int, default=0,
+                        help="concurrent calls the fake model accepts before answering 429 (0 = no limit)")
+    parser.add_argument("--questions", help="file with one question per line")
+    parser.add_argument("--mode", choices=[*MODES, "both"], default="two-chain",
+                        help="answer pipeline to drive; 'both' runs one after the other")
+    parser.add_argument("--llm-path", action="store_true",
+                        help="turn off templates, fast_render, the answer cache and single-flight")
+    parser.add_argument("--db", help="local DuckDB file to reuse (built from data/ CSVs if missing)")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db) if args.db else Path(tempfile.mkdtemp()) / "fbref_bench.duckdb"
+    if not db_path.exists():
+        build_local_db(db_path)
+
+    # chatbot reads DUCKDB_PATH at import, so configure it first
+    os.environ["DUCKDB_PATH"] = str(db_path)
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    sys.path.insert(0, str(REPO_DIR))
+    import chatbot
+    from benchmarks.fake_llm import FakeChatModel, RateLimits
+
+    recorder = StageRecorder()
+    limits = RateLimits(args.fake_rpm, args.fake_max_concurrency)
+    chatbot.init_app(FakeChatModel(
+        tool_call_latency=args.tool_call_latency,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        recorder=recorder,
+        limits=limits,
+    ))
+    if args.llm_path:
+        disable_shortcuts(chatbot)
+    # the chains look these functions up per call, so wrapping them after init_app is enough
+    install_probes(chatbot, recorder)
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    server = make_server("127.0.0.1", 0, chatbot.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    modes = list(MODES) if args.mode == "both" else [args.mode]
+    results = {"commit": git_commit(), "config": vars(args), "modes": {}}
+    for mode in modes:
+        chatbot.SINGLE_ROUND_TRIP = MODES[mode]
+        recorder.requests.clear()
+        limits.rejected = 0
+        results["modes"][mode] = run_mode(chatbot, recorder, base_url, questions, args)
+        # 429s the fake model raised, including ones the scheduler retried away
+        results["modes"][mode]["fake_rate_limited"] = limits.rejected
+    server.shutdown()
+
+    for mode, r in results["modes"].items():
+        print(f"[{mode}] {r['ok']}/{r['ok'] + r['rejected'] + r['errors']} requests ok in {r['wall_s']} s "
+              f"({r['throughput_rps']} req/s), {r['rejected']} rejected as busy, {r['fake_rate_limited']} fake 429s")
+        for name in ("ttft", "total"):
+            summary = r[name]
+            print(f"{name:>18}: p50 {summary['p50_ms']} ms  p90 {summary['p90_ms']} ms  p99 {summary['p99_ms']} ms")
+        for stage, summary in r["stages"].items():
+            print(f"{stage:>18}: mean {summary['mean_ms']} ms  p90 {summary['p90_ms']} ms  (n={summary['count']})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
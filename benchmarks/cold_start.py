@@ -0,0 +1,141 @@
+"""Worker cold-start benchmark and import-time profile for chatbot.py.
+
+Each run is a fresh interpreter, like a new gunicorn worker. It measures:
+- `import chatbot`: what the --preload master pays; it must not open sockets
+- `init_app()`: the per-worker post_fork work (connection, schema, name index, templates, LLM client)
+- the first request served after that
+
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --profile-top 15 --output cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.chat_latency import REPO_DIR, build_local_db, git_commit
+
+# runs inside the fresh interpreter; records any socket use during import
+WORKER_SCRIPT = r"""
+import json, socket, sys, time
+attempts = []
+real_connect, real_getaddrinfo = socket.socket.connect, socket.getaddrinfo
+def connect(self, address):
+    attempts.append(repr(address))
+    return real_connect(self, address)
+def getaddrinfo(host, *args, **kwargs):
+    attempts.append(str(host))
+    return real_getaddrinfo(host, *args, **kwargs)
+socket.socket.connect, socket.getaddrinfo = connect, getaddrinfo
+
+start = time.perf_counter()
+import chatbot
+imported = time.perf_counter()
+import_network = list(attempts)
+
+model = None
+if sys.argv[1] == "fake":
+    from benchmarks.fake_llm import FakeChatModel
+    model = FakeChatModel(tool_call_latency=0, first_token_latency=0)
+chatbot.init_app(model)
+initialized = time.perf_counter()
+
+response = chatbot.app.test_client().get("/template_stats")
+served = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "init_s": initialized - imported,
+    "first_request_s": served - initialized,
+    "first_request_status": response.status_code,
+    "import_network": import_network,
+}))
+"""
+
+
+def worker_env(db_path):
+    env = dict(os.environ, DUCKDB_PATH=str(db_path), PYTHONPATH=str(REPO_DIR))
+    env.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    return env
+
+
+def cold_start(db_path, llm):
+    result = subprocess.run(
+        [sys.executable, "-c", WORKER_SCRIPT, llm],
+        cwd=REPO_DIR, env=worker_env(db_path), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(db_path, top):
+    """Packages chatbot imports directly, by cumulative import time, from python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import chatbot"],
+        cwd=REPO_DIR, env=worker_env(db_path), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # each nesting level adds two spaces; a module is printed after everything it imported
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(cumulative) / 1e6))
+
+    total = 0.0
+    packages = {}
+    for i, (depth, name, seconds) in enumerate(rows):
+        if depth == 0 and name == "chatbot":
+            total = seconds
+            for child_depth, child, child_seconds in reversed(rows[:i]):
+                if child_depth == 0:
+                    break
+                if child_depth == 1:
+                    package = child.split(".")[0]
+                    packages[package] = packages.get(package, 0) + child_seconds
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {"total_s": round(total, 4), "top": [[name, round(s, 4)] for name, s in ranked[:top]]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start (median is reported)")
+    parser.add_argument("--llm", choices=["gemini", "fake"], default="gemini",
+                        help="gemini builds the real client (no API call is made); fake skips google-genai")
+    parser.add_argument("--profile-top", type=int, default=10, help="packages to list in the import profile")
+    parser.add_argument("--db", help="local DuckDB file to reuse (built from data/ CSVs if missing)")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db) if args.db else Path(tempfile.mkdtemp()) / "fbref_bench.duckdb"
+    if not db_path.exists():
+        build_local_db(db_path)
+
+    runs = [cold_start(db_path, args.llm) for _ in range(args.runs)]
+    summary = {
+        stage: round(statistics.median(r[stage] for r in runs) * 1000, 1)
+        for stage in ("import_s", "init_s", "first_request_s")
+    }
+    network = sorted({attempt for r in runs for attempt in r["import_network"]})
+    profile = import_profile(db_path, args.profile_top)
+
+    print(f"import chatbot: {summary['import_s']} ms  init_app: {summary['init_s']} ms  "
+          f"first request: {summary['first_request_s']} ms  (median of {args.runs})")
+    print("network at import: " + (", ".join(network) if network else "none"))
+    print(f"import profile ({profile['total_s'] * 1000:.0f} ms total):")
+    for name, seconds in profile["top"]:
+        print(f"{name:>28}: {seconds * 1000:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "median_ms": summary,
+                       "import_network": network, "import_profile": profile, "runs": runs}, f, indent=2)
+    return 1 if network else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
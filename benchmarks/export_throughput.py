@@ -0,0 +1,130 @@
+"""Throughput of the bulk export API for multi-league exports.
+
+Builds a local DuckDB file from the CSV snapshots, copies the standard table to every league
+in LEAGUE_ID_MAP (--copies scales the rows), boots the Flask app and downloads a UNION ALL
+of all leagues through /api/query in each format, plus a projected + filtered
+/api/table export. Reports rows/s, MB/s and how far peak RSS moved during the download.
+
+    python -m benchmarks.export_throughput --copies 20 --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import duckdb
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.chat_latency import REPO_DIR, build_local_db, git_commit
+from scraping_functions.standardized_scraping_function import LEAGUE_ID_MAP
+
+SOURCE_TABLE = "standard_Premier_League_2024_2025"
+# the export API needs a token
+EXPORT_TOKEN = "export-benchmark"
+
+
+def build_export_db(path, copies):
+    build_local_db(path)
+    con = duckdb.connect(str(path))
+    tables = []
+    for competition in LEAGUE_ID_MAP:
+        table = f"standard_{competition.replace('-', '_')}_2024_2025"
+        con.execute(f"""
+            CREATE OR REPLACE TABLE "{table}_tmp" AS
+            SELECT s.* FROM "{SOURCE_TABLE}" s, range({copies})
+        """)
+        con.execute(f'DROP TABLE IF EXISTS "{table}"')
+        con.execute(f'ALTER TABLE "{table}_tmp" RENAME TO "{table}"')
+        tables.append(table)
+    con.close()
+    return tables
+
+
+def rss_mb():
+    # resident set size of this process (server and client share it) - Linux only
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def download(url, params):
+    """Stream one export; returns (seconds, bytes, peak RSS growth in MB)."""
+    rss_before = peak = rss_mb()
+    start = time.perf_counter()
+    size = 0
+    headers = {"Authorization": f"Bearer {EXPORT_TOKEN}"}
+    with requests.get(url, params=params, headers=headers, stream=True, timeout=600) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=1 << 16):
+            size += len(chunk)
+            peak = max(peak, rss_mb())
+    elapsed = time.perf_counter() - start
+    return elapsed, size, peak - rss_before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=10, help="copies of each league's rows")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--formats", nargs="+", default=["arrow", "parquet", "csv"])
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    db_path = Path(tempfile.mkdtemp()) / "fbref_export.duckdb"
+    tables = build_export_db(db_path, args.copies)
+
+    # chatbot reads DUCKDB_PATH and EXPORT_API_TOKEN at import, so configure them first
+    os.environ["DUCKDB_PATH"] = str(db_path)
+    os.environ["EXPORT_API_TOKEN"] = EXPORT_TOKEN
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    sys.path.insert(0, str(REPO_DIR))
+    import chatbot
+    from benchmarks.fake_llm import FakeChatModel
+
+    chatbot.init_app(FakeChatModel())
+    server = make_server("127.0.0.1", 0, chatbot.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    union = " UNION ALL ".join(f'SELECT * FROM main."{t}"' for t in tables)
+    with chatbot.sql_pool.connection() as cur:
+        total_rows = cur.execute(f"SELECT count(*) FROM ({union})").fetchone()[0]
+        table_rows = cur.execute(f'SELECT count(*) FROM main."{tables[0]}" WHERE TRY_CAST(goals AS DOUBLE) >= 1').fetchone()[0]
+    cases = {f"query_{fmt}": (f"{base_url}/api/query", {"sql": union, "format": fmt}, total_rows) for fmt in args.formats}
+    cases["table_projected_parquet"] = (
+        f"{base_url}/api/table/{tables[0]}",
+        {"columns": "name,team,position,goals,assists", "filter": "goals:ge:1", "format": "parquet"},
+        table_rows,
+    )
+
+    results = {}
+    for label, (url, params, rows) in cases.items():
+        runs = [download(url, params) for _ in range(args.runs)]
+        seconds = statistics.median(r[0] for r in runs)
+        size = runs[0][1]
+        results[label] = {
+            "rows": rows,
+            "bytes": size,
+            "median_s": round(seconds, 4),
+            "rows_per_s": round(rows / seconds),
+            "mb_per_s": round(size / seconds / 1e6, 1),
+            "max_rss_growth_mb": round(max(r[2] for r in runs), 1),
+        }
+        r = results[label]
+        print(f"{label:>24}: {rows} rows, {size / 1e6:.1f} MB in {r['median_s']} s "
+              f"({r['rows_per_s']} rows/s, {r['mb_per_s']} MB/s), peak RSS +{r['max_rss_growth_mb']} MB")
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
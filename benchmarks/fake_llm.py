@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# words the fake answer is built from - deterministic so runs are comparable
+ANSWER_WORDS = (
+    "**Mohamed Salah** led the league with **29 goals** and **18 assists**, "
+    "ahead of **Alexander Isak** and **Erling Haaland**. "
+).split()
+
+DEFAULT_SQL = 'SELECT name, team, goals FROM main."standard_Premier_League_2024_2025" ORDER BY goals DESC LIMIT 10;'
+
+
+class FakeRateLimitError(Exception):
+    """What the fake model raises when over its limits - worded like Gemini's 429."""
+
+    code = 429
+
+
+class RateLimits:
+    """Quota the fake model enforces on itself, like Gemini's requests-per-minute and
+    concurrent-request limits. Shared by every call on the model; 0 means unlimited."""
+
+    def __init__(self, requests_per_minute=0, max_concurrency=0):
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrency = max_concurrency
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.active = 0
+        self.rejected = 0
+
+    def admit(self):
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            over_rpm = self.requests_per_minute and len(self.recent) >= self.requests_per_minute
+            over_concurrency = self.max_concurrency and self.active >= self.max_concurrency
+            if over_rpm or over_concurrency:
+                self.rejected += 1
+                raise FakeRateLimitError("429 Resource has been exhausted (e.g. check quota).")
+            self.recent.append(now)
+            self.active += 1
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic stand-in for ChatGoogleGenerativeAI with configurable latency.
+
+    With tools bound (the SQL-generation chain) it answers with a single run_sql call.
+    Without tools (the answer chain), or once a tool result is in the conversation
+    (single-round-trip mode), it produces answer_tokens words at tokens_per_second.
+    """
+
+    first_token_latency: float = 0.3
+    tool_call_latency: float = 0.5
+    tokens_per_second: float = 50.0
+    answer_tokens: int = 120
+    sql_query: str = DEFAULT_SQL
+    # optional object with add(stage, seconds) that gets each call's duration
+    recorder: Optional[Any] = None
+    # optional RateLimits; calls over the limits raise FakeRateLimitError
+    limits: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[getattr(t, "name", t) for t in tools], **kwargs)
+
+    def _record(self, stage, start):
+        if self.recorder is not None:
+            self.recorder.add(stage, time.perf_counter() - start)
+
+    def _answer_tokens(self):
+        return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(self.answer_tokens)]
+
+    def _tool_call_message(self):
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": "run_sql", "args": {"sql_query": self.sql_query}, "id": "call_0"}],
+        )
+
+    def _wants_tool_call(self, messages, kwargs):
+        return bool(kwargs.get("tools")) and not (messages and isinstance(messages[-1], ToolMessage))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.limits is not None:
+            self.limits.admit()
+        try:
+            return self._generate_unlimited(messages, kwargs)
+        finally:
+            if self.limits is not None:
+                self.limits.release()
+
+    def _generate_unlimited(self, messages, kwargs):
+        start = time.perf_counter()
+        if self._wants_tool_call(messages, kwargs):
+            time.sleep(self.tool_call_latency)
+            message = self._tool_call_message()
+            self._record("sql_generation", start)
+        else:
+            time.sleep(self.first_token_latency + self.answer_tokens / self.tokens_per_second)
+            message = AIMessage(content="".join(self._answer_tokens()))
+            self._record("answer_generation", start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.limits is not None:
+            self.limits.admit()
+        try:
+            yield from self._stream_unlimited(messages, run_manager, kwargs)
+        finally:
+            if self.limits is not None:
+                self.limits.release()
+
+    def _stream_unlimited(self, messages, run_manager, kwargs):
+        start = time.perf_counter()
+        if self._wants_tool_call(messages, kwargs):
+            time.sleep(self.tool_call_latency)
+            message = self._tool_call_message()
+            self._record("sql_generation", start)
+            tool_call_chunks = [
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ]
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=tool_call_chunks))
+            return
+        time.sleep(self.first_token_latency)
+        for token in self._answer_tokens():
+            time.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        self._record("answer_generation", start)
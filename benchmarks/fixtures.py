@@ -0,0 +1,94 @@
+"""FBref HTML fixtures for the offline scraper benchmarks.
+
+Real pages can be recorded once with network access:
+
+    python -m benchmarks.fixtures --record
+
+and are stored under benchmarks/recorded/. Stat types without a recorded page fall
+back to a page synthesized from the bundled CSV snapshots in FBref's table markup
+(same div ids, a ranker <th>, one <td> per STAT_CONFIG column, repeated thead rows).
+"""
+import argparse
+import csv
+import html
+from pathlib import Path
+
+from bootstrap import CSV_COLUMN_NAMES, CSV_SNAPSHOTS, DATA_DIR
+from scraping_functions.standardized_scraping_function import STAT_CONFIG, build_fbref_url, _read_url_content
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "recorded"
+
+# FBref repeats the header row inside tbody every 25 players
+THEAD_EVERY = 25
+
+
+def fixture_path(stat_type, competition="Premier-League", season="2024-2025"):
+    return FIXTURE_DIR / f"{stat_type}_{competition}_{season}.html"
+
+
+def record_fixtures(competition="Premier-League", season="2024-2025"):
+    """Download and store one live page per stat type."""
+    FIXTURE_DIR.mkdir(exist_ok=True)
+    for stat_type in STAT_CONFIG:
+        page = _read_url_content(build_fbref_url(stat_type, season, competition))
+        fixture_path(stat_type, competition, season).write_text(page, encoding="utf-8")
+        print(f"recorded {stat_type} ({len(page) / 1e6:.2f} MB)")
+
+
+def _csv_rows(stat_type):
+    for rel_path, snapshot_type in CSV_SNAPSHOTS.items():
+        if snapshot_type == stat_type:
+            with open(DATA_DIR / rel_path, newline="", encoding="utf-8") as f:
+                return list(csv.DictReader(f))
+    return []
+
+
+def _cell(col, value):
+    value = html.escape(value or "")
+    if col == "name":
+        return f'<td data-stat="player"><a href="/en/players/0/{value}">{value}</a></td>'
+    if col == "nation":
+        return f'<td data-stat="nationality"><a href="/en/country/{value}"><span class="f-i">{value[:2].lower()}</span> {value}</a></td>'
+    if col == "team":
+        return f'<td data-stat="team"><a href="/en/squads/0/{value}">{value}</a></td>'
+    return f'<td class="right" data-stat="{html.escape(col or "")}">{value}</td>'
+
+
+def synthesize_page(stat_type, copies=1):
+    """Build an FBref-style stats page from the CSV snapshot; copies scales the row count."""
+    config = STAT_CONFIG[stat_type]
+    columns = config["columns"]
+    rows = _csv_rows(stat_type) * copies
+    header = "".join(f"<th>{html.escape(col or '')}</th>" for col in ["Rk"] + columns)
+
+    body = []
+    for i, row in enumerate(rows, start=1):
+        if i % THEAD_EVERY == 0:
+            body.append(f'<tr class="thead">{header}</tr>')
+        cells = "".join(_cell(col, row.get(CSV_COLUMN_NAMES.get(col, col or ""), "")) for col in columns)
+        body.append(f'<tr><th class="right" data-stat="ranker">{i}</th>{cells}</tr>')
+
+    return (
+        "<html><head><title>FBref fixture</title></head><body>"
+        f'<div id="{config["div_id"]}"><table class="stats_table">'
+        f"<thead><tr>{header}</tr></thead><tbody>{''.join(body)}</tbody></table></div>"
+        "</body></html>"
+    )
+
+
+def load_fixture(stat_type, copies=1):
+    """Recorded page if there is one, otherwise a synthesized page."""
+    path = fixture_path(stat_type)
+    if path.exists():
+        return path.read_text(encoding="utf-8")
+    return synthesize_page(stat_type, copies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="download live pages into benchmarks/recorded/")
+    parser.add_argument("--competition", default="Premier-League")
+    parser.add_argument("--season", default="2024-2025")
+    args = parser.parse_args()
+    if args.record:
+        record_fixtures(args.competition, args.season)
@@ -0,0 +1,142 @@
+"""chat_history read/write latency as the table grows, old layout vs history_store.
+
+legacy:  no index, reads the oldest 10 rows, and every write runs the NOT IN prune
+indexed: session_id index, reads the newest 10, append-only writes
+         (compact() does the trimming in the background; its cost is reported separately)
+
+Rows are generated interleaved across sessions in time order, like production traffic.
+
+    python -m benchmarks.history_io --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+
+from benchmarks.chat_latency import git_commit, percentile
+from history_store import CREATE_TABLE, ensure_history_table, read_history, append_message, compact, migrate
+
+LEGACY_READ = """
+    SELECT role, content
+    FROM chat_history
+    WHERE session_id = ?
+    ORDER BY created_at ASC
+    LIMIT 10
+"""
+LEGACY_PRUNE = """
+    DELETE FROM chat_history
+    WHERE session_id = ?
+      AND created_at NOT IN (
+          SELECT created_at
+          FROM chat_history
+          WHERE session_id = ?
+          ORDER BY created_at DESC
+          LIMIT 10
+      )
+"""
+
+
+def populate(con, rows, messages_per_session, content_bytes):
+    sessions = max(1, rows // messages_per_session)
+    con.execute(
+        f"""
+        INSERT INTO chat_history
+        SELECT
+            'session-' || (i % {sessions}),
+            ['user', 'tool', 'assistant'][1 + (i % 3)::INTEGER],
+            repeat('x', {content_bytes}),
+            TIMESTAMP '2025-01-01' + to_seconds(i)
+        FROM range({rows}) t(i)
+        """
+    )
+    return sessions
+
+
+def legacy_read(con, session_id):
+    return con.execute(LEGACY_READ, [session_id]).fetchall()
+
+
+def legacy_write(con, session_id, role, content):
+    con.execute("INSERT INTO chat_history (session_id, role, content) VALUES (?, ?, ?)", [session_id, role, content])
+    con.execute(LEGACY_PRUNE, [session_id, session_id])
+
+
+def time_ops(fn, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return {
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p90_ms": round(percentile(timings, 90) * 1000, 3),
+        "mean_ms": round(statistics.mean(timings) * 1000, 3),
+    }
+
+
+def run_size(workdir, rows, layout, ops, messages_per_session, content_bytes, sort):
+    con = duckdb.connect(str(Path(workdir) / f"{layout}_{rows}.duckdb"))
+    # same columns either way; bulk-load first and build the index once, like migrating an existing table
+    con.execute(CREATE_TABLE)
+    sessions = populate(con, rows, messages_per_session, content_bytes)
+    if layout == "legacy":
+        read, write = legacy_read, legacy_write
+    else:
+        if sort:
+            migrate(con)
+        else:
+            ensure_history_table(con)
+        read, write = read_history, append_message
+
+    rng = random.Random(rows)
+    picks = [f"session-{rng.randrange(sessions)}" for _ in range(ops)]
+    result = {
+        "read": time_ops(lambda s: read(con, s), [(s,) for s in picks]),
+        "write": time_ops(lambda s: write(con, s, "user", "x" * content_bytes), [(s,) for s in picks]),
+    }
+    if layout == "indexed":
+        start = time.perf_counter()
+        expired, trimmed = compact(con, ttl_hours=24 * 365 * 100)
+        result["compact"] = {"ms": round((time.perf_counter() - start) * 1000, 1), "trimmed_rows": trimmed}
+    con.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--ops", type=int, default=200, help="reads and writes timed per size")
+    parser.add_argument("--messages-per-session", type=int, default=10,
+                        help="10 is the steady state with per-write pruning; raise it to model lagging compaction")
+    parser.add_argument("--content-bytes", type=int, default=400)
+    parser.add_argument("--sorted", action="store_true", help="rewrite the indexed table sorted (history_store.migrate)")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            results[rows] = {
+                layout: run_size(workdir, rows, layout, args.ops, args.messages_per_session, args.content_bytes, args.sorted)
+                for layout in ("legacy", "indexed")
+            }
+            line = f"{rows:>9} rows:"
+            for layout, r in results[rows].items():
+                line += (f"  {layout} read p50 {r['read']['p50_ms']} ms / write p50 {r['write']['p50_ms']} ms")
+            line += f"  compact {results[rows]['indexed']['compact']['ms']} ms"
+            print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Latency and tier mix of fast/strong model routing.
+
+Boots the chatbot in-process against a local DuckDB file loaded from the CSVs under data/,
+with two fake chat models standing in for the tiers - a fast one and a slower strong one -
+and answers a mix of simple lookups and comparisons through answer_one(). Templates, the
+local fast render and the answer cache are switched off, so every question runs both LLM
+stages. Configurations:
+
+    single        routing off - every stage on the strong model (the old single-model setup)
+    routed        stages go to the tier model_router picks
+    routed-bad    routed, but the fast model writes SQL that fails validation -> escalation
+
+    python -m benchmarks.model_routing --rounds 3 --output routing.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+from benchmarks.chat_latency import REPO_DIR, build_local_db, git_commit, summarize
+
+QUESTIONS = [
+    "Who has the most goals in the Premier League?",
+    "How many assists did Bukayo Saka have?",
+    "Who is the most creative midfielder in the league?",
+    "Which defenders are the best at winning the ball back?",
+    "Top 10 xG in the Premier League",
+    "Compare Salah and Palmer",
+    "Is Saliba an elite defender?",
+    "Compare Salah, Palmer and Saka on goals, assists and xG",
+]
+
+BAD_SQL = 'SELECT name, goalz FROM main."standard_Premier_League_2024_2025" ORDER BY goalz DESC LIMIT 10;'
+
+
+def run_config(chatbot, questions, rounds):
+    timings, tiers, errors = [], {}, 0
+    for _ in range(rounds):
+        for question in questions:
+            result = chatbot.answer_one(f"bench-{uuid.uuid4()}", question)
+            if "error" in result:
+                errors += 1
+                continue
+            timings.append(result["timings"]["total_ms"] / 1000)
+            for stage, tier in result.get("tiers", {}).items():
+                key = f"{stage}:{tier}"
+                tiers[key] = tiers.get(key, 0) + 1
+    return {"total": summarize(timings), "tiers": tiers, "errors": errors}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2, help="passes over the question mix per configuration")
+    parser.add_argument("--fast-tool-call-latency", type=float, default=0.3)
+    parser.add_argument("--fast-first-token-latency", type=float, default=0.15)
+    parser.add_argument("--fast-tokens-per-second", type=float, default=300.0)
+    parser.add_argument("--strong-tool-call-latency", type=float, default=1.0)
+    parser.add_argument("--strong-first-token-latency", type=float, default=0.5)
+    parser.add_argument("--strong-tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    db_path = Path(tempfile.mkdtemp()) / "fbref_routing.duckdb"
+    build_local_db(db_path)
+
+    # chatbot reads its config at import
+    os.environ["DUCKDB_PATH"] = str(db_path)
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    sys.path.insert(0, str(REPO_DIR))
+    import chatbot
+    from benchmarks.fake_llm import FakeChatModel
+
+    def fast(**overrides):
+        return FakeChatModel(
+            tool_call_latency=args.fast_tool_call_latency,
+            first_token_latency=args.fast_first_token_latency,
+            tokens_per_second=args.fast_tokens_per_second,
+            answer_tokens=args.answer_tokens,
+            **overrides,
+        )
+
+    strong = FakeChatModel(
+        tool_call_latency=args.strong_tool_call_latency,
+        first_token_latency=args.strong_first_token_latency,
+        tokens_per_second=args.strong_tokens_per_second,
+        answer_tokens=args.answer_tokens,
+    )
+    chatbot.init_app(fast(), strong)
+    chatbot.template_library = None
+    chatbot.FAST_RENDER = False
+    chatbot.ANSWER_CACHE = False
+
+    configs = {
+        "single": (False, fast()),
+        "routed": (True, fast()),
+        "routed-bad": (True, fast(sql_query=BAD_SQL)),
+    }
+    results = {}
+    for label, (enabled, fast_model) in configs.items():
+        chatbot.install_llm(fast_model, strong)
+        chatbot.model_router.enabled = enabled
+        results[label] = run_config(chatbot, QUESTIONS, args.rounds)
+        r = results[label]
+        tiers = ", ".join(f"{k}={v}" for k, v in sorted(r["tiers"].items()))
+        print(f"{label:>11}: p50 {r['total']['p50_ms']} ms  p90 {r['total']['p90_ms']} ms  "
+              f"mean {r['total']['mean_ms']} ms  errors {r['errors']}  [{tiers}]")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Scraper and ingest benchmark over FBref HTML fixtures (no network).
+
+Times each stage for every stat type in STAT_CONFIG - HTML parse, DataFrame construction,
+type conversion and load into a local DuckDB - with tracemalloc peak memory per stage.
+
+    python -m benchmarks.scrape_ingest --update-baseline        # record the baseline
+    python -m benchmarks.scrape_ingest --max-regression 20      # exit 1 if a stage got >20% slower
+
+The committed baseline (benchmarks/baselines/scrape_ingest.json) was taken on the pages
+synthesized from the CSV snapshots. Timings are only compared against a baseline taken
+on the same fixtures - after recording live pages, re-record the baseline too.
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from benchmarks.chat_latency import git_commit
+from benchmarks.fixtures import fixture_path, load_fixture
+from ingest import load_dataframe, table_name_for
+from scraping_functions.standardized_scraping_function import STAT_CONFIG, parse_fbref_table, convert_types
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "scrape_ingest.json"
+STAGES = ["parse", "dataframe", "convert", "load"]
+SEASON = "2024-2025"
+COMPETITION = "Premier-League"
+
+
+def run_stages(html_content, stat_type, con):
+    """Run the ingest pipeline once for one page; returns {stage: (seconds, result)}."""
+    timings = {}
+
+    start = time.perf_counter()
+    players_info = parse_fbref_table(html_content, stat_type, SEASON, COMPETITION)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = pd.DataFrame(players_info)
+    timings["dataframe"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = convert_types(df)
+    timings["convert"] = time.perf_counter() - start
+
+    table_name = table_name_for(stat_type, COMPETITION, SEASON)
+    con.execute(f'DROP TABLE IF EXISTS main."{table_name}"')
+    start = time.perf_counter()
+    load_dataframe(con, table_name, df, database="main")
+    timings["load"] = time.perf_counter() - start
+
+    return timings, len(df)
+
+
+def peak_memory(html_content, stat_type, con):
+    """tracemalloc peak (bytes) for each stage - a separate pass since tracing slows things down."""
+    peaks = {}
+    tracemalloc.start()
+
+    tracemalloc.reset_peak()
+    players_info = parse_fbref_table(html_content, stat_type, SEASON, COMPETITION)
+    peaks["parse"] = tracemalloc.get_traced_memory()[1]
+
+    tracemalloc.reset_peak()
+    df = pd.DataFrame(players_info)
+    peaks["dataframe"] = tracemalloc.get_traced_memory()[1]
+
+    tracemalloc.reset_peak()
+    df = convert_types(df)
+    peaks["convert"] = tracemalloc.get_traced_memory()[1]
+
+    table_name = table_name_for(stat_type, COMPETITION, SEASON)
+    con.execute(f'DROP TABLE IF EXISTS main."{table_name}"')
+    tracemalloc.reset_peak()
+    load_dataframe(con, table_name, df, database="main")
+    peaks["load"] = tracemalloc.get_traced_memory()[1]
+
+    tracemalloc.stop()
+    return peaks
+
+
+def run_benchmark(repeat=5, copies=1):
+    con = duckdb.connect(":memory:")
+    results = {}
+    for stat_type in STAT_CONFIG:
+        html_content = load_fixture(stat_type, copies)
+        runs = []
+        rows = 0
+        for _ in range(repeat):
+            gc.collect()
+            timings, rows = run_stages(html_content, stat_type, con)
+            runs.append(timings)
+        medians = {stage: statistics.median(r[stage] for r in runs) for stage in STAGES}
+        results[stat_type] = {
+            "fixture": "recorded" if fixture_path(stat_type).exists() else "synthesized",
+            "rows": rows,
+            "html_bytes": len(html_content.encode("utf-8")),
+            "median_s": {stage: round(v, 6) for stage, v in medians.items()},
+            "parse_rows_per_s": round(rows / medians["parse"], 1) if medians["parse"] else None,
+            "parse_mb_per_s": round(len(html_content) / 1e6 / medians["parse"], 2) if medians["parse"] else None,
+            "peak_bytes": peak_memory(html_content, stat_type, con),
+        }
+    con.close()
+    totals = {stage: round(sum(r["median_s"][stage] for r in results.values()), 6) for stage in STAGES}
+    return {"commit": git_commit(), "repeat": repeat, "copies": copies, "stat_types": results, "total_s": totals}
+
+
+def fixture_mismatch(current, baseline):
+    """Stat types whose baseline was measured on other fixtures (or other --copies)."""
+    if current["copies"] != baseline.get("copies"):
+        return sorted(current["stat_types"])
+    return sorted(
+        stat_type for stat_type, r in current["stat_types"].items()
+        if baseline["stat_types"].get(stat_type, {}).get("fixture", "synthesized") != r["fixture"]
+    )
+
+
+def compare(current, baseline, max_regression_pct):
+    """Return the stages whose total time grew more than max_regression_pct over the baseline."""
+    regressions = []
+    for stage in STAGES:
+        before = baseline["total_s"].get(stage)
+        after = current["total_s"][stage]
+        if before and after > before * (1 + max_regression_pct / 100):
+            regressions.append((stage, before, after, (after / before - 1) * 100))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stat type (median is reported)")
+    parser.add_argument("--copies", type=int, default=1, help="scale synthesized pages, e.g. 5 for five leagues")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed slowdown per stage in percent")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    current = run_benchmark(args.repeat, args.copies)
+
+    for stat_type, r in current["stat_types"].items():
+        stages = "  ".join(f"{stage} {r['median_s'][stage] * 1000:.1f} ms" for stage in STAGES)
+        print(f"{stat_type:>10}: {r['rows']} rows  {stages}  parse {r['parse_rows_per_s']} rows/s")
+    print("     total: " + "  ".join(f"{stage} {v * 1000:.1f} ms" for stage, v in current["total_s"].items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(exist_ok=True)
+        baseline_path.write_text(json.dumps(current, indent=2))
+        print(f"baseline written to {baseline_path}")
+        return 0
+
+    # a missing or incomparable baseline fails the run - otherwise a regression gate that can't compare passes
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path} - run with --update-baseline to record one")
+        return 1
+    baseline = json.loads(baseline_path.read_text())
+    mismatched = fixture_mismatch(current, baseline)
+    if mismatched:
+        print(f"baseline was taken on different fixtures for {', '.join(mismatched)} - re-record it with --update-baseline")
+        return 1
+
+    regressions = compare(current, baseline, args.max_regression)
+    for stage, before, after, pct in regressions:
+        print(f"REGRESSION {stage}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms (+{pct:.0f}%)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
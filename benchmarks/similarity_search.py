@@ -0,0 +1,109 @@
+"""Similarity search latency across all five leagues.
+
+Builds a local DuckDB file from the CSV snapshots and copies every stat table to each
+league in LEAGUE_ID_MAP (--copies more players per league, renamed so they are distinct),
+then times the index build, the neighbour precompute and top-k queries.
+
+    python -m benchmarks.similarity_search --copies 2 --queries 500
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+
+from benchmarks.chat_latency import build_local_db, git_commit, percentile
+from bootstrap import CSV_SNAPSHOTS
+from scraping_functions.standardized_scraping_function import LEAGUE_ID_MAP
+from similarity import SimilarityIndex
+
+
+def build_league_db(path, copies):
+    build_local_db(path)
+    con = duckdb.connect(str(path))
+    for stat_type in sorted(set(CSV_SNAPSHOTS.values())):
+        source = f"{stat_type}_Premier_League_2024_2025"
+        for competition in LEAGUE_ID_MAP:
+            table = f"{stat_type}_{competition.replace('-', '_')}_2024_2025"
+            if table == source:
+                continue
+            # same stat lines under new names - the search cost only depends on the row count
+            con.execute(f"""
+                CREATE OR REPLACE TABLE "{table}" AS
+                SELECT s.* REPLACE (s.name || ' {competition} ' || c.range AS name)
+                FROM "{source}" s, range({copies}) c
+            """)
+    con.close()
+
+
+def time_queries(fn, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return {
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=1, help="copies of the Premier League players per other league")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=64, help="players per batched top-k call")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    db_path = Path(tempfile.mkdtemp()) / "fbref_similarity.duckdb"
+    build_league_db(db_path, args.copies)
+    con = duckdb.connect(str(db_path))
+
+    start = time.perf_counter()
+    index = SimilarityIndex.build(con)
+    build_ms = (time.perf_counter() - start) * 1000
+    rng = random.Random(0)
+    names = [str(index.meta["name"][rng.randrange(len(index))]) for _ in range(args.queries)]
+    rows = [index.find(name) for name in names]
+
+    results = {
+        "players": len(index),
+        "features": len(index.features),
+        "build_ms": round(build_ms, 1),
+        "find": time_queries(index.find, [(name,) for name in names]),
+        "cosine": time_queries(lambda row: index.top_k([row], args.k, "cosine"), [(row,) for row in rows]),
+        "euclidean": time_queries(lambda row: index.top_k([row], args.k, "euclidean"), [(row,) for row in rows]),
+        "cosine_one_league": time_queries(
+            lambda row: index.top_k([row], args.k, "cosine", competition="La-Liga"), [(row,) for row in rows]
+        ),
+    }
+    batches = [(rows[i:i + args.batch],) for i in range(0, len(rows), args.batch)]
+    batch = time_queries(lambda batch_rows: index.top_k(batch_rows, args.k), batches)
+    results[f"cosine_batch_{args.batch}"] = batch
+
+    start = time.perf_counter()
+    index.precompute_neighbors()
+    results["precompute_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    results["precomputed"] = time_queries(lambda row: index.top_k([row], args.k), [(row,) for row in rows])
+    results["tool_call"] = time_queries(lambda name: index.similar(name, args.k), [(name,) for name in names])
+
+    print(f"{results['players']} players x {results['features']} features, "
+          f"built in {results['build_ms']} ms, neighbours precomputed in {results['precompute_ms']} ms")
+    for label, r in results.items():
+        if isinstance(r, dict):
+            print(f"{label:>22}: p50 {r['p50_ms']} ms  p99 {r['p99_ms']} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
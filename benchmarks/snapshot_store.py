@@ -0,0 +1,117 @@
+"""Storage and as-of query latency of the snapshot store over a simulated season.
+
+Starts from one parsed FBref page (fixture) and refreshes it once per matchweek; each
+week a share of the players play and their numeric stats go up, the rest are unchanged.
+Reports delta rows stored vs rows a full copy per refresh would take, refresh time, and
+as-of query latency against the first, middle and latest snapshot vs the current table.
+
+    python -m benchmarks.snapshot_store --matchweeks 38 --played 0.6 --refreshes-per-week 2
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import duckdb
+import pandas as pd
+
+from benchmarks.chat_latency import git_commit, percentile
+from benchmarks.fixtures import load_fixture
+from ingest import table_name_for
+from scraping_functions.standardized_scraping_function import parse_fbref_table, convert_types
+from snapshots import record_snapshot, snapshot_sizes
+
+SEASON = "2024-2025"
+COMPETITION = "Premier-League"
+# numeric columns that don't move during a season
+FIXED_COLUMNS = {"age", "year_born"}
+
+
+def season_frames(stat_type, matchweeks, played, copies, seed):
+    """One DataFrame per matchweek, starting from the fixture page."""
+    html_content = load_fixture(stat_type, copies)
+    df = convert_types(pd.DataFrame(parse_fbref_table(html_content, stat_type, SEASON, COMPETITION)))
+    df = df.drop_duplicates(subset=[c for c in ("name", "team", "nation", "year_born") if c in df.columns])
+    numeric = [c for c in df.select_dtypes("number").columns if c not in FIXED_COLUMNS]
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(matchweeks):
+        df = df.copy()
+        mask = [rng.random() < played for _ in range(len(df))]
+        for column in numeric:
+            df.loc[mask, column] = df.loc[mask, column].fillna(0) + 1
+        frames.append(df)
+    return frames
+
+
+def time_query(con, sql, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        con.execute(sql).fetchall()
+        timings.append(time.perf_counter() - start)
+    return {"p50_ms": round(percentile(timings, 50) * 1000, 3), "mean_ms": round(statistics.mean(timings) * 1000, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stat-type", default="standard")
+    parser.add_argument("--matchweeks", type=int, default=38)
+    parser.add_argument("--played", type=float, default=0.6, help="share of players whose stats change each week")
+    parser.add_argument("--refreshes-per-week", type=int, default=1,
+                        help="extra refreshes see unchanged data and should add nothing")
+    parser.add_argument("--copies", type=int, default=1, help="scale the fixture's row count")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    frames = season_frames(args.stat_type, args.matchweeks, args.played, args.copies, seed=42)
+    table_name = table_name_for(args.stat_type, COMPETITION, SEASON)
+    con = duckdb.connect()
+    season_start = datetime(2024, 8, 16)
+
+    refresh_ms = []
+    for week, df in enumerate(frames):
+        for refresh in range(args.refreshes_per_week):
+            start = time.perf_counter()
+            record_snapshot(con, table_name, df, taken_at=season_start + timedelta(days=7 * week, hours=refresh))
+            refresh_ms.append((time.perf_counter() - start) * 1000)
+
+    sizes = snapshot_sizes(con)[table_name]
+    refreshes = args.matchweeks * args.refreshes_per_week
+    full_copy_rows = len(frames[0]) * refreshes
+    queries = {"current": f'SELECT * FROM main."{table_name}"'}
+    for label, week in (("as_of_first", 0), ("as_of_middle", args.matchweeks // 2), ("as_of_latest", args.matchweeks - 1)):
+        as_of = season_start + timedelta(days=7 * week, hours=12)
+        queries[label] = f"SELECT * FROM \"{table_name}_as_of\"(TIMESTAMP '{as_of}')"
+    latency = {label: time_query(con, sql, args.repeats) for label, sql in queries.items()}
+
+    print(f"{table_name}: {len(frames[0])} rows, {refreshes} refreshes, {sizes['versions']} versions kept")
+    print(f"  stored {sizes['delta_rows']} delta rows vs {full_copy_rows} for a full copy per refresh "
+          f"({sizes['delta_rows'] / full_copy_rows:.0%})")
+    print(f"  refresh p50 {percentile(refresh_ms, 50):.1f} ms")
+    for label, r in latency.items():
+        print(f"  {label:>13}: p50 {r['p50_ms']} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "config": vars(args),
+                "results": {
+                    "rows": len(frames[0]),
+                    "refreshes": refreshes,
+                    "sizes": sizes,
+                    "full_copy_rows": full_copy_rows,
+                    "refresh_p50_ms": round(percentile(refresh_ms, 50), 3),
+                    "latency": latency,
+                },
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
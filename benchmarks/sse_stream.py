@@ -0,0 +1,110 @@
+"""SSE framing benchmark: one frame per token vs windowed TokenFrames, optionally gzipped.
+
+Replays a synthetic answer token by token at a fixed inter-token gap (the way Gemini streams)
+and reports frames per answer, frames/sec, bytes on the wire and worker CPU per answer.
+
+    python -m benchmarks.sse_stream --answers 20 --tokens 300 --gap-ms 4
+    python -m benchmarks.sse_stream --window-ms 30 --max-bytes 512 --output sse.json
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.chat_latency import git_commit
+from sse import TokenFrames, END_OF_STREAM, gzip_stream
+
+WORDS = (
+    "Mohamed Salah scored **29** goals with 18 assists for Liverpool in the 2024-2025 season, "
+    "leading the Premier League in both xG and shot-creating actions while playing 3,371 minutes."
+).split()
+
+
+def synthetic_tokens(n_tokens, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(WORDS) + (" " if rng.random() < 0.8 else "\n") for _ in range(n_tokens)]
+
+
+def per_token_frames(tokens, gap):
+    """The old /chat loop: json.dumps and a frame per token, text built with +=."""
+    text = ""
+    for token in tokens:
+        time.sleep(gap)
+        yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+        text += token
+    yield "event: end-of-stream\ndata: close\n\n"
+
+
+def batched_frames(tokens, gap, window_ms, max_bytes):
+    frames = TokenFrames(window_ms, max_bytes)
+    for token in tokens:
+        time.sleep(gap)
+        frame = frames.add(token)
+        if frame:
+            yield frame
+    frame = frames.flush()
+    if frame:
+        yield frame
+    frames.text()  # the join /chat does before save_message
+    yield END_OF_STREAM
+
+
+def measure(make_stream, answers, gzip):
+    """Drain make_stream() answers times; returns per-answer frames, bytes, wall and CPU."""
+    runs = []
+    for i in range(answers):
+        stream = make_stream(i)
+        if gzip:
+            stream = gzip_stream(stream)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        frames = 0
+        wire_bytes = 0
+        for frame in stream:
+            frames += 1
+            wire_bytes += len(frame if isinstance(frame, bytes) else frame.encode("utf-8"))
+        wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+        runs.append({"frames": frames, "bytes": wire_bytes, "wall_s": wall, "cpu_s": cpu})
+    return {
+        "frames_per_answer": statistics.median(r["frames"] for r in runs),
+        "frames_per_s": round(statistics.median(r["frames"] / r["wall_s"] for r in runs), 1),
+        "bytes_per_answer": statistics.median(r["bytes"] for r in runs),
+        "cpu_ms_per_answer": round(statistics.median(r["cpu_s"] for r in runs) * 1000, 3),
+        "wall_ms_per_answer": round(statistics.median(r["wall_s"] for r in runs) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=300, help="tokens per answer")
+    parser.add_argument("--gap-ms", type=float, default=4.0, help="time between model tokens")
+    parser.add_argument("--window-ms", type=float, default=30.0)
+    parser.add_argument("--max-bytes", type=int, default=512)
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    gap = args.gap_ms / 1000
+    answers = [synthetic_tokens(args.tokens, seed) for seed in range(args.answers)]
+    variants = {
+        "per_token": lambda i: per_token_frames(answers[i], gap),
+        "batched": lambda i: batched_frames(answers[i], gap, args.window_ms, args.max_bytes),
+    }
+    results = {}
+    for name, make_stream in variants.items():
+        for gzip in (False, True):
+            label = name + ("+gzip" if gzip else "")
+            results[label] = measure(make_stream, args.answers, gzip)
+            r = results[label]
+            print(f"{label:>16}: {r['frames_per_answer']:>5} frames/answer  {r['frames_per_s']:>7} frames/s  "
+                  f"{r['bytes_per_answer']:>7} bytes  {r['cpu_ms_per_answer']:.2f} ms CPU/answer")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
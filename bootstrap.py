@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import duckdb
+
+from history_store import ensure_history_table
+from ingest import CATEGORICAL_ENUMS, table_name_for
+from categoricals import encode_categoricals
+from percentiles import build_percentile_table
+from scraping_functions.standardized_scraping_function import STAT_CONFIG, cast_column_sql, column_type
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+# local database the app uses with DUCKDB_PATH=data/fbref_local.duckdb
+DEFAULT_DB_PATH = os.getenv("BOOTSTRAP_DB_PATH", "data/fbref_local.duckdb")
+
+# CSV snapshot -> stat_type; all of them are the 2024-2025 Premier League
+CSV_SNAPSHOTS = {
+    "Premier League_2025/standard_stats.csv": "standard",
+    "Premier League_2025/defensive_stats.csv": "defensive",
+    "Premier League_2025/keeper_stats.csv": "keeper",
+    "Prem player_shooting_stats.csv": "shooting",
+    "Prem player_passing_stats.csv": "passing",
+    "Prem player_possession_stats.csv": "possession",
+}
+SNAPSHOT_COMPETITION = "Premier-League"
+SNAPSHOT_SEASON = "2024-2025"
+
+# STAT_CONFIG column -> CSV header where the snapshot uses a different name
+CSV_COLUMN_NAMES = {
+    "expected_goals(xG)": "xG",
+}
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def csv_header(path):
+    with open(path, encoding="utf-8") as f:
+        return f.readline().rstrip("\r\n").split(",")
+
+
+def snapshot_select(path, stat_type, competition=SNAPSHOT_COMPETITION, season=SNAPSHOT_SEASON):
+    """SELECT turning one CSV snapshot into the table ingest.py writes for it.
+
+    Columns come out in STAT_CONFIG order followed by season and competition, typed like
+    convert_types() types the scraped strings ("2,508" -> 2508, "24-123" -> 24).
+    Columns the snapshot doesn't have are NULL.
+    """
+    header = csv_header(path)
+    # read as text - the thousands separators and "years-days" ages are handled in the cast
+    csv_types = ", ".join(f"'{column}': 'VARCHAR'" for column in header)
+    expressions = []
+    for column in [c for c in STAT_CONFIG[stat_type]["columns"] if c]:
+        source = CSV_COLUMN_NAMES.get(column, column)
+        sql_type = column_type(column)
+        if source not in header:
+            expressions.append(f"CAST(NULL AS {sql_type}) AS {quote(column)}")
+        elif sql_type == "VARCHAR":
+            expressions.append(f"NULLIF(trim({quote(source)}), '') AS {quote(column)}")
+        else:
+            expressions.append(f"{cast_column_sql(quote(source), column)} AS {quote(column)}")
+    # some snapshots carry "24/25" / "Premier League" - the tables use ingest's values
+    expressions.append(f"'{season}' AS season")
+    expressions.append(f"'{competition}' AS competition")
+    csv_path = str(path).replace("'", "''")
+    return (
+        f"SELECT {', '.join(expressions)} "
+        f"FROM read_csv('{csv_path}', header = true, columns = {{{csv_types}}})"
+    )
+
+
+def load_snapshot(con, rel_path, stat_type, data_dir=DATA_DIR):
+    table = table_name_for(stat_type, SNAPSHOT_COMPETITION, SNAPSHOT_SEASON)
+    cur = con.cursor()
+    try:
+        cur.execute(f"CREATE OR REPLACE TABLE main.{quote(table)} AS {snapshot_select(Path(data_dir) / rel_path, stat_type)}")
+        return table, cur.execute(f"SELECT count(*) FROM main.{quote(table)}").fetchone()[0]
+    finally:
+        cur.close()
+
+
+def bootstrap_db(path=DEFAULT_DB_PATH, snapshots=None, data_dir=DATA_DIR, workers=4, derived=True):
+    """Create (or refresh) a local DuckDB file from the bundled CSV snapshots - no network, no token.
+
+    Every snapshot is read on its own cursor in parallel. With derived=True the
+    player_percentiles table is built too; categorical columns become ENUMs like ingest
+    makes them. Returns {table: rows}.
+    """
+    snapshots = snapshots or CSV_SNAPSHOTS
+    con = duckdb.connect(str(path))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            loaded = dict(pool.map(lambda item: load_snapshot(con, item[0], item[1], data_dir), snapshots.items()))
+        ensure_history_table(con)
+        if derived:
+            loaded["player_percentiles"] = build_percentile_table(con)
+        if CATEGORICAL_ENUMS:
+            encode_categoricals(con)
+    finally:
+        con.close()
+    return loaded
+
+
+if __name__ == "__main__":
+    #   python bootstrap.py [path]  ->  then run the app with DUCKDB_PATH=<path>
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH
+    start = time.perf_counter()
+    tables = bootstrap_db(db_path)
+    for table, rows in tables.items():
+        print(f"✅ Stored {rows} rows into {db_path}:{table}")
+    print(f"Bootstrapped {db_path} in {time.perf_counter() - start:.2f}s - run the app with DUCKDB_PATH={db_path}")
@@ -0,0 +1,93 @@
+from percentiles import TABLE_NAME as PERCENTILE_TABLE
+from query_templates import TABLE_NAME_RE
+
+# low-cardinality text columns stored as one shared ENUM type each: a 1-byte code per row
+# instead of the string, integer group-bys, and UNION ALL across leagues keeps the type
+CATEGORICAL_TYPES = {
+    "team": "team_t",
+    "nation": "nation_t",
+    "position": "position_t",
+    "competition": "competition_t",
+    "season": "season_t",
+}
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def categorical_tables(con):
+    """Stats tables plus player_percentiles - the tables the LLM filters and groups on."""
+    tables = con.execute("SHOW TABLES").fetchdf()["name"].tolist()
+    return [t for t in tables if TABLE_NAME_RE.match(t) or t == PERCENTILE_TABLE]
+
+
+def column_types(con, table):
+    rows = con.execute(
+        "SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = 'main' AND table_name = ?",
+        [table],
+    ).fetchall()
+    return dict(rows)
+
+
+def enum_values(con, type_name):
+    """Values of an existing ENUM type (in order), or None if it doesn't exist yet."""
+    exists = con.execute(
+        "SELECT 1 FROM duckdb_types() WHERE schema_name = 'main' AND type_name = ?", [type_name]
+    ).fetchall()
+    if not exists:
+        return None
+    return con.execute(f"SELECT unnest(enum_range(NULL::{type_name}))").fetchdf().iloc[:, 0].tolist()
+
+
+def encode_categoricals(con, tables=None):
+    """Store every CATEGORICAL_TYPES column of the given tables as its shared ENUM type.
+
+    A value no table had before (a promoted team, a new nation) extends the type: it is
+    re-created with the old and new values and every column using it is re-typed. Values
+    are kept sorted, so ORDER BY team still sorts alphabetically. Idempotent - tables
+    already on the current types are left alone. Returns {column: number of values}.
+    """
+    tables = categorical_tables(con) if tables is None else tables
+    types = {table: column_types(con, table) for table in tables}
+    counts = {}
+    con.execute("BEGIN TRANSACTION")
+    try:
+        current = {}
+        for column, type_name in CATEGORICAL_TYPES.items():
+            holders = [t for t in tables if column in types[t]]
+            if not holders:
+                continue
+            seen = set()
+            for table in holders:
+                seen.update(v for (v,) in con.execute(
+                    f"SELECT DISTINCT CAST({quote(column)} AS VARCHAR) FROM main.{quote(table)}"
+                ).fetchall() if v is not None)
+
+            existing = enum_values(con, type_name)
+            if existing is None or not seen <= set(existing):
+                values = sorted(seen | set(existing or []))
+                if existing is not None:
+                    # DuckDB enums can't be extended in place; columns keep the old definition until re-typed below
+                    con.execute(f"DROP TYPE {type_name}")
+                con.execute(f"CREATE TYPE {type_name} AS ENUM ({', '.join(literal(v) for v in values)})")
+            else:
+                values = existing
+            current[column] = con.execute(f"SELECT typeof(NULL::{type_name})").fetchone()[0]
+            counts[column] = len(values)
+
+        for table in tables:
+            stale = [c for c in current if c in types[table] and types[table][c] != current[c]]
+            if stale:
+                # one rewrite per table - ALTER COLUMN TYPE per column leaves the old blocks allocated
+                casts = ", ".join(f"CAST({quote(c)} AS {CATEGORICAL_TYPES[c]}) AS {quote(c)}" for c in stale)
+                con.execute(f"CREATE OR REPLACE TABLE main.{quote(table)} AS SELECT * REPLACE ({casts}) FROM main.{quote(table)}")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return counts
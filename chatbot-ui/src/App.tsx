@@ -6,6 +6,9 @@ function App() {
   const [question, setQuestion] = useState('');
   const [chatHistory, setChatHistory] = useState<{ type: string; content: string }[]>([]);
   const [loading, setLoading] = useState(false);
+  // the Flask session cookie isn't sent back cross-site (localhost:3000 -> 127.0.0.1:5000),
+  // so the conversation is tied together by the session_id /ask returns
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const chatWindowRef = useRef<HTMLDivElement>(null);
 
   // Scroll to the bottom of the chat window
@@ -31,7 +34,7 @@ function App() {
           'Content-Type': 'application/json',
         },
         credentials: 'include',
-        body: JSON.stringify({ question }),
+        body: JSON.stringify({ question, session_id: sessionId }),
       });
 
       if (!response.ok) {
@@ -41,6 +44,7 @@ function App() {
       }
 
       const data = await response.json();
+      setSessionId(data.session_id);
       setChatHistory(data.chat_history);
       setQuestion('');
 
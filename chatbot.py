@@ -2,33 +2,49 @@ from flask import Flask, request, render_template, session, jsonify
 from dotenv import load_dotenv
 import os
 import duckdb
-from langchain.chains import LLMChain
 from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.tools import tool
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, messages_to_dict
-from langchain.memory import ChatMessageHistory
-import uuid, json
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, messages_to_dict
+from langchain_core.chat_history import InMemoryChatMessageHistory as ChatMessageHistory
+import uuid, json, time, hashlib, hmac, threading, queue
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from flask import Response, stream_with_context
+from flask_cors import CORS
+from query_templates import TemplateLibrary, normalize_question
+from name_index import NameIndex, format_name_hints
+from sql_pool import CursorPool
+from metrics import Trace, render_metrics, LLM_SECONDS, TTFT_SECONDS, SQL_SECONDS, RESULT_BYTES, HISTORY_SECONDS, ERRORS, CACHE_HITS, EXPORT_REQUESTS, EXPORT_BYTES, PROMPT_HISTORY_TOKENS, FAST_PATH, ANSWER_FRAMES, PROMPT_CONTEXT_TOKENS, SQL_VALIDATION, ANSWER_CACHE_SAVED_SECONDS, MODEL_TIER_SECONDS, MODEL_TIER_OUTCOMES
+from history_compaction import compact_messages
+from fast_render import render_fast_answer, stream_pieces
+from singleflight import SingleFlight, StreamFlight, normalize_sql
+from sse import TokenFrames, status_event, sse_event, END_OF_STREAM, accepts_gzip, gzip_stream
+from llm_scheduler import LLMScheduler, Overloaded
+from context_encoding import encode_context, context_sizes
+from sql_validation import ShadowCatalog, VALIDATION_ERROR, format_feedback, read_only_error
+from snapshots import ingest_version, snapshotted_tables
+from export import EXPORT_FORMATS, ExportError, exportable, table_query, encode_batches, export_filename, csv_unsupported_columns, parse_limit
+from answer_cache import AnswerCache
+from model_router import ModelRouter, FAST, STRONG
+from history_store import HISTORY_LIMIT, HistoryCompactor, ensure_history_table, read_history, append_message, clear_session
+
+# request threads must not run queries on the shared connection at the same time (results
+# get crossed) - each thread keeps its own cursor for history reads and writes
+_thread_cursors = threading.local()
+
+def thread_cursor():
+    cur = getattr(_thread_cursors, "cursor", None)
+    if cur is None:
+        cur = _thread_cursors.cursor = con.cursor()
+    return cur
 
 # function to get messages from the MotherDuck history database based on session_id
 def get_session_history(session_id: str):
     """Fetch the last 10 messages from MotherDuck for this session_id"""
-    rows = con.execute(
-        """
-        SELECT role, content
-        FROM chat_history
-        WHERE session_id = ?
-        ORDER BY created_at ASC
-        LIMIT 10
-        """, 
-        [session_id]
-    ).fetchall()
-
     messages = []
-    for role, content in rows:
+    for role, content in read_history(thread_cursor(), session_id, HISTORY_LIMIT):
         if role == "user":
             messages.append(HumanMessage(content=content))
         elif role == "assistant":
@@ -38,29 +54,33 @@ def get_session_history(session_id: str):
             messages.append(ToolMessage(content=content, tool_call_id="tool"))
     return ChatMessageHistory(messages=messages)
 
+# token budget for the history part of each prompt, and how many newest messages stay verbatim
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", "4"))
+
+def compact_history(messages, chain, keep_recent_tool_results=True):
+    """Compact history for one prompt and record its size before/after."""
+    compacted, sizes = compact_messages(
+        messages, HISTORY_TOKEN_BUDGET, HISTORY_KEEP_RECENT, keep_recent_tool_results
+    )
+    PROMPT_HISTORY_TOKENS.labels(chain, "raw").observe(sizes["raw_tokens"])
+    PROMPT_HISTORY_TOKENS.labels(chain, "compacted").observe(sizes["compacted_tokens"])
+    return compacted, sizes
+
+# history for the SQL-generation prompt - old tool results are replaced by short summaries
+def get_prompt_history(session_id: str):
+    messages, _ = compact_history(get_session_history(session_id).messages, "sql_generation")
+    return ChatMessageHistory(messages=messages)
+
 # function to save messages to the Motherduck history database
 def save_message(session_id: str, role: str, content: str):
-    """Insert a new message into MotherDuck and prune to last 10."""
-    con.execute(
-        "INSERT INTO chat_history (session_id, role, content) VALUES (?, ?, ?)",
-        [session_id, role, content]
-    )
+    """Append a message to MotherDuck; the background compactor trims old ones in bulk."""
+    append_message(thread_cursor(), session_id, role, content)
 
-    # prune to last 10 per session
-    con.execute(
-        """
-        DELETE FROM chat_history
-        WHERE session_id = ?
-          AND created_at NOT IN (
-              SELECT created_at
-              FROM chat_history
-              WHERE session_id = ?
-              ORDER BY created_at DESC
-              LIMIT 10
-          )
-        """,
-        [session_id, session_id]
-    )
+# idle sessions are dropped after HISTORY_TTL_HOURS; every session is trimmed to its newest
+# HISTORY_LIMIT messages - both by a background job instead of a prune on every write
+HISTORY_TTL_HOURS = int(os.getenv("HISTORY_TTL_HOURS", "72"))
+HISTORY_COMPACT_INTERVAL_S = int(os.getenv("HISTORY_COMPACT_INTERVAL_S", "600"))
 
 # create the flask web app
 app = Flask(__name__)
@@ -71,11 +91,74 @@ load_dotenv()
 # creates secret keys to encrypt session data
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "default_secret")
 
+# the React client (chatbot-ui, `npm start` on port 3000) calls /ask cross-origin. localhost:3000 ->
+# 127.0.0.1:5000 is cross-site, so the browser never sends the (SameSite=Lax) session cookie back -
+# the client keeps the session_id /ask returns and sends it in the body instead, see ask_session_id
+ASK_CORS_ORIGINS = os.getenv("ASK_CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",")
+CORS(app, resources={r"/ask": {"origins": ASK_CORS_ORIGINS}}, supports_credentials=True)
+
 # gets the motherduck token in the .env file
 MOTHERDUCK_TOKEN = os.getenv('MOTHERDUCK_TOKEN')
 DB_NAME = "fbref_soccer_stats"
-# Create the database connection URI
-con = duckdb.connect(f"md:{DB_NAME}?motherduck_token={os.getenv('MOTHERDUCK_TOKEN')}")
+# a local DuckDB file can stand in for MotherDuck (offline dev, CI, benchmarks)
+DUCKDB_PATH = os.getenv("DUCKDB_PATH")
+
+# no files, URLs or extensions and no SET for the SQL the app runs - a query can only read the database
+SANDBOX_CONFIG = {"enable_external_access": False, "lock_configuration": True}
+
+def connect():
+    if DUCKDB_PATH:
+        # one process can't open the file twice with different settings, so the whole local
+        # connection is sandboxed - the app never needs files beyond the database itself
+        return duckdb.connect(DUCKDB_PATH, config=SANDBOX_CONFIG)
+    # Create the database connection URI
+    return duckdb.connect(f"md:{DB_NAME}?motherduck_token={os.getenv('MOTHERDUCK_TOKEN')}")
+
+def connect_export():
+    """Connection the export API runs arbitrary SQL on, sandboxed whatever the SQL says."""
+    if DUCKDB_PATH:
+        # already sandboxed, see connect(); exports still get cursors of their own (export_pool)
+        return con
+    # SaaS mode: no local files, local databases, extensions or configuration changes
+    export_con = duckdb.connect(f"md:{DB_NAME}?motherduck_token={os.getenv('MOTHERDUCK_TOKEN')}&saas_mode=true")
+    export_con.execute("SET lock_configuration = true")
+    return export_con
+
+# pooled cursors + shared thread pool for running the model's tool calls concurrently
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "8"))
+# exports hold a cursor while the client downloads - they get their own, so slow downloads can't starve /chat
+EXPORT_POOL_SIZE = int(os.getenv("EXPORT_POOL_SIZE", "4"))
+# cap on how many of one request's tool calls run at the same time
+MAX_TOOL_CALLS_PER_REQUEST = int(os.getenv("MAX_TOOL_CALLS_PER_REQUEST", "4"))
+
+# per-process state, created by init_app() - never at import. gunicorn --preload imports this
+# module in the master, and a DuckDB connection (or thread pool) inherited across fork is unsafe.
+con = None
+sql_pool = None
+export_pool = None
+export_catalog = None
+tool_executor = None
+db_schema = None
+name_index = None
+template_library = None
+agent_system_prompt = None
+shadow_catalog = None
+history_compactor = None
+similarity_index = None
+llm = agent_llm = chain_scrape = llm_chain = chat_with_memory = None
+# "fast" / "strong" -> ModelTier, see install_llm()
+model_tiers = {}
+
+# coalesce identical in-flight work (match-day bursts of the same question) - set SINGLE_FLIGHT=0 to disable
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") == "1"
+# most requests that may wait on one in-flight call; the rest do their own work
+SINGLE_FLIGHT_MAX_WAITERS = int(os.getenv("SINGLE_FLIGHT_MAX_WAITERS", "64"))
+sql_flight = SingleFlight("run_sql", SINGLE_FLIGHT_MAX_WAITERS)
+generation_flight = SingleFlight("sql_generation", SINGLE_FLIGHT_MAX_WAITERS)
+answer_flight = StreamFlight("answer_stream", SINGLE_FLIGHT_MAX_WAITERS)
+
+def fingerprint(*parts):
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
 
 
 def get_schema_string():
@@ -87,18 +170,22 @@ def get_schema_string():
         for t in tables:
             full_name = f"main.{t}"  # ✅ prepend main
             df = con.execute(f"DESCRIBE {full_name}").fetchdf()
-            schema_info[full_name] = dict(zip(df["column_name"], df["column_type"]))
+            # ENUM columns (team, nation, ...) print every value - to the LLM they are plain text
+            schema_info[full_name] = {
+                column: "VARCHAR" if column_type.startswith("ENUM(") else column_type
+                for column, column_type in zip(df["column_name"], df["column_type"])
+            }
         return json.dumps(schema_info, indent=2)
     except Exception as e:
         return f"Schema inspection error: {e}"
 
-# Later insert it into your system prompt
-db_schema = get_schema_string()
+def resolve_name(text):
+    found = name_index.lookup(text)
+    return found[:2] if found else None
 
 # Define the prompt template. Contains markdown rules for formatting
-# 3 variable inputs: chat_history, context, question
-template = """
-You are a helpful AI assistant who is knowledgeable about professional soccer. Your goal is to provide clear, well-structured, and insightful answers using Markdown.
+# (shared with the single-round-trip agent prompt below)
+answer_instructions = """You are a helpful AI assistant who is knowledgeable about professional soccer. Your goal is to provide clear, well-structured, and insightful answers using Markdown.
 
 **Response Formatting Instructions:**
 - Use Markdown for all your responses to ensure readability.
@@ -110,13 +197,16 @@ You are a helpful AI assistant who is knowledgeable about professional soccer. Y
 - Always put a blank line before starting a list.
 
 **Content Instructions:**
-- Answer the user's question based on the provided context, which is a JSON object containing player statistics.
+- Answer the user's question based on the provided context, which contains player statistics - either JSON or a table with a header row (`column = value (all rows)` lines apply to every row, `column codes:` lines give the values behind short codes).
 - The current season is 2024-2025.
 - You are allowed to give subjective opinions, but they must be directly supported by the statistics in the context.
 - If you cannot formulate an accurate answer from the context, politely say that you need more information or that the data isn't available.
 - Do not repeat information you have already mentioned.
 - **Do not output raw JSON data.** Instead, present the information in a user-friendly way.
+"""
 
+# 3 variable inputs: chat_history, context, question
+template = "\n" + answer_instructions + """
 Chat History:
 {chat_history}
 
@@ -135,10 +225,69 @@ prompt = PromptTemplate(
     template=template,
 )
 
+# single-round-trip mode: one model conversation calls run_sql and then writes the answer,
+# instead of the two chains below. Everything ahead of the history is static - rules first,
+# then the schema - so the prompt prefix stays byte-identical across requests for prompt caching.
+SINGLE_ROUND_TRIP = os.getenv("SINGLE_ROUND_TRIP", "0") == "1"
+# the last step runs without tools so the conversation always ends with an answer
+MAX_AGENT_STEPS = int(os.getenv("MAX_AGENT_STEPS", "3"))
+
+def build_agent_system_prompt(schema):
+    return answer_instructions + """
+**Data Access:**
+- You have a run_sql tool for a DuckDB database (MotherDuck). Before answering, call run_sql with a valid SQL query built from the schema below.
+- For run_sql, always call as: {"sql_query": "SELECT ...;"}. Never pass an empty arguments object.
+- Prefer UNION ALL across tables if the question spans multiple leagues or seasons, or make one run_sql call per table; all calls run in parallel.
+- Only select necessary columns, and always use ORDER BY and LIMIT for ranking-type queries (e.g., "most goals").
+- Once the tool results arrive, answer the user's question from them following the rules above.
+- If no relevant data exists in the schema, politely say that the data is unavailable.
+- For "who plays like X" / "players similar to X" questions, call the similar_players tool instead: {"player": "Rodri", "k": 5}.
+- For judgement questions about one player ("is Saliba an elite defender?", "how good is Pedri at passing?"), query `player_percentiles` for that player instead of a whole league table: `<stat>_pct` ranks them against the same position group in their league, `<stat>_pct_all` across all leagues (0-100, higher is always better; 90+ is elite). Select only the percentile columns relevant to the question.
+- Tables ending in `_history` hold one row per player per refresh in which their stats changed (`snapshot_at` is the refresh time); use them for trends within the season ("since matchweek 10", "over the last month").
+- Every table with a `_history` view also has a table macro `<table>_as_of(ts)` that returns the table as it was at that time, e.g. `SELECT name, goals FROM main."standard_Premier_League_2024_2025_as_of"(TIMESTAMP '2025-01-01')`.
+
+**Database Schema:**
+```json
+""" + schema + """
+```
+"""
+
 # set up agent - Gemini LLM and Langchain
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
-# llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite")
-# llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro")
+# (google-genai is the slowest import in the app, so it is only loaded when a worker starts)
+def make_default_llm(model_name="gemini-2.5-flash"):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    # rate-limit retries happen in the LLM scheduler (jittered, inside the admission limits)
+    return ChatGoogleGenerativeAI(model=model_name, max_retries=1)
+
+# two model tiers: simple lookups go to the fast model, comparisons / judgement calls / big results to
+# the strong one (model_router.py scores the question locally). A stage goes to the strong tier once the
+# score reaches its threshold - 0 pins it there. MODEL_ROUTING=0 sends everything to STRONG_MODEL.
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "1") == "1"
+FAST_MODEL = os.getenv("FAST_MODEL", "gemini-2.5-flash-lite")
+STRONG_MODEL = os.getenv("STRONG_MODEL", "gemini-2.5-flash")
+ROUTE_SQL_MIN_SCORE = int(os.getenv("ROUTE_SQL_MIN_SCORE", "2"))
+ROUTE_ANSWER_MIN_SCORE = int(os.getenv("ROUTE_ANSWER_MIN_SCORE", "2"))
+model_router = ModelRouter(
+    {"sql_generation": ROUTE_SQL_MIN_SCORE, "answer": ROUTE_ANSWER_MIN_SCORE}, enabled=MODEL_ROUTING
+)
+
+# admission control per model, per worker: LLM_MAX_CONCURRENCY calls at once, up to LLM_MAX_QUEUE
+# more waiting at most LLM_QUEUE_TIMEOUT_S each; beyond that /chat answers "busy" right away
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+BUSY_MESSAGE = "🤖 **Assistant:** *I'm handling a lot of questions right now - please try again in a few seconds.*"
+llm_schedulers = {}
+llm_scheduler = None
+
+def scheduler_for(model):
+    name = getattr(model, "model", None) or model._llm_type
+    if name not in llm_schedulers:
+        llm_schedulers[name] = LLMScheduler(
+            name, LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT_S, LLM_MAX_RETRIES
+        )
+    return llm_schedulers[name]
 
 # template for the tool caller LLM that scrapes appropriate data
 # defines rules for calling the scraper function in the correct format
@@ -160,6 +309,15 @@ Behavior Rules:
 2. Do not respond to the user directly. Your job is only to generate the appropriate tool call to get the data.
 3. If a question is about player ratings or subjective opinions, use the stats available to formulate the query.
 4. If no relevant data exists in the schema, respond with a polite message indicating that the data is unavailable.
+5. For "who plays like X" / "players similar to X" questions call similar_players instead of run_sql,
+   e.g. {{"player": "Rodri", "k": 5}} - optionally with "competition" (e.g. "La-Liga").
+6. For judgement questions about one player ("is Saliba an elite defender?"), query player_percentiles for that player
+   instead of a whole league table: <stat>_pct ranks against the same position group in their league, <stat>_pct_all
+   across all leagues (0-100, higher is always better). Select only the percentile columns relevant to the question.
+7. Tables ending in _history hold one row per player per refresh in which their stats changed (snapshot_at is the refresh time).
+   Use them for in-season trend questions, e.g. the latest row per player before a date vs the latest row overall.
+   Every table with a _history view also has a table macro <table>_as_of(ts) returning the table as it was at that time,
+   e.g. SELECT name, goals FROM main."standard_Premier_League_2024_2025_as_of"(TIMESTAMP '2025-01-01').
 
 Tool Call Rules:
    - Every tool call must include arguments in a JSON object.
@@ -167,14 +325,14 @@ Tool Call Rules:
    - Never pass an empty arguments object for run_sql.
 
 Instructions:
-- You may call multiple tools sequentially.
+- You may call multiple tools (e.g. one run_sql per league); all of them are run in parallel.
 - After tool calls are complete, do not generate a final human-readable answer. 
     That is a separate step in the chain. Your only output should be the tool call.
 """),
     # conversation history
     MessagesPlaceholder(variable_name="messages"),
-    # user question
-    ("user", "{question}")
+    # user question, followed by any player/team names resolved from the name index
+    ("user", "{question}{name_hints}")
 ]
 )
 
@@ -184,126 +342,901 @@ def run_sql(sql_query: str) -> str:
     """Run a raw SQL query against the DuckDB database.
     Must be called with a JSON object: {"sql_query": "SELECT ...;"}
     """
+    error = read_only_error(sql_query)
+    if error:
+        return f"SQL error: {error}"
+
+    def execute():
+        try:
+            with sql_pool.connection() as cur:
+                df = cur.execute(sql_query).fetchdf()
+            return df.to_json(orient="records")
+        except Exception as e:
+            return f"SQL error: {e}"
+
+    if not SINGLE_FLIGHT:
+        return execute()
+    # identical queries already running (same whitespace-normalized text) share one execution
+    result_json, _ = sql_flight.do(normalize_sql(sql_query), execute)
+    return result_json
+
+# tool for style questions SQL can't express - nearest neighbours over per-90 feature vectors
+@tool
+def similar_players(player: str, k: int = 5, competition: str = "", metric: str = "cosine") -> str:
+    """Find the players whose per-90 playing style is closest to a player ("who plays like Rodri?").
+    Compares players in the same position group across all leagues.
+    Must be called with a JSON object: {"player": "Rodri", "k": 5}; optional "competition"
+    (e.g. "La-Liga") and "metric" ("cosine" or "euclidean").
+    """
+    from similarity import similar_players_json
+    found = name_index.lookup(player, kind="player") if name_index else None
+    if not found and name_index:
+        # "palmer" - answering for whichever one has more minutes would be a guess
+        candidates = name_index.candidates(player, kind="player")
+        if len(candidates) > 1:
+            return (f"{player!r} could be any of: {', '.join(candidates)}. "
+                    "Ask the user which player they mean before comparing styles.")
+    return similar_players_json(similarity_index, found[0] if found else player, k, metric, competition)
+
+# runs one tool call on the tool thread pool and times it
+def execute_tool_call(tool_call):
+    start = time.perf_counter()
+    if tool_call["name"] == "run_sql":
+        # queries that don't bind against the shadow catalog never leave the process
+        if shadow_catalog:
+            error = shadow_catalog.validate(tool_call["args"].get("sql_query", ""))
+            SQL_SECONDS.labels("validation").observe(time.perf_counter() - start)
+            SQL_VALIDATION.labels("invalid" if error else "ok").inc()
+            if error:
+                return f"{VALIDATION_ERROR}: {error}", (time.perf_counter() - start) * 1000
+        result_json = run_sql.invoke(tool_call["args"])
+        SQL_SECONDS.labels("run_sql").observe(time.perf_counter() - start)
+        if result_json.startswith("SQL error"):
+            ERRORS.labels("sql_execution").inc()
+    elif tool_call["name"] == "similar_players":
+        result_json = similar_players.invoke(tool_call["args"])
+        SQL_SECONDS.labels("similarity").observe(time.perf_counter() - start)
+    else:
+        result_json = "Tool returned no data."
+    return result_json, (time.perf_counter() - start) * 1000
+
+def execute_tool_calls(tool_calls):
+    """Run every tool call concurrently (at most MAX_TOOL_CALLS_PER_REQUEST at once).
+    Returns [(result_json, elapsed_ms)] in the same order as tool_calls."""
+    results = [None] * len(tool_calls)
+    pending = {}
+    for i, tool_call in enumerate(tool_calls):
+        # wait for a free slot before submitting more of this request's calls
+        while len(pending) >= MAX_TOOL_CALLS_PER_REQUEST:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+        pending[tool_executor.submit(execute_tool_call, tool_call)] = i
+    for future in wait(pending).done:
+        results[pending[future]] = future.result()
+    return results
+
+def merge_tool_results(tool_calls, results):
+    """Combine several tool results into one context object; a single result is passed through."""
+    if len(results) == 1:
+        return results[0][0]
+    merged = []
+    for tool_call, (result_json, _) in zip(tool_calls, results):
+        try:
+            data = json.loads(result_json)
+        except ValueError:
+            # SQL errors and other plain-text results
+            data = result_json
+        sql = tool_call["args"].get("sql_query") or f"{tool_call['name']}({json.dumps(tool_call['args'])})"
+        merged.append({"sql": sql, "data": data})
+    return json.dumps({"results": merged})
+    
+class ModelTier:
+    """One chat model with its chains and its admission scheduler."""
+
+    def __init__(self, name, model):
+        # langchain proper pulls in most of its integrations - import it on first use only
+        from langchain.chains import LLMChain
+        self.name = name
+        self.llm = model
+        self.scheduler = scheduler_for(model)
+        self.agent_llm = model.bind_tools([run_sql, similar_players])
+
+        # compose a prompt for the LLM | tell it to return structured call response instead of plain string
+        self.chain_scrape = prompt_scrape | self.agent_llm
+
+        # define the chain for the LLM that gives the final response
+        # takes in structured context and JSON data
+        self.llm_chain = LLMChain(prompt=prompt, llm=model)
+
+        # history is inserted automatically before each run of the chain
+        self.chat_with_memory = RunnableWithMessageHistory(
+            self.chain_scrape,
+            # calls function to get the compacted history with session_id
+            get_prompt_history,
+            # new user input goes into question slot
+            input_messages_key="question",
+            # prior messages go into message slot
+            history_messages_key="messages"
+        )
+
+    def call(self, stage, fn):
+        """self.scheduler.call(fn), timed and counted per tier."""
+        start = time.perf_counter()
+        try:
+            result = self.scheduler.call(fn)
+        except Overloaded:
+            MODEL_TIER_OUTCOMES.labels(self.name, stage, "busy").inc()
+            raise
+        except Exception:
+            MODEL_TIER_OUTCOMES.labels(self.name, stage, "error").inc()
+            raise
+        MODEL_TIER_SECONDS.labels(self.name, stage).observe(time.perf_counter() - start)
+        return result
+
+# (re)builds the chains around the chat models - the offline benchmarks swap in fake models here.
+# model serves both tiers unless strong_model is given.
+def install_llm(model, strong_model=None):
+    global llm, agent_llm, chain_scrape, llm_chain, chat_with_memory, llm_scheduler
+    strong = ModelTier(STRONG, model if strong_model is None else strong_model)
+    model_tiers[STRONG] = strong
+    model_tiers[FAST] = strong if strong_model is None else ModelTier(FAST, model)
+
+    # the single-round-trip agent isn't routed - it runs on the strong tier
+    llm, agent_llm, chain_scrape = strong.llm, strong.agent_llm, strong.chain_scrape
+    llm_chain, chat_with_memory, llm_scheduler = strong.llm_chain, strong.chat_with_memory, strong.scheduler
+
+_init_lock = threading.Lock()
+ready = False
+
+def load_similarity_index():
+    """Load (or build) the similarity index off the startup path - it needs every stats table."""
+    global similarity_index
+    # numpy and pandas come in with it - on the loader thread, not at import
+    from similarity import load_or_build
+    cur = con.cursor()
     try:
-        df = con.execute(sql_query).fetchdf()
-        return df.to_json(orient="records")
+        similarity_index = load_or_build(cur, ingest_version(cur))
     except Exception as e:
-        return f"SQL error: {e}"
-    
-# compose a prompt for the LLM | tell it to return structured call response instead of plain string
-chain_scrape = prompt_scrape | llm.bind_tools([run_sql])
-
-# define the chain for the LLM that gives the final response
-# takes in structured context and JSON data
-llm_chain = LLMChain(prompt=prompt, llm=llm)
-
-# history is inserted automatically before each run of the chain
-chat_with_memory = RunnableWithMessageHistory(
-    chain_scrape,
-    # calls function to get full history with session_id
-    get_session_history,
-    # new user input goes into question slot
-    input_messages_key="question",
-    # prior messages go into message slot
-    history_messages_key="messages"
-)
+        print(f"Similarity index unavailable: {e}")
+    finally:
+        cur.close()
 
-@app.route('/')
-def home():
-    return render_template("index.html")
+def init_app(model=None, strong_model=None):
+    """Per-process startup: DuckDB connection, schema, name index, templates and the LLM chains.
 
-# route clears the MotherDuck history database 
-@app.route("/clear_history", methods=["POST"])
-def clear_history():
-    con.execute("DELETE FROM chat_history")
-    session.pop("session_id", None)  # optional, reset Flask cookie
-    return jsonify({"message": "All chat history cleared successfully"})
+    gunicorn runs it in post_fork (see gunicorn.conf.py); otherwise the first request does.
+    Only the first call does the work. model (and strong_model for a second tier) replace
+    Gemini - the offline benchmarks pass fakes.
+    """
+    global con, sql_pool, tool_executor, db_schema, agent_system_prompt, name_index, template_library
+    global shadow_catalog, history_compactor, export_pool, export_catalog, ready
+    with _init_lock:
+        if not ready:
+            start = time.perf_counter()
+            con = connect()
+            sql_pool = CursorPool(con, SQL_POOL_SIZE)
+            tool_executor = ThreadPoolExecutor(max_workers=SQL_POOL_SIZE, thread_name_prefix="tool")
 
-@app.route("/chat")
-def chat():
-    def generate_response():
-        if "session_id" not in session:
-            # assign a new session ID - UUID - for first time user visits page
-            session["session_id"] = str(uuid.uuid4())
-        session_id = session["session_id"]
+            try:
+                ensure_history_table(con)
+                history_compactor = HistoryCompactor(
+                    con, HISTORY_TTL_HOURS, HISTORY_LIMIT, HISTORY_COMPACT_INTERVAL_S
+                )
+                history_compactor.start()
+            except Exception as e:
+                print(f"History compaction unavailable: {e}")
 
-        # get the question from the user prompt box in the HTML page
-        user_question = request.args.get("message")
-        # looks in query string - if missing ends streaming event
-        if not user_question:
-            yield f"data: {json.dumps('I am sorry, I did not receive a question. Please try again.')}\n\n"
-            return
-        print('User Question: ', user_question)
+            # Later insert it into your system prompt
+            db_schema = get_schema_string()
+            agent_system_prompt = build_agent_system_prompt(db_schema)
 
-        # Get the full history by accessing session_id (ChatMessageHistory Object)
-        full_history = get_session_history(session_id)
+            # empty local copy of the schema - generated SQL is bound and planned here before MotherDuck sees it
+            try:
+                shadow_catalog = ShadowCatalog(json.loads(db_schema), DB_NAME)
+            except Exception as e:
+                print(f"Shadow catalog unavailable: {e}")
+                shadow_catalog = None
 
-        # Add the user's message to the MotherDuck Database
-        save_message(session_id, "user", user_question)
+            # the export API only sees the stats tables and player_percentiles - not chat_history
+            try:
+                export_catalog = ShadowCatalog(
+                    {t: c for t, c in json.loads(db_schema).items() if exportable(t.split(".")[-1])}, DB_NAME
+                )
+                export_pool = CursorPool(connect_export(), EXPORT_POOL_SIZE)
+            except Exception as e:
+                print(f"Export API unavailable: {e}")
+                export_catalog = export_pool = None
+
+            # trigram index over every player name and team, so "Mo Salah" becomes name = 'Mohamed Salah'
+            name_index = NameIndex()
+            try:
+                name_index.refresh(con)
+            except Exception as e:
+                print(f"Name index unavailable: {e}")
+
+            # parameterized SQL for the frequent question shapes - matches skip the SQL-generation LLM
+            try:
+                template_library = TemplateLibrary(json.loads(db_schema))
+                template_library.load_teams(con)
+                template_library.resolver = resolve_name
+            except Exception as e:
+                print(f"Template library unavailable: {e}")
+                template_library = None
+
+            # similar_players answers "still loading" until this finishes
+            threading.Thread(target=load_similarity_index, name="similarity-index", daemon=True).start()
+            print(f"Worker {os.getpid()} initialized in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        if model is not None:
+            install_llm(model, strong_model)
+        elif llm is None:
+            if MODEL_ROUTING:
+                install_llm(make_default_llm(FAST_MODEL), make_default_llm(STRONG_MODEL))
+            else:
+                install_llm(make_default_llm(STRONG_MODEL))
+        # set last - ensure_initialized() reads it without the lock, so requests must not see a
+        # ready worker whose LLM chains aren't installed yet
+        ready = True
+
+# gunicorn workers are already initialized by post_fork; `flask run` and app.run() start here
+@app.before_request
+def ensure_initialized():
+    if not ready:
+        init_app()
+
+def failed_sql(tool_calls, results):
+    """(sql, error, rejected_by_validation) for every tool call whose SQL didn't produce rows."""
+    failures = []
+    for tool_call, (result_json, _) in zip(tool_calls, results):
+        if result_json.startswith(VALIDATION_ERROR):
+            failures.append((tool_call["args"].get("sql_query"), result_json[len(VALIDATION_ERROR) + 2:], True))
+        elif result_json.startswith("SQL error"):
+            failures.append((tool_call["args"].get("sql_query"), result_json[len("SQL error: "):], False))
+    return failures
 
+# SQL-generation path for questions no template covers
+def generate_context_with_llm(session_id, user_question, full_history, trace):
+    # resolve fuzzy names before SQL generation so the query uses exact canonical keys
+    mentions = name_index.find_mentions(user_question)
+    name_hints = format_name_hints(mentions)
+    tier_name, score, _ = model_router.route("sql_generation", user_question, len(mentions))
+    tier = model_tiers[tier_name]
+    trace.set(sql_tier=tier_name, complexity=score)
+
+    def generate(tier, feedback=""):
         # The chain returns an AIMessage object - either scraper call or string content
-        ai_message = chat_with_memory.invoke(
+        return tier.chat_with_memory.invoke(
             {"question": user_question,
+             "name_hints": name_hints + feedback,
              "db_schema": db_schema,
              "messages": full_history.messages},
             # internally pupulates MessagePlaceholder in the prompt
             config={"configurable": {"session_id": session_id}}
         )
-        print('AI Tool Call: ', ai_message)
 
-        # if the LLM decides to call a tool
-        if ai_message.tool_calls:
-            tool_call = ai_message.tool_calls[0]  # take the first tool call
-            # Get the name and arguments from the tool call
-            tool_name = tool_call["name"] 
-            tool_args = tool_call["args"]
+    with trace.span("sql_generation", LLM_SECONDS.labels("sql_generation")):
+        if SINGLE_FLIGHT:
+            # same canonical question on the same history (usually a fresh session) and model -> one LLM call
+            key = fingerprint(
+                tier.scheduler.model,
+                normalize_question(user_question),
+                *(f"{msg.type}: {msg.content}" for msg in full_history.messages),
+            )
+            ai_message, shared = generation_flight.do(key, lambda: tier.call("sql_generation", lambda: generate(tier)))
+            trace.set(sql_generation_shared=shared)
+        else:
+            ai_message = tier.call("sql_generation", lambda: generate(tier))
+    print('AI Tool Call: ', ai_message)
 
-            if tool_name == "run_sql":
-                result_json = run_sql.invoke(tool_args)
-            else:
-                result_json = "Tool returned no data."
+    # if the LLM decides to call tools - e.g. one run_sql per league - run all of them
+    if ai_message.tool_calls:
+        with trace.span("sql_execution"):
+            results = execute_tool_calls(ai_message.tool_calls)
+        failures = failed_sql(ai_message.tool_calls, results)
+        MODEL_TIER_OUTCOMES.labels(tier.name, "sql_generation", "failed" if failures else "ok").inc()
 
-            # Add the tool's result to MotherDuck database
+        # failed SQL from the fast tier is regenerated on the strong one; the strong tier itself
+        # gets one regeneration only when the shadow catalog rejected a query
+        retry_tier = model_router.escalate("sql_generation", tier.name) if failures else None
+        if retry_tier is None:
+            failures = [failure for failure in failures if failure[2]]
+        if failures:
+            retry = model_tiers[retry_tier or tier.name]
+            print(f'SQL failed, regenerating on the {retry.name} tier: ', failures)
+            feedback = format_feedback([(sql, error) for sql, error, _ in failures])
+            with trace.span("sql_regeneration", LLM_SECONDS.labels("sql_regeneration")):
+                retry_message = retry.call("sql_regeneration", lambda: generate(retry, feedback))
+            if retry_message.tool_calls:
+                ai_message = retry_message
+                with trace.span("sql_execution"):
+                    results = execute_tool_calls(ai_message.tool_calls)
+            still_failed = failed_sql(ai_message.tool_calls, results)
+            MODEL_TIER_OUTCOMES.labels(retry.name, "sql_regeneration", "failed" if still_failed else "ok").inc()
+            if any(validation for _, _, validation in failures):
+                SQL_VALIDATION.labels(
+                    "regenerated_invalid" if any(v for _, _, v in still_failed) else "regenerated_ok"
+                ).inc()
+            trace.set(sql_regenerated=True, sql_escalated=retry_tier is not None)
+        print('Tool Timings (ms): ', [round(elapsed_ms, 1) for _, elapsed_ms in results])
+        trace.set(tool_calls=len(results), tool_ms=[round(elapsed_ms, 1) for _, elapsed_ms in results])
+        result_json = merge_tool_results(ai_message.tool_calls, results)
+        RESULT_BYTES.observe(len(result_json))
+
+        # Add the tool's result to MotherDuck database
+        with trace.span("history_write", HISTORY_SECONDS.labels("write")):
             save_message(session_id, "tool", result_json)
 
-            # Use tool result as context
-            final_context = result_json
+        # Use tool result as context
+        return result_json
+    # If no tool call, use AI’s direct response
+    return ai_message.content
+
+# text of a streamed chunk - Gemini sometimes sends a list of content parts
+def chunk_text(chunk):
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(part.get("text", "") for part in chunk.content if isinstance(part, dict))
+
+def stream_single_round_trip(session_id, user_question, trace):
+    """Yield answer tokens from one conversation that runs the model's run_sql calls and then answers."""
+    with trace.span("history_read", HISTORY_SECONDS.labels("read")):
+        history, _ = compact_history(get_session_history(session_id).messages, "agent")
+    name_hints = format_name_hints(name_index.find_mentions(user_question))
+    messages = [SystemMessage(content=agent_system_prompt), *history, HumanMessage(content=user_question + name_hints)]
+
+    for step in range(MAX_AGENT_STEPS):
+        model = agent_llm if step < MAX_AGENT_STEPS - 1 else llm
+        gathered = None
+        with trace.span("agent_step", LLM_SECONDS.labels("agent")):
+            for chunk in llm_scheduler.stream(lambda: model.stream(messages)):
+                gathered = chunk if gathered is None else gathered + chunk
+                token = chunk_text(chunk)
+                if token:
+                    yield token
+        if gathered is None or not gathered.tool_calls:
+            return
+
+        # feed the tool results back into the same conversation
+        with trace.span("sql_execution"):
+            results = execute_tool_calls(gathered.tool_calls)
+        trace.set(tool_calls=len(results), tool_ms=[round(elapsed_ms, 1) for _, elapsed_ms in results])
+        result_json = merge_tool_results(gathered.tool_calls, results)
+        RESULT_BYTES.observe(len(result_json))
+        with trace.span("history_write", HISTORY_SECONDS.labels("write")):
+            save_message(session_id, "tool", result_json)
+
+        messages.append(AIMessage(content=gathered.content, tool_calls=gathered.tool_calls))
+        for tool_call, (tool_result, _) in zip(gathered.tool_calls, results):
+            content = prompt_context(tool_result, trace) if CONTEXT_ENCODING else tool_result
+            messages.append(ToolMessage(content=content, tool_call_id=tool_call["id"]))
+
+# SQL results go into prompts as header + rows instead of records JSON - set CONTEXT_ENCODING=0 to send raw JSON
+CONTEXT_ENCODING = os.getenv("CONTEXT_ENCODING", "1") == "1"
+
+def prompt_context(context, trace):
+    """Encode a result for a prompt and record how many tokens that saved."""
+    encoded = encode_context(context)
+    sizes = context_sizes(context, encoded)
+    PROMPT_CONTEXT_TOKENS.labels("raw").observe(sizes["raw_tokens"])
+    PROMPT_CONTEXT_TOKENS.labels("encoded").observe(sizes["encoded_tokens"])
+    trace.set(context_tokens_raw=sizes["raw_tokens"], context_tokens=sizes["encoded_tokens"])
+    return encoded
+
+# finished answers by (canonical question, SQL result, answer prompt, model) - dropped when the
+# ingest version changes; set ANSWER_CACHE=0 to always generate
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+# pause between replayed lines, so a cached answer still reads like a stream (0 = all at once)
+ANSWER_CACHE_REPLAY_MS = float(os.getenv("ANSWER_CACHE_REPLAY_MS", "15"))
+# changes whenever the answer prompt (or what goes into it) does
+ANSWER_PROMPT_VERSION = fingerprint(prompt.template, f"context_encoding={CONTEXT_ENCODING}")[:12]
+answer_cache = AnswerCache(ANSWER_CACHE_MAX_BYTES)
+
+def replay_answer(text):
+    for piece in text.splitlines(keepends=True):
+        yield piece
+        if ANSWER_CACHE_REPLAY_MS:
+            time.sleep(ANSWER_CACHE_REPLAY_MS / 1000)
+
+@app.route('/')
+def home():
+    return render_template("index.html")
+
+# route clears this user's history in the MotherDuck history database
+@app.route("/clear_history", methods=["POST"])
+def clear_history():
+    session_id = session.pop("session_id", None)  # also resets the Flask cookie
+    if session_id:
+        clear_session(thread_cursor(), session_id)
+    return jsonify({"message": "Chat history cleared successfully"})
+
+# set FAST_RENDER=0 to always send results through the answer LLM
+FAST_RENDER = os.getenv("FAST_RENDER", "1") == "1"
+
+# answer tokens are coalesced into one SSE frame per window (the first token is always sent alone)
+SSE_WINDOW_MS = float(os.getenv("SSE_WINDOW_MS", "30"))
+SSE_MAX_BYTES = int(os.getenv("SSE_MAX_BYTES", "512"))
+# gzip the event stream for clients that accept it
+SSE_GZIP = os.getenv("SSE_GZIP", "0") == "1"
+
+def stream_token_frames(tokens, trace):
+    """Yield batched `token` frames for a token iterator; the full answer text is the return value."""
+    frames = TokenFrames(SSE_WINDOW_MS, SSE_MAX_BYTES)
+    for token in tokens:
+        if not frames.parts:
+            TTFT_SECONDS.observe(trace.elapsed())
+        frame = frames.add(token)
+        if frame:
+            yield frame
+    frame = frames.flush()
+    if frame:
+        yield frame
+    ANSWER_FRAMES.observe(frames.frames)
+    trace.set(tokens=len(frames.parts), token_frames=frames.frames, stream_bytes=frames.bytes_sent)
+    return frames.text()
+
+# how much traffic the query templates answer and the latency they save
+@app.route("/template_stats")
+def template_stats():
+    if not template_library:
+        return jsonify({"error": "Template library unavailable"}), 503
+    return jsonify(template_library.coverage_report())
+
+# Prometheus scrape endpoint - aggregates every gunicorn worker (see gunicorn.conf.py)
+@app.route("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, mimetype=content_type)
+
+# data changes only when an ingest refresh adds a snapshot version; checked at most every
+# INGEST_VERSION_TTL_S per worker
+INGEST_VERSION_TTL_S = float(os.getenv("INGEST_VERSION_TTL_S", "60"))
+ingest_version_checked = (0.0, None, set())
+
+def _ingest_state():
+    global ingest_version_checked
+    checked_at, version, tables = ingest_version_checked
+    if version is None or time.monotonic() - checked_at > INGEST_VERSION_TTL_S:
+        with sql_pool.connection() as cur:
+            version, tables = ingest_version(cur), snapshotted_tables(cur)
+        ingest_version_checked = (time.monotonic(), version, tables)
+    return version, tables
+
+def current_ingest_version():
+    return _ingest_state()[0]
+
+def export_etag(sql, params, fmt):
+    """ETag for an export, or None when the query reads a table the ingest version doesn't
+    follow (player_percentiles, CTEs, a bootstrap DB with no snapshots) - nothing would change it."""
+    version, tables = _ingest_state()
+    _, referenced = export_catalog.references(sql)
+    if version == "0" or not referenced <= tables:
+        return None
+    return fingerprint(version, fmt, normalize_sql(sql), json.dumps(params))
+
+# bulk export API - results stream straight from DuckDB record batches, no LLM involved
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "65536"))
+# how long an export waits for a pooled cursor before answering 503
+EXPORT_POOL_TIMEOUT_S = float(os.getenv("EXPORT_POOL_TIMEOUT_S", "5"))
+# exports need "Authorization: Bearer <token>"; without EXPORT_API_TOKEN the API is off unless
+# EXPORT_API_PUBLIC=1 opens it deliberately (local dev)
+EXPORT_API_TOKEN = os.getenv("EXPORT_API_TOKEN")
+EXPORT_API_PUBLIC = os.getenv("EXPORT_API_PUBLIC", "0") == "1"
+
+def export_auth_error(fmt):
+    """Error response for a request without a valid token, otherwise None."""
+    if not EXPORT_API_TOKEN:
+        if EXPORT_API_PUBLIC:
+            return None
+        return export_error(fmt, "unauthorized", "Export API disabled - set EXPORT_API_TOKEN", 403)
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {EXPORT_API_TOKEN}"):
+        return export_error(fmt, "unauthorized", "Missing or invalid export token", 401)
+    return None
+
+def export_error(fmt, outcome, message, status):
+    EXPORT_REQUESTS.labels(fmt, outcome).inc()
+    return jsonify({"error": message}), status
+
+def export_response(sql, params, fmt, name):
+    """Stream the result of a read-only query in fmt, with an ETag for the current data."""
+    error = export_auth_error(fmt)
+    if error:
+        return error
+    if export_pool is None or export_catalog is None:
+        return export_error(fmt, "error", "Export API unavailable", 503)
+    if fmt not in EXPORT_FORMATS:
+        return export_error("unknown", "rejected", f"Unknown format {fmt!r} (use one of {', '.join(EXPORT_FORMATS)})", 400)
+    # the regex is a quick first filter; binding against the sandboxed export catalog is the real check
+    error = read_only_error(sql) or export_catalog.validate(sql, strict=True, params=params)
+    if error:
+        return export_error(fmt, "rejected", error, 400)
+
+    etag = export_etag(sql, params, fmt)
+    if etag and request.if_none_match.contains(etag):
+        EXPORT_REQUESTS.labels(fmt, "not_modified").inc()
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+    # the cursor stays checked out until the response is closed (finished or client gone)
+    stack = ExitStack()
+    try:
+        cur = stack.enter_context(export_pool.connection(timeout=EXPORT_POOL_TIMEOUT_S))
+        reader = cur.execute(sql, params).fetch_record_batch(EXPORT_BATCH_ROWS)
+    except queue.Empty:
+        stack.close()
+        return export_error(fmt, "busy", "All database connections are busy, try again shortly", 503)
+    except duckdb.Error as e:
+        stack.close()
+        return export_error(fmt, "error", f"SQL error: {e}", 400)
+    if fmt == "csv":
+        unsupported = csv_unsupported_columns(reader.schema)
+        if unsupported:
+            stack.close()
+            return export_error(fmt, "rejected", (
+                f"CSV can't hold nested or interval columns ({', '.join(unsupported)}) - "
+                "cast them to VARCHAR or use format=arrow or parquet"), 400)
+
+    def generate():
+        for chunk in encode_batches(reader, fmt):
+            EXPORT_BYTES.labels(fmt).inc(len(chunk))
+            yield chunk
+        EXPORT_REQUESTS.labels(fmt, "ok").inc()
+
+    mimetype, _ = EXPORT_FORMATS[fmt]
+    headers = {
+        "Cache-Control": "no-cache",
+        "Content-Disposition": f'attachment; filename="{export_filename(name, fmt)}"',
+    }
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+    response = Response(generate(), mimetype=mimetype, headers=headers)
+    response.call_on_close(stack.close)
+    return response
+
+# arbitrary read-only SQL: GET ?sql=...&format=arrow|parquet|csv, or POST {"sql": ..., "format": ...}
+@app.route("/api/query", methods=["GET", "POST"])
+def api_query():
+    args = request.args
+    if request.method == "POST":
+        args = request.get_json(silent=True) or {}
+    sql = (args.get("sql") or "").strip()
+    fmt = args.get("format", "arrow")
+    if not sql:
+        return export_error(fmt, "rejected", "Missing sql", 400)
+    return export_response(sql, [], fmt, "query")
+
+# one table with projection and filters pushed into the query:
+# /api/table/<name>?columns=name,team,goals&filter=goals:ge:10&filter=team:in:Arsenal,Chelsea&order=goals:desc&limit=100
+@app.route("/api/table/<name>")
+def api_table(name):
+    fmt = request.args.get("format", "arrow")
+    # before the table lookup, so a 404 doesn't tell an anonymous caller which tables exist
+    error = export_auth_error(fmt)
+    if error:
+        return error
+    table_columns = export_catalog.tables.get(name) if export_catalog else None
+    if table_columns is None:
+        return export_error(fmt, "rejected", f"Unknown table {name!r}", 404)
+    columns = [c for c in request.args.get("columns", "").split(",") if c]
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        sql, params = table_query(
+            name, table_columns, columns, request.args.getlist("filter"), request.args.get("order"), limit
+        )
+    except ExportError as e:
+        return export_error(fmt, "rejected", str(e), 400)
+    return export_response(sql, params, fmt, name)
+
+def answer_stream(session_id, user_question, trace):
+    """SSE frames (status + batched tokens) answering one question; the finished answer is the return value.
+
+    /chat sends the frames to the browser, /ask only keeps the answer.
+    """
+    # Get the full history by accessing session_id (ChatMessageHistory Object)
+    with trace.span("history_read", HISTORY_SECONDS.labels("read")):
+        full_history = get_session_history(session_id)
+
+    # Add the user's message to the MotherDuck Database
+    with trace.span("history_write", HISTORY_SECONDS.labels("write")):
+        save_message(session_id, "user", user_question)
+
+    # pick up names from newly ingested tables (cheap no-op between refreshes)
+    try:
+        name_index.maybe_refresh(thread_cursor())
+    except Exception as e:
+        print('Name index refresh failed: ', e)
+
+    # try the local template library first - a match runs a prepared statement directly
+    stage_start = time.perf_counter()
+    matched = template_library.match(user_question) if template_library else None
+    if matched:
+        try:
+            with trace.span("template_sql", SQL_SECONDS.labels("template")), sql_pool.connection() as cur:
+                result_json = template_library.run(cur, matched)
+        except Exception as e:
+            print('Template failed, falling back to LLM: ', e)
+            matched = None
         else:
-            # If no tool call, use AI’s direct response
-            final_context = ai_message.content
+            # no rows usually means the name didn't match - let the LLM try
+            if result_json == "[]":
+                matched = None
+
+    if matched:
+        print('Template Match: ', matched[0])
+        CACHE_HITS.labels("template").inc()
+        RESULT_BYTES.observe(len(result_json))
+        trace.set(path="template", template=matched[0])
+        # Add the template's result to MotherDuck database, same as a tool result
+        with trace.span("history_write", HISTORY_SECONDS.labels("write")):
+            save_message(session_id, "tool", result_json)
+        final_context = result_json
+        template_library.record(matched[0], (time.perf_counter() - stage_start) * 1000)
+    elif SINGLE_ROUND_TRIP:
+        trace.set(path="single_round_trip")
+        if template_library:
+            template_library.record(None)
+        full_response_text = yield from stream_token_frames(
+            stream_single_round_trip(session_id, user_question, trace), trace
+        )
+        with trace.span("history_write", HISTORY_SECONDS.labels("write")):
+            save_message(session_id, "assistant", full_response_text)
+        trace.finish()
+        return full_response_text
+    else:
+        trace.set(path="llm")
+        final_context = generate_context_with_llm(session_id, user_question, full_history, trace)
+        if template_library:
+            template_library.record(None, (time.perf_counter() - stage_start) * 1000)
 
-        # Yield another status message after scraping and before generation
-        status_message_2 = f'🤖 **Assistant:** *Analyzing data and generating your answer...*'
-        yield f"data: {json.dumps({'type': 'status', 'content': status_message_2})}\n\n"
+    # trivial results (one number, one row, a short leaderboard) get a templated answer right away
+    fast_answer = None
+    if FAST_RENDER:
+        with trace.span("fast_render"):
+            fast_answer = render_fast_answer(user_question, final_context, matched[0] if matched else None)
+    if fast_answer:
+        FAST_PATH.labels("rendered").inc()
+        CACHE_HITS.labels("fast_render").inc()
+        trace.set(answer="fast_render")
+        yield from stream_token_frames(stream_pieces(fast_answer), trace)
+        with trace.span("history_write", HISTORY_SECONDS.labels("write")):
+            save_message(session_id, "assistant", fast_answer)
+        trace.finish()
+        return fast_answer
+    FAST_PATH.labels("llm").inc()
 
-        # get the full history again with updated messages and tool calls
+    # the answer tier also weighs how much result there is to explain
+    tier_name, score, _ = model_router.route(
+        "answer", user_question, len(name_index.find_mentions(user_question)), len(final_context)
+    )
+    tier = model_tiers[tier_name]
+    trace.set(answer_tier=tier_name, answer_complexity=score)
+
+    # same question on the same result already answered since the last ingest -> replay that answer
+    cache_key = None
+    if ANSWER_CACHE:
+        cache_key = fingerprint(
+            normalize_question(user_question), final_context, ANSWER_PROMPT_VERSION, tier.scheduler.model
+        )
+        cached = answer_cache.get(cache_key, current_ingest_version())
+        if cached:
+            CACHE_HITS.labels("answer").inc()
+            trace.set(answer="cache")
+            replay_start = time.perf_counter()
+            with trace.span("answer_replay"):
+                full_response_text = yield from stream_token_frames(replay_answer(cached.text), trace)
+            ANSWER_CACHE_SAVED_SECONDS.observe(max(0.0, cached.generation_s - (time.perf_counter() - replay_start)))
+            with trace.span("history_write", HISTORY_SECONDS.labels("write")):
+                save_message(session_id, "assistant", full_response_text)
+            trace.finish()
+            return full_response_text
+
+    # Yield another status message after scraping and before generation
+    status_message_2 = f'🤖 **Assistant:** *Analyzing data and generating your answer...*'
+    yield status_event(status_message_2)
+
+    # get the full history again with updated messages and tool calls
+    with trace.span("history_read", HISTORY_SECONDS.labels("read")):
         full_history = get_session_history(session_id)
 
-        # Get the full chat history messages. This is then put into the LLM prompt template
-        chat_history_for_llm_chain = [f"{msg.type}: {msg.content}" for msg in full_history.messages]
-        chat_history_string = "\n".join(chat_history_for_llm_chain)
+    # the current result already goes into {context}, so every stored tool result is summarized here
+    history_messages, history_sizes = compact_history(
+        full_history.messages, "answer", keep_recent_tool_results=False
+    )
+    trace.set(history_tokens_raw=history_sizes["raw_tokens"], history_tokens=history_sizes["compacted_tokens"])
+
+    # Get the full chat history messages. This is then put into the LLM prompt template
+    chat_history_for_llm_chain = [f"{msg.type}: {msg.content}" for msg in history_messages]
+    chat_history_string = "\n".join(chat_history_for_llm_chain)
 
-        full_response_text = ""
+    # the raw result stays in history; the prompt gets the compact encoding
+    answer_context = prompt_context(final_context, trace) if CONTEXT_ENCODING else final_context
 
-        # Stream final answer tokens
-        for chunk in llm_chain.stream({
-            "context": final_context,
+    def answer_tokens():
+        for chunk in tier.scheduler.stream(lambda: tier.llm_chain.stream({
+            "context": answer_context,
             "question": user_question,
             "chat_history": chat_history_string
-        }):
+        })):
             token = chunk.get('text', '')
             if token:
-                yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
-                full_response_text += token
-        
-        # Save the full AI response to MotherDuck history database after streaming is complete
+                yield token
+
+    if SINGLE_FLIGHT:
+        # identical prompts in flight share one answer stream; late joiners replay it from the start
+        tokens = answer_flight.stream(
+            fingerprint(tier.scheduler.model, normalize_question(user_question), final_context, chat_history_string),
+            answer_tokens,
+        )
+    else:
+        tokens = answer_tokens()
+
+    # Stream final answer tokens
+    answer_start = time.perf_counter()
+    try:
+        with trace.span("answer_stream", LLM_SECONDS.labels("answer")):
+            full_response_text = yield from stream_token_frames(tokens, trace)
+    except Exception as e:
+        MODEL_TIER_OUTCOMES.labels(tier.name, "answer", "busy" if isinstance(e, Overloaded) else "error").inc()
+        raise
+    answer_s = time.perf_counter() - answer_start
+    MODEL_TIER_SECONDS.labels(tier.name, "answer").observe(answer_s)
+    MODEL_TIER_OUTCOMES.labels(tier.name, "answer", "ok").inc()
+    if cache_key:
+        answer_cache.put(cache_key, full_response_text, answer_s, current_ingest_version())
+    
+    # Save the full AI response to MotherDuck history database after streaming is complete
+    with trace.span("history_write", HISTORY_SECONDS.labels("write")):
         save_message(session_id, "assistant", full_response_text)
+    trace.finish()
+    return full_response_text
+
+@app.route("/chat")
+def chat():
+    def generate_response():
+        if "session_id" not in session:
+            # assign a new session ID - UUID - for first time user visits page
+            session["session_id"] = str(uuid.uuid4())
+        session_id = session["session_id"]
+
+        # get the question from the user prompt box in the HTML page
+        user_question = request.args.get("message")
+        # looks in query string - if missing ends streaming event
+        if not user_question:
+            yield sse_event('I am sorry, I did not receive a question. Please try again.')
+            return
+        print('User Question: ', user_question)
+        # timing spans for each stage of this request
+        yield from answer_stream(session_id, user_question, Trace())
 
         # Signal the end of the stream to the client
-        yield "event: end-of-stream\ndata: close\n\n"
-         
+        yield END_OF_STREAM
+
+    # admission control turned the request away - tell the user instead of hanging until the timeout
+    def generate_response_or_busy():
+        try:
+            yield from generate_response()
+        except Overloaded as e:
+            print('LLM overloaded: ', e)
+            yield status_event(BUSY_MESSAGE)
+            yield END_OF_STREAM
+
     # Return Response object, wrapping the generator with stream_with_context
-    return Response(stream_with_context(generate_response()), mimetype='text/event-stream')
+    body = stream_with_context(generate_response_or_busy())
+    headers = {"Vary": "Accept-Encoding"}
+    if SSE_GZIP and accepts_gzip(request.headers.get("Accept-Encoding")):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype='text/event-stream', headers=headers)
+
+# JSON /ask: the React client (one question, answer + chat history back) and batch callers
+ASK_MAX_BATCH = int(os.getenv("ASK_MAX_BATCH", "50"))
+# questions of one batch answered at once - more would only wait in (or be turned away by) the LLM scheduler
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+ask_executor = None
+_ask_executor_lock = threading.Lock()
+
+def ask_pool():
+    # created on first use so gunicorn's post_fork workers each get their own threads
+    global ask_executor
+    with _ask_executor_lock:
+        if ask_executor is None:
+            ask_executor = ThreadPoolExecutor(max_workers=ASK_BATCH_CONCURRENCY, thread_name_prefix="ask")
+    return ask_executor
+
+def answer_one(session_id, question):
+    """Run the /chat pipeline for one question without streaming; returns a JSON-ready result."""
+    trace = Trace(route="ask")
+    frames = answer_stream(session_id, question, trace)
+    result = {"question": question}
+    try:
+        while True:
+            next(frames)
+    except StopIteration as done:
+        result["answer"] = done.value
+    except Overloaded as e:
+        print('LLM overloaded: ', e)
+        result["error"] = "busy"
+    except Exception as e:
+        print('Ask failed: ', e)
+        result["error"] = str(e)
+    stages = {}
+    for span in trace.spans:
+        stages[span["stage"]] = round(stages.get(span["stage"], 0) + span["ms"], 2)
+    result["path"] = trace.attributes.get("path")
+    # which model tier each LLM stage ran on
+    tiers = {stage: trace.attributes[key] for stage, key in (("sql_generation", "sql_tier"), ("answer", "answer_tier"))
+             if key in trace.attributes}
+    if trace.attributes.get("sql_escalated"):
+        tiers["sql_regeneration"] = STRONG
+    if tiers:
+        result["tiers"] = tiers
+    result["timings"] = {"total_ms": round(trace.elapsed() * 1000, 2), **stages}
+    return result
+
+def answer_batch(questions):
+    """Answer independent questions concurrently; duplicates (same canonical question) are answered once."""
+    start = time.perf_counter()
+    unique = {}
+    for question in questions:
+        unique.setdefault(normalize_question(question), question)
+    # a fresh session per question - batch questions don't see each other's history
+    futures = {
+        key: ask_pool().submit(answer_one, f"ask-{uuid.uuid4()}", question)
+        for key, question in unique.items()
+    }
+    results = {key: future.result() for key, future in futures.items()}
+    answers, seen = [], set()
+    for question in questions:
+        key = normalize_question(question)
+        answers.append({**results[key], "question": question, "shared": key in seen})
+        seen.add(key)
+    return {
+        "answers": answers,
+        "unique_questions": len(unique),
+        "total_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+def ask_session_id(payload):
+    """session_id from the /ask body if it is a UUID we could have issued, else the cookie's (new if none)."""
+    session_id = payload.get("session_id")
+    if isinstance(session_id, str):
+        try:
+            return str(uuid.UUID(session_id))
+        except ValueError:
+            pass
+    if "session_id" not in session:
+        session["session_id"] = str(uuid.uuid4())
+    return session["session_id"]
+
+@app.route("/ask", methods=["POST"])
+def ask():
+    payload = request.get_json(silent=True) or {}
+    if "questions" in payload:
+        questions = payload["questions"]
+        if not isinstance(questions, list) or not all(isinstance(q, str) and q.strip() for q in questions):
+            return jsonify({"error": "questions must be a list of non-empty strings"}), 400
+        if len(questions) > ASK_MAX_BATCH:
+            return jsonify({"error": f"At most {ASK_MAX_BATCH} questions per batch"}), 400
+        return jsonify(answer_batch([q.strip() for q in questions]))
+
+    question = str(payload.get("question") or "").strip()
+    if not question:
+        return jsonify({"error": "I am sorry, I did not receive a question. Please try again."}), 400
+    session_id = ask_session_id(payload)
+    print('User Question: ', question)
+    result = answer_one(session_id, question)
+    if result.get("error") == "busy":
+        return jsonify({**result, "error": BUSY_MESSAGE}), 503
+    if "error" in result:
+        return jsonify(result), 500
+    # the React client redraws the whole conversation from this, and sends session_id back next time
+    result["session_id"] = session_id
+    result["chat_history"] = [
+        {"type": msg.type, "content": msg.content}
+        for msg in get_session_history(session_id).messages
+        if msg.type in ("human", "ai")
+    ]
+    return jsonify(result)
 
 if __name__ == '__main__':
     app.run(debug=True, threaded=True)
@@ -0,0 +1,104 @@
+import json
+
+from history_compaction import estimate_tokens
+
+# decimals kept for floats - what the answer would show anyway
+FLOAT_DIGITS = 2
+# a string column is dictionary-encoded when it has at most this share of distinct values
+DICTIONARY_MAX_DISTINCT_RATIO = 0.5
+# ... and at least this many rows
+DICTIONARY_MIN_ROWS = 4
+
+
+def format_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        value = round(value, FLOAT_DIGITS)
+        return str(int(value)) if value.is_integer() else repr(value)
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, separators=(",", ":"))
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def encode_records(records) -> str:
+    """Header row + one `a | b | c` line per record.
+
+    All-null columns are dropped, columns with one value for every row become a single
+    `column = value` line, and strings that repeat a lot (team, competition, ...) become
+    short codes with a legend.
+    """
+    if not records:
+        return "(no rows)"
+    columns = []
+    for record in records:
+        columns += [c for c in record if c not in columns]
+
+    lines = []
+    table_columns = []
+    dictionaries = {}
+    for column in columns:
+        values = [record.get(column) for record in records]
+        present = [v for v in values if v is not None]
+        if not present:
+            continue
+        distinct = {format_cell(v) for v in values}
+        if len(records) > 1 and len(distinct) == 1:
+            lines.append(f"{column} = {distinct.pop()} (all rows)")
+            continue
+        table_columns.append(column)
+        if (
+            len(records) >= DICTIONARY_MIN_ROWS
+            and all(isinstance(v, str) for v in present)
+            and len(distinct) <= len(records) * DICTIONARY_MAX_DISTINCT_RATIO
+        ):
+            prefix = column[:1].upper()
+            codes = {}
+            for value in values:
+                cell = format_cell(value)
+                if cell and cell not in codes:
+                    codes[cell] = f"{prefix}{len(codes) + 1}"
+            # only worth it when the codes plus their legend are shorter than what they replace
+            legend = ", ".join(f"{code}={cell}" for cell, code in codes.items())
+            cells = [format_cell(v) for v in present]
+            if len(legend) + sum(len(codes[cell]) for cell in cells) < sum(len(cell) for cell in cells):
+                dictionaries[column] = codes
+                lines.append(f"{column} codes: {legend}")
+
+    lines.append(" | ".join(table_columns))
+    for record in records:
+        cells = []
+        for column in table_columns:
+            cell = format_cell(record.get(column))
+            cells.append(dictionaries[column].get(cell, cell) if column in dictionaries else cell)
+        lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+def encode_context(context: str) -> str:
+    """Compact text form of a run_sql / template result for the answer prompt.
+
+    Anything that isn't a records list or a merged {"results": [...]} (e.g. an SQL error
+    message) is returned unchanged.
+    """
+    try:
+        data = json.loads(context)
+    except (TypeError, ValueError):
+        return context
+    if isinstance(data, list) and all(isinstance(r, dict) for r in data):
+        return f"{len(data)} rows\n" + encode_records(data)
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        parts = []
+        for i, result in enumerate(data["results"], start=1):
+            rows = result.get("data")
+            header = f"## query {i}: {result.get('sql')}"
+            if isinstance(rows, list) and all(isinstance(r, dict) for r in rows):
+                parts.append(f"{header}\n{len(rows)} rows\n" + encode_records(rows))
+            else:
+                parts.append(f"{header}\n{rows}")
+        return "\n\n".join(parts)
+    return context
+
+
+def context_sizes(raw: str, encoded: str):
+    return {"raw_tokens": estimate_tokens(raw), "encoded_tokens": estimate_tokens(encoded)}
@@ -0,0 +1,163 @@
+import re
+
+from percentiles import TABLE_NAME as PERCENTILE_TABLE
+from query_templates import TABLE_NAME_RE
+
+# format -> mimetype, file extension
+EXPORT_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+# filter=column:op:value on /api/table - values are bound as parameters, never pasted into the SQL
+FILTER_OPS = {
+    "eq": "=", "ne": "<>", "lt": "<", "le": "<=", "gt": ">", "ge": ">=",
+    "like": "ILIKE", "in": "IN", "null": "IS NULL", "notnull": "IS NOT NULL",
+}
+SAFE_NAME_RE = re.compile(r"^[\w\-]+$")
+
+
+def exportable(table) -> bool:
+    """Stats tables and player_percentiles - never chat_history or the other app tables."""
+    return bool(TABLE_NAME_RE.match(table)) or table == PERCENTILE_TABLE
+
+
+class ExportError(ValueError):
+    """Bad export parameters (unknown table, column, operator or format) - a 400."""
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def parse_limit(value):
+    """?limit= as a positive int, None when absent. Anything else is an ExportError - it used
+    to turn into None and export the whole table."""
+    if value is None:
+        return None
+    if not (value.isascii() and value.isdigit()) or int(value) < 1:
+        raise ExportError(f"limit must be a positive integer, got {value!r}")
+    return int(value)
+
+
+def table_query(table, table_columns, columns=None, filters=(), order=None, limit=None):
+    """SELECT for /api/table/<table> with the projection, filters and ordering in SQL,
+    so DuckDB only reads the columns and row groups it needs. Returns (sql, params)."""
+    selected = columns or list(table_columns)
+    for column in selected:
+        if column not in table_columns:
+            raise ExportError(f"Unknown column {column!r} in {table}")
+
+    where, params = [], []
+    for spec in filters:
+        column, _, rest = spec.partition(":")
+        op, _, value = rest.partition(":")
+        if column not in table_columns:
+            raise ExportError(f"Unknown filter column {column!r}")
+        if op not in FILTER_OPS:
+            raise ExportError(f"Unknown filter operator {op!r} (use one of {', '.join(FILTER_OPS)})")
+        if op in ("null", "notnull"):
+            where.append(f"{quote(column)} {FILTER_OPS[op]}")
+        elif op == "in":
+            values = value.split(",")
+            where.append(f"{quote(column)} IN ({', '.join('?' for _ in values)})")
+            params += values
+        else:
+            where.append(f"{quote(column)} {FILTER_OPS[op]} ?")
+            params.append(value)
+
+    sql = f"SELECT {', '.join(quote(c) for c in selected)} FROM main.{quote(table)}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if order:
+        column, _, direction = order.partition(":")
+        if column not in table_columns:
+            raise ExportError(f"Unknown order column {column!r}")
+        sql += f" ORDER BY {quote(column)} {'DESC' if direction.lower() == 'desc' else 'ASC'}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+
+class ChunkSink:
+    """Write-only file object the Arrow writers write into; drain() hands back what was
+    written since the last call. tell() keeps counting across drains, which the Parquet
+    writer relies on for the offsets in its footer."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def csv_unsupported_columns(schema):
+    """Columns the Arrow CSV writer can't encode (LIST, STRUCT, MAP, UNION, INTERVAL) - it
+    only finds out at the first batch, after the 200 has gone out, so check up front."""
+    import pyarrow as pa
+
+    return [
+        field.name for field in schema
+        if pa.types.is_nested(field.type) or pa.types.is_interval(field.type)
+    ]
+
+
+def encode_batches(reader, fmt):
+    """Yield the bytes of reader (a pyarrow RecordBatchReader) in fmt, one chunk per batch.
+
+    Only one record batch is held at a time, so memory stays flat however big the export is.
+    """
+    # pyarrow is only needed here - keep it out of the web workers' import time
+    import pyarrow as pa
+
+    sink = ChunkSink()
+    output = pa.PythonFile(sink, mode="w")
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(output, reader.schema)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(output, reader.schema, compression="zstd")
+    elif fmt == "csv":
+        import pyarrow.csv as pa_csv
+        writer = pa_csv.CSVWriter(output, reader.schema)
+    else:
+        raise ExportError(f"Unknown format {fmt!r}")
+
+    for batch in reader:
+        # parquet: one row group per batch
+        writer.write_batch(batch)
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def export_filename(name, fmt):
+    stem = name if SAFE_NAME_RE.match(name or "") else "export"
+    return f"{stem}.{EXPORT_FORMATS[fmt][1]}"
@@ -0,0 +1,111 @@
+import json
+import re
+
+from query_templates import normalize_question, RANK_DESC_RE, RANK_ASC_RE
+
+# wording that asks for judgement or comparison - those answers need the LLM
+SYNTHESIS_RE = re.compile(
+    r"\b(?:why|better|best|worse|worst|elite|good|great|rate|rating|opinion|think|should|compare|"
+    r"vs|versus|than|similar|like|style|explain|analy[sz]e|overrated|underrated|deserve|impact)\b"
+)
+
+# columns that identify a row rather than measure something
+IDENTITY_COLUMNS = ["name", "team", "competition", "season", "nation", "position"]
+
+# largest ranked list rendered without the LLM
+MAX_LIST_ROWS = 10
+# most stats shown for a single-row season line
+MAX_ROW_STATS = 12
+
+DISPLAY_NAMES = {
+    "expected_goals(xG)": "xG",
+    "expected_assists(xA)": "xA",
+    "xG_nonpenalty": "non-penalty xG",
+    "G+A": "goals + assists",
+    "non-PK_goals": "non-penalty goals",
+    "PK_goals": "penalty goals",
+    "PK_att": "penalty attempts",
+    "matches": "appearances",
+    "full_games": "90s played",
+}
+
+
+def display_name(column: str) -> str:
+    return DISPLAY_NAMES.get(column, column.replace("_", " "))
+
+
+# numbers that are labels rather than amounts - no thousands separators ("1991", not "1,991")
+PLAIN_NUMBER_RE = re.compile(r"(?:^|_)(?:year|born|id|season)(?:_|$)", re.IGNORECASE)
+
+
+def format_value(value, column=None) -> str:
+    separator = "" if column and PLAIN_NUMBER_RE.search(column) else ","
+    if isinstance(value, float):
+        if value.is_integer():
+            return f"{int(value):{separator}}"
+        return f"{value:{separator}.2f}".rstrip("0").rstrip(".")
+    if isinstance(value, int):
+        return f"{value:{separator}}"
+    return str(value)
+
+
+def _subject(row) -> str:
+    name, team = row.get("name"), row.get("team")
+    competition = str(row.get("competition") or "").replace("-", " ").replace("_", " ")
+    details = ", ".join(d for d in ([team] if name and team else []) + ([competition] if competition else []) if d)
+    return f"**{name or team}**" + (f" ({details})" if details else "")
+
+
+def _stat_columns(row):
+    return [col for col, value in row.items() if col not in IDENTITY_COLUMNS and value is not None]
+
+
+def render_fast_answer(question: str, context: str, template_name=None):
+    """Markdown answer for trivial results (scalar, single row, short ranked list), or None.
+
+    None means the result needs real synthesis and should go to the answer LLM.
+    """
+    q = normalize_question(question)
+    if template_name == "compare_players" or SYNTHESIS_RE.search(q):
+        return None
+    try:
+        rows = json.loads(context)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(rows, list) or not rows or not all(isinstance(r, dict) for r in rows):
+        return None
+    # aggregates ("avg(age)" of a whole squad) have nobody to attribute the number to
+    if not all(r.get("name") or r.get("team") for r in rows):
+        return None
+
+    stats = _stat_columns(rows[0])
+    if not stats:
+        return None
+
+    if len(rows) == 1:
+        row = rows[0]
+        if len(stats) == 1:
+            # scalar: one player's or team's single stat
+            season = f" in {row['season']}" if row.get("season") else ""
+            return f"{_subject(row)} has **{format_value(row[stats[0]], stats[0])}** {display_name(stats[0])}{season}."
+        lines = [f"## {row.get('name') or row.get('team')}", ""]
+        subject_bits = [str(row[c]) for c in ("team", "position", "competition") if row.get(c)]
+        if subject_bits:
+            lines += [" · ".join(bit.replace("-", " ") for bit in subject_bits), ""]
+        lines += [f"* **{display_name(col)}:** {format_value(row[col], col)}" for col in stats[:MAX_ROW_STATS]]
+        return "\n".join(lines)
+
+    # ranked list: every row has the same single stat
+    if len(rows) > MAX_LIST_ROWS or len(stats) != 1 or any(_stat_columns(r) != stats for r in rows):
+        return None
+    stat = stats[0]
+    ranked = RANK_DESC_RE.search(q) or RANK_ASC_RE.search(q)
+    heading = "Here are the leaders for" if ranked else "Here's what I found for"
+    lines = [f"{heading} **{display_name(stat)}**:", ""]
+    lines += [f"{i}. {_subject(row)}: **{format_value(row[stat], stat)}**" for i, row in enumerate(rows, start=1)]
+    return "\n".join(lines)
+
+
+def stream_pieces(answer: str):
+    """Split a rendered answer into line-sized pieces for the SSE token events."""
+    return [line + "\n" for line in answer.split("\n")]
@@ -0,0 +1,26 @@
+# gunicorn loads ./gunicorn.conf.py automatically, on top of the flags in the Procfile
+import os
+import shutil
+import tempfile
+
+# prometheus_client multiprocess mode: each worker writes its metrics to files in this
+# directory and /metrics aggregates them. It has to be set before the app imports prometheus_client.
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "fbref-chatbot-metrics")
+)
+# start each deploy from empty counters
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # drop the dead worker's live metric files
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # connections, schema and the LLM client are per worker - with --preload the master only
+    # imported chatbot, which has no connections or network side effects at import time
+    import chatbot
+    chatbot.init_app()
@@ -0,0 +1,76 @@
+import json
+
+from langchain_core.messages import ToolMessage
+
+# rough chars-per-token for Gemini on English + JSON; good enough for budgeting
+CHARS_PER_TOKEN = 4
+# rows of an old tool result kept in its summary
+SUMMARY_TOP_ROWS = 3
+# longest plain-text tool result (e.g. "SQL error: ...") kept before truncating
+MAX_TEXT_CHARS = 300
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_tokens(messages) -> int:
+    return sum(estimate_tokens(f"{msg.type}: {msg.content}") for msg in messages)
+
+
+def _summarize_records(records, label=""):
+    if not records:
+        return f"{label}0 rows"
+    columns = list(records[0].keys()) if isinstance(records[0], dict) else []
+    top = json.dumps(records[:SUMMARY_TOP_ROWS], separators=(",", ":"))
+    return f"{label}{len(records)} rows; columns: {', '.join(columns)}; top rows: {top}"
+
+
+def summarize_tool_result(content: str) -> str:
+    """Compact stand-in for a stored tool result: columns, row count and the first few rows."""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        text = content if len(content) <= MAX_TEXT_CHARS else content[:MAX_TEXT_CHARS] + "..."
+        return f"[earlier tool result] {text}"
+
+    if isinstance(data, list):
+        return f"[earlier tool result] {_summarize_records(data)}"
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        # several run_sql calls merged into one context
+        parts = [
+            _summarize_records(r.get("data"), f"query {i + 1}: ") if isinstance(r.get("data"), list)
+            else f"query {i + 1}: {str(r.get('data'))[:MAX_TEXT_CHARS]}"
+            for i, r in enumerate(data["results"])
+        ]
+        return "[earlier tool results] " + " | ".join(parts)
+    return f"[earlier tool result] {content[:MAX_TEXT_CHARS]}"
+
+
+def compact_messages(messages, token_budget=1500, keep_recent=4, keep_recent_tool_results=True):
+    """Fit history into token_budget.
+
+    The newest keep_recent messages stay verbatim (tool results too, unless
+    keep_recent_tool_results is False), older tool results become summaries, and the
+    oldest messages are dropped if the history still doesn't fit.
+    Returns (messages, {"raw_tokens": ..., "compacted_tokens": ...}).
+    """
+    raw_tokens = message_tokens(messages)
+    compacted = []
+    recent_start = len(messages) - keep_recent
+    for i, msg in enumerate(messages):
+        if isinstance(msg, ToolMessage) and (i < recent_start or not keep_recent_tool_results):
+            msg = ToolMessage(content=summarize_tool_result(msg.content), tool_call_id=msg.tool_call_id)
+        compacted.append(msg)
+
+    # drop from the oldest end until the rest fits, but never the newest message
+    kept = []
+    used = 0
+    for msg in reversed(compacted):
+        tokens = estimate_tokens(f"{msg.type}: {msg.content}")
+        if kept and used + tokens > token_budget:
+            break
+        kept.append(msg)
+        used += tokens
+    kept.reverse()
+    return kept, {"raw_tokens": raw_tokens, "compacted_tokens": used}
@@ -0,0 +1,156 @@
+import os
+import random
+import threading
+import time
+
+# messages of one session that ever reach a prompt
+HISTORY_LIMIT = 10
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS chat_history (
+    session_id TEXT,
+    role TEXT,
+    content TEXT,
+    created_at TIMESTAMP DEFAULT current_timestamp
+)
+"""
+# ART index for the per-session lookups (read, clear). DuckDB only uses it for a plain
+# session_id = ? filter - adding created_at or a top-N LIMIT falls back to a full scan.
+# The table itself is append-only, so one session's rows are scattered until migrate().
+CREATE_INDEX = "CREATE INDEX IF NOT EXISTS chat_history_session_idx ON chat_history (session_id)"
+
+
+def ensure_history_table(con):
+    con.execute(CREATE_TABLE)
+    try:
+        con.execute(CREATE_INDEX)
+    except Exception as e:
+        # MotherDuck may not support the index - reads still work, just with zonemaps only
+        print(f"chat_history index unavailable: {e}")
+
+
+def read_history(con, session_id, limit=HISTORY_LIMIT):
+    """(role, content) of the newest `limit` messages of a session, oldest first."""
+    # compaction keeps a session to about `limit` rows, so fetching all of them and slicing
+    # here is cheap - and keeps the query simple enough for the index scan
+    rows = con.execute(
+        "SELECT role, content FROM chat_history WHERE session_id = ? ORDER BY created_at ASC",
+        [session_id],
+    ).fetchall()
+    return rows[-limit:]
+
+
+def append_message(con, session_id, role, content):
+    # append only - old messages are trimmed in bulk by compact()
+    con.execute(
+        "INSERT INTO chat_history (session_id, role, content) VALUES (?, ?, ?)",
+        [session_id, role, content],
+    )
+
+
+def clear_session(con, session_id):
+    con.execute("DELETE FROM chat_history WHERE session_id = ?", [session_id])
+
+
+def compact(con, ttl_hours=72, keep_per_session=HISTORY_LIMIT):
+    """Drop sessions idle for longer than ttl_hours and trim the rest to their newest messages.
+
+    Returns (expired_rows, trimmed_rows).
+    """
+    count = "SELECT count(*) FROM chat_history"
+    before = con.execute(count).fetchone()[0]
+    con.execute(
+        """
+        DELETE FROM chat_history
+        WHERE session_id IN (
+            SELECT session_id
+            FROM chat_history
+            GROUP BY session_id
+            HAVING max(created_at) < current_timestamp - to_hours(CAST(? AS BIGINT))
+        )
+        """,
+        [ttl_hours],
+    )
+    after_expiry = con.execute(count).fetchone()[0]
+    con.execute(
+        """
+        DELETE FROM chat_history
+        USING (
+            SELECT session_id, created_at
+            FROM chat_history
+            QUALIFY row_number() OVER (PARTITION BY session_id ORDER BY created_at DESC) > ?
+        ) AS old
+        WHERE chat_history.session_id = old.session_id
+          AND chat_history.created_at = old.created_at
+        """,
+        [keep_per_session],
+    )
+    after_trim = con.execute(count).fetchone()[0]
+    return before - after_expiry, after_expiry - after_trim
+
+
+def migrate(con):
+    """One-off rewrite of chat_history sorted by (session_id, created_at), with the index.
+
+    Run it while the app is stopped - messages written during the rewrite would be lost.
+    """
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.execute("""
+            CREATE OR REPLACE TABLE chat_history_sorted AS
+            SELECT session_id, role, content, created_at
+            FROM chat_history
+            ORDER BY session_id, created_at
+        """)
+        con.execute("DROP TABLE chat_history")
+        con.execute("ALTER TABLE chat_history_sorted RENAME TO chat_history")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    ensure_history_table(con)
+
+
+class HistoryCompactor:
+    """Background thread that runs compact() every interval_s (jittered, so workers don't line up)."""
+
+    def __init__(self, con, ttl_hours=72, keep_per_session=HISTORY_LIMIT, interval_s=600):
+        # own cursor - the request threads keep using the parent connection
+        self.con = con.cursor()
+        self.ttl_hours = ttl_hours
+        self.keep_per_session = keep_per_session
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="history-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s * random.uniform(0.8, 1.2)):
+            try:
+                start = time.perf_counter()
+                expired, trimmed = compact(self.con, self.ttl_hours, self.keep_per_session)
+                print(f"History compaction: {expired} expired, {trimmed} trimmed "
+                      f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"History compaction failed: {e}")
+
+
+if __name__ == "__main__":
+    # python history_store.py compact   -> one compaction pass now
+    # python history_store.py migrate   -> rewrite chat_history sorted (app stopped)
+    import sys
+    from ingest import get_connection
+
+    con = get_connection()
+    if sys.argv[1:] == ["migrate"]:
+        migrate(con)
+        print("chat_history rewritten sorted by (session_id, created_at)")
+    else:
+        expired, trimmed = compact(con, int(os.getenv("HISTORY_TTL_HOURS", "72")))
+        print(f"{expired} expired rows, {trimmed} trimmed rows")
@@ -1,27 +1,83 @@
 import duckdb
 import os
+import sys
 import pandas as pd
-from scraping_functions.standardized_scraping_function import scrape_fbref_df, LEAGUE_ID_MAP, STAT_CONFIG
-
-# Connect to MotherDuck using your token
-con = duckdb.connect(f"md:?motherduck_token={os.getenv('MOTHERDUCK_TOKEN')}")
+from snapshots import SNAPSHOT_SCHEMA, record_snapshot, ingest_version
+from similarity import SimilarityIndex, INDEX_PATH
+from percentiles import build_percentile_table, TABLE_NAME as PERCENTILE_TABLE
+from categoricals import encode_categoricals
+from query_templates import TABLE_NAME_RE
+from scraping_functions.standardized_scraping_function import scrape_fbref_df, convert_types, text_number_casts, LEAGUE_ID_MAP, STAT_CONFIG
 
 # Dedicated database for FBref stats
 DB_NAME = "fbref_soccer_stats"
-con.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
-con.execute(f"USE {DB_NAME}")
-
 
 # Define seasons to ingest
 SEASONS = ["2024-2025"]  # Add more seasons if needed
 
-def ingest_to_motherduck():
+def get_connection():
+    # Connect to MotherDuck using your token
+    con = duckdb.connect(f"md:?motherduck_token={os.getenv('MOTHERDUCK_TOKEN')}")
+    con.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
+    con.execute(f"USE {DB_NAME}")
+    return con
+
+def table_name_for(stat_type, competition, season):
+    return f"{stat_type}_{competition}_{season}".replace("-", "_").replace(" ", "_")
+
+def load_dataframe(con, table_name, df, database=DB_NAME):
+    """Create table_name from a scraped DataFrame."""
+    # Register DataFrame
+    con.register("df_view", df)
+
+    # Create table
+    con.execute(f"""
+        CREATE TABLE {database}.{table_name} AS
+        SELECT * FROM df_view
+    """)
+    con.unregister("df_view")
+
+# store team / nation / position / competition / season as shared ENUM types (see categoricals.py)
+CATEGORICAL_ENUMS = os.getenv("CATEGORICAL_ENUMS", "1") == "1"
+
+# re-scrape tables that already exist (the current season during the season) instead of skipping them;
+# every refresh becomes a snapshot version, see snapshots.py
+REFRESH_EXISTING = os.getenv("INGEST_REFRESH", "0") == "1"
+
+def migrate_numeric_columns(con):
+    """Re-type stats tables written before ingest converted numbers - every column VARCHAR,
+    "2,508" - so they UNION ALL and diff cleanly against freshly scraped ones. Covers the
+    snapshot history too. Idempotent; returns the tables it rewrote."""
+    migrated = []
+    for schema in ("main", SNAPSHOT_SCHEMA):
+        rows = con.execute(
+            "SELECT table_name, column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = ? ORDER BY table_name, ordinal_position",
+            [schema],
+        ).fetchall()
+        tables = {}
+        for table, column, data_type in rows:
+            if TABLE_NAME_RE.match(table):
+                tables.setdefault(table, {})[column] = data_type
+        for table, column_types in tables.items():
+            casts = text_number_casts(column_types)
+            if casts:
+                con.execute(
+                    f'CREATE OR REPLACE TABLE {schema}."{table}" AS SELECT * REPLACE ({", ".join(casts)}) FROM {schema}."{table}"'
+                )
+                migrated.append(f"{schema}.{table}")
+    return migrated
+
+def ingest_to_motherduck(con=None, refresh=REFRESH_EXISTING):
+    con = con or get_connection()
+    for table in migrate_numeric_columns(con):
+        print(f"🔧 Migrated {table} to numeric columns")
     for season in SEASONS:
         for competition, league_id in LEAGUE_ID_MAP.items():
             for stat_type, config in STAT_CONFIG.items():
 
                 # table name
-                table_name = table_name = f"{stat_type}_{competition}_{season}".replace("-", "_").replace(" ", "_")
+                table_name = table_name_for(stat_type, competition, season)
 
                 # Check if table already exists
                 result = con.execute(f"""
@@ -31,7 +87,7 @@ def ingest_to_motherduck():
                 """).fetchall()
 
                 # Skip if table already exists
-                if result:
+                if result and not refresh:
                     print(f"⏩ Skipping {table_name} (already exists)")
                     continue
 
@@ -53,19 +109,59 @@ def ingest_to_motherduck():
                     df["season"] = season
                     df["competition"] = competition
 
-                    # Register DataFrame
-                    con.register("df_view", df)
+                    # store numbers as numbers instead of the scraped strings
+                    df = convert_types(df)
 
-                    # Create table
-                    con.execute(f"""
-                        CREATE TABLE {DB_NAME}.{table_name} AS
-                        SELECT * FROM df_view
-                    """)
+                    # replaces the table and keeps the rows that changed as a new snapshot version
+                    version, changed, removed = record_snapshot(con, table_name, df, convert=convert_types)
 
-                    print(f"✅ Stored {len(df)} rows into {DB_NAME}.{table_name}")
+                    if version is None:
+                        print(f"⏩ No changes in {table_name}")
+                    else:
+                        print(f"✅ Stored {len(df)} rows into {DB_NAME}.{table_name} "
+                              f"(snapshot v{version}: {changed} changed, {removed} removed)")
 
                 except Exception as e:
                     print(f"❌ Failed {season} | {competition} | {stat_type} | {e}")
 
+    build_similarity_index(con)
+    build_percentiles(con)
+    if CATEGORICAL_ENUMS:
+        encode_categorical_columns(con)
+
+def build_similarity_index(con, path=INDEX_PATH):
+    """Per-90 feature matrix + neighbour lists for similar_players; the app loads this file
+    when it matches the current ingest version and rebuilds it otherwise."""
+    try:
+        index = SimilarityIndex.build(con, ingest_version(con)).precompute_neighbors()
+        index.save(path)
+        print(f"✅ Similarity index: {len(index)} players x {len(index.features)} features -> {path}")
+    except Exception as e:
+        print(f"❌ Failed similarity index | {e}")
+
+def build_percentiles(con):
+    """Percentile ranks of every stat per position group, league and season (and across all
+    leagues), so subjective questions read one row per player instead of a whole table."""
+    try:
+        rows = build_percentile_table(con)
+        print(f"✅ Stored {rows} rows into {DB_NAME}.{PERCENTILE_TABLE}")
+    except Exception as e:
+        print(f"❌ Failed {PERCENTILE_TABLE} | {e}")
+
+def encode_categorical_columns(con):
+    """Re-type the categorical columns of every stats table - tables a refresh replaced come back as text."""
+    try:
+        counts = encode_categoricals(con)
+        print(f"✅ Categorical columns: {', '.join(f'{c} ({n} values)' for c, n in counts.items())}")
+    except Exception as e:
+        print(f"❌ Failed categorical columns | {e}")
+
 if __name__ == "__main__":
-    ingest_to_motherduck()
+    #   python ingest.py            -> scrape missing tables
+    #   python ingest.py --refresh  -> also re-scrape existing ones (matchweek refresh)
+    #   python ingest.py --migrate  -> only re-type text tables from before numbers were converted
+    if "--migrate" in sys.argv[1:]:
+        tables = migrate_numeric_columns(get_connection())
+        print(f"✅ Migrated {len(tables)} tables to numeric columns")
+    else:
+        ingest_to_motherduck(refresh=REFRESH_EXISTING or "--refresh" in sys.argv[1:])
@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+
+from metrics import LLM_QUEUE_DEPTH, LLM_IN_FLIGHT, LLM_QUEUE_WAIT_SECONDS, LLM_REJECTED, LLM_RETRIES
+
+# substrings of the errors Gemini (google-api-core / langchain-google-genai) raises when throttling
+RATE_LIMIT_MARKERS = ("429", "resource has been exhausted", "resourceexhausted", "rate limit", "quota")
+
+
+class Overloaded(Exception):
+    """The LLM wait queue is full, or no slot freed up before the deadline."""
+
+
+def is_rate_limit(error) -> bool:
+    text = f"{type(error).__name__} {error}".lower()
+    return getattr(error, "code", None) == 429 or any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+class LLMScheduler:
+    """Admission control in front of one model.
+
+    At most max_concurrency calls run at once; up to max_queue more wait for a slot, each
+    for at most queue_timeout_s. Anything beyond that is rejected straight away with
+    Overloaded, so a burst fails fast instead of tying up every request thread.
+    Rate-limit errors are retried with jittered exponential backoff while holding the slot.
+    """
+
+    def __init__(self, model, max_concurrency=4, max_queue=16, queue_timeout_s=10.0,
+                 max_retries=3, backoff_base_s=0.5, backoff_max_s=8.0):
+        self.model = model
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def _acquire(self):
+        # fast path - a free slot means no queueing at all
+        if self._slots.acquire(blocking=False):
+            LLM_QUEUE_WAIT_SECONDS.labels(self.model).observe(0)
+            return
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                LLM_REJECTED.labels(self.model, "queue_full").inc()
+                raise Overloaded(f"{self.model}: {self._waiting} requests already waiting")
+            self._waiting += 1
+            LLM_QUEUE_DEPTH.labels(self.model).inc()
+        start = time.perf_counter()
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout_s)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+            LLM_QUEUE_DEPTH.labels(self.model).dec()
+            LLM_QUEUE_WAIT_SECONDS.labels(self.model).observe(time.perf_counter() - start)
+        if not acquired:
+            LLM_REJECTED.labels(self.model, "deadline").inc()
+            raise Overloaded(f"{self.model}: no slot within {self.queue_timeout_s:g}s")
+
+    def _release(self):
+        self._slots.release()
+
+    def _backoff(self, attempt):
+        # full jitter: uniform over [0, min(max, base * 2^attempt)]
+        time.sleep(random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt)))
+
+    def call(self, fn):
+        """Run fn() in a slot; retries rate-limit errors."""
+        self._acquire()
+        LLM_IN_FLIGHT.labels(self.model).inc()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return fn()
+                except Exception as e:
+                    if attempt == self.max_retries or not is_rate_limit(e):
+                        raise
+                    LLM_RETRIES.labels(self.model).inc()
+                    self._backoff(attempt)
+        finally:
+            LLM_IN_FLIGHT.labels(self.model).dec()
+            self._release()
+
+    def stream(self, make_stream):
+        """Iterate make_stream() in a slot held until the stream ends.
+
+        Rate-limit errors are only retried before the first chunk - after that the
+        client has already seen part of the answer.
+        """
+        self._acquire()
+        LLM_IN_FLIGHT.labels(self.model).inc()
+        try:
+            for attempt in range(self.max_retries + 1):
+                started = False
+                try:
+                    for chunk in make_stream():
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started or attempt == self.max_retries or not is_rate_limit(e):
+                        raise
+                    LLM_RETRIES.labels(self.model).inc()
+                    self._backoff(attempt)
+        finally:
+            LLM_IN_FLIGHT.labels(self.model).dec()
+            self._release()
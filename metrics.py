@@ -0,0 +1,167 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# set CHAT_TRACE_LOG=1 to print one JSON trace line per /chat request
+TRACE_LOG = os.getenv("CHAT_TRACE_LOG", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+STAGE_SECONDS = Histogram(
+    "chat_stage_seconds", "Time spent in each stage of a /chat request", ["stage"], buckets=LATENCY_BUCKETS
+)
+LLM_SECONDS = Histogram(
+    "chat_llm_seconds", "Latency of LLM calls by chain", ["chain"], buckets=LATENCY_BUCKETS
+)
+TTFT_SECONDS = Histogram(
+    "chat_time_to_first_token_seconds", "Request start to the first answer token", buckets=LATENCY_BUCKETS
+)
+SQL_SECONDS = Histogram(
+    "chat_sql_seconds", "SQL execution time by source", ["source"], buckets=LATENCY_BUCKETS
+)
+RESULT_BYTES = Histogram(
+    "chat_sql_result_bytes", "Size of the SQL result passed to the answer prompt", buckets=BYTES_BUCKETS
+)
+HISTORY_SECONDS = Histogram(
+    "chat_history_io_seconds", "chat_history reads and writes", ["op"], buckets=LATENCY_BUCKETS
+)
+PROMPT_HISTORY_TOKENS = Histogram(
+    "chat_prompt_history_tokens", "Estimated history tokens per prompt, before and after compaction",
+    ["chain", "form"], buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
+PROMPT_CONTEXT_TOKENS = Histogram(
+    "chat_prompt_context_tokens", "Estimated tokens of the SQL result in the prompt, raw JSON vs encoded",
+    ["form"], buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
+ANSWER_FRAMES = Histogram(
+    "chat_answer_frames", "SSE token frames sent per streamed answer",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+REQUEST_CPU_SECONDS = Histogram(
+    "chat_request_cpu_seconds", "CPU time of the worker thread serving a /chat request",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+FAST_PATH = Counter("chat_fast_path_total", "Answers rendered locally vs sent to the answer LLM", ["outcome"])
+SQL_VALIDATION = Counter(
+    "chat_sql_validation_total", "Generated SQL checked against the shadow catalog, and regeneration outcomes", ["outcome"]
+)
+ERRORS = Counter("chat_errors_total", "Errors by stage", ["stage"])
+# bulk export API (/api/query, /api/table/<name>)
+EXPORT_REQUESTS = Counter("export_requests_total", "Export requests by format and outcome", ["format", "outcome"])
+EXPORT_BYTES = Counter("export_bytes_total", "Bytes streamed by the export API", ["format"])
+CACHE_HITS = Counter("chat_cache_hits_total", "Work skipped thanks to a cache or local fast path", ["cache"])
+# rendered-answer cache (answer_cache.py); hit rate = hit / (hit + miss)
+ANSWER_CACHE_LOOKUPS = Counter(
+    "chat_answer_cache_total", "Rendered-answer cache lookups (hit/miss) and entries stored/evicted/invalidated", ["outcome"]
+)
+ANSWER_CACHE_BYTES = Gauge(
+    "chat_answer_cache_bytes", "Bytes of cached answers", multiprocess_mode="livesum"
+)
+ANSWER_CACHE_SAVED_SECONDS = Histogram(
+    "chat_answer_cache_saved_seconds", "Answer generation time a cache hit skipped, minus the replay",
+    buckets=LATENCY_BUCKETS,
+)
+# LLM admission control (llm_scheduler.py); gauges are summed over live gunicorn workers
+LLM_QUEUE_DEPTH = Gauge(
+    "chat_llm_queue_depth", "Requests waiting for an LLM slot", ["model"], multiprocess_mode="livesum"
+)
+LLM_IN_FLIGHT = Gauge(
+    "chat_llm_in_flight", "LLM calls holding a slot", ["model"], multiprocess_mode="livesum"
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "chat_llm_queue_wait_seconds", "Time spent waiting for an LLM slot", ["model"], buckets=LATENCY_BUCKETS
+)
+LLM_REJECTED = Counter("chat_llm_rejected_total", "LLM calls turned away by admission control", ["model", "reason"])
+LLM_RETRIES = Counter("chat_llm_retries_total", "LLM calls retried after a rate-limit error", ["model"])
+SINGLEFLIGHT = Counter(
+    "chat_singleflight_total",
+    "Coalesced in-flight work; outcome=shared counts calls that reused another request's work",
+    ["flight", "outcome"],
+)
+# fast/strong model routing (model_router.py); stage=sql_generation_escalation counts failed SQL retried on strong
+MODEL_ROUTES = Counter("chat_model_routes_total", "LLM stages sent to each model tier", ["stage", "tier"])
+MODEL_TIER_SECONDS = Histogram(
+    "chat_model_tier_seconds", "LLM latency by model tier and stage", ["tier", "stage"], buckets=LATENCY_BUCKETS
+)
+MODEL_TIER_OUTCOMES = Counter(
+    "chat_model_tier_outcomes_total",
+    "LLM stage results by model tier; failed = SQL that errored or failed validation, error = the call raised",
+    ["tier", "stage", "outcome"],
+)
+
+
+def render_metrics():
+    """Prometheus text output; aggregates all gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class Trace:
+    """Timing spans for one request; each span also feeds the stage histogram."""
+
+    def __init__(self, route="chat"):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.route = route
+        self.start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        self.spans = []
+        self.attributes = {}
+
+    @contextmanager
+    def span(self, stage, histogram=None):
+        """Time a block; histogram is an optional extra (already labelled) metric to observe."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = repr(e)
+            ERRORS.labels(stage).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_SECONDS.labels(stage).observe(elapsed)
+            if histogram is not None:
+                histogram.observe(elapsed)
+            self.spans.append({
+                "stage": stage,
+                "start_ms": round((start - self.start) * 1000, 2),
+                "ms": round(elapsed * 1000, 2),
+                **({"error": error} if error else {}),
+            })
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def finish(self):
+        cpu = time.thread_time() - self.cpu_start
+        REQUEST_CPU_SECONDS.observe(cpu)
+        self.attributes["cpu_ms"] = round(cpu * 1000, 2)
+        if TRACE_LOG:
+            print(json.dumps({
+                "trace_id": self.trace_id,
+                "route": self.route,
+                "total_ms": round(self.elapsed() * 1000, 2),
+                "spans": self.spans,
+                **self.attributes,
+            }))
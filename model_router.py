@@ -0,0 +1,88 @@
+import re
+
+from metrics import MODEL_ROUTES
+from query_templates import LEAGUE_ALIASES, STAT_ALIASES, normalize_question
+
+FAST = "fast"
+STRONG = "strong"
+STAGES = ("sql_generation", "answer")
+
+# wording that asks for a comparison - two result sets to line up, more ways for the SQL to go wrong
+COMPARATIVE_RE = re.compile(
+    r"\b(?:compare|comparison|vs|versus|than|between|difference|differ|better|worse|head to head)\b"
+)
+# wording that asks for judgement rather than a lookup ("best"/"worst" alone are just rankings)
+SUBJECTIVE_RE = re.compile(
+    r"\b(?:why|should|opinion|think|elite|world class|overrated|underrated|deserve|style|similar|"
+    r"plays like|explain|analy[sz]e|impact|rate|rating|how good|consistent|trend)\b"
+)
+# questions about every league at once - one UNION ALL branch per league
+ALL_LEAGUES_RE = re.compile(r"\b(?:all|every|each|across|top 5|top five|big 5|big five)\b.*\bleagues?\b|\beurope\b")
+ALL_LEAGUES = len(set(LEAGUE_ALIASES.values()))
+
+# longest aliases first, so "expected goals" is one stat and not also "goals"
+_STAT_PATTERNS = [
+    (re.compile(rf"\b{re.escape(alias)}\b"), column)
+    for alias, column in sorted(STAT_ALIASES.items(), key=lambda item: -len(item[0]))
+]
+_LEAGUE_PATTERNS = [(re.compile(rf"\b{re.escape(alias)}\b"), league) for alias, league in LEAGUE_ALIASES.items()]
+
+# result size that adds a point to the answer stage's score, and the most points it can add
+RESULT_BYTES_STEP = 8 * 1024
+MAX_RESULT_POINTS = 3
+
+
+def question_features(question: str, mentions=0):
+    """Counts the router scores a question on - all local, no model call."""
+    q = normalize_question(question)
+    leagues = {league for pattern, league in _LEAGUE_PATTERNS if pattern.search(q)}
+    stats = set()
+    rest = q
+    for pattern, column in _STAT_PATTERNS:
+        if pattern.search(rest):
+            stats.add(column)
+            rest = pattern.sub(" ", rest)
+    return {
+        "entities": mentions,
+        "leagues": ALL_LEAGUES if ALL_LEAGUES_RE.search(q) else len(leagues),
+        "stats": len(stats),
+        "comparative": bool(COMPARATIVE_RE.search(q)),
+        "subjective": bool(SUBJECTIVE_RE.search(q)),
+    }
+
+
+def complexity_score(features, result_bytes=0):
+    """One point per entity, league and stat past the first, two for comparative or subjective
+    wording, and (answer stage) one per RESULT_BYTES_STEP of SQL result."""
+    score = sum(max(0, features[k] - 1) for k in ("entities", "leagues", "stats"))
+    score += 2 * features["comparative"] + 2 * features["subjective"]
+    score += min(MAX_RESULT_POINTS, result_bytes // RESULT_BYTES_STEP)
+    return score
+
+
+class ModelRouter:
+    """Sends each LLM stage to the fast or the strong model tier.
+
+    A stage goes to the strong tier when the question's complexity score reaches that stage's
+    threshold - 0 pins the stage to the strong tier, a large number to the fast one. Disabled,
+    everything goes to the strong tier. Holds no models, so it can be exercised on its own.
+    """
+
+    def __init__(self, thresholds, enabled=True):
+        self.thresholds = dict(thresholds)
+        self.enabled = enabled
+
+    def route(self, stage, question, mentions=0, result_bytes=0):
+        """(tier, score, features) for one stage of one question."""
+        features = question_features(question, mentions)
+        score = complexity_score(features, result_bytes)
+        tier = STRONG if not self.enabled or score >= self.thresholds.get(stage, 0) else FAST
+        MODEL_ROUTES.labels(stage, tier).inc()
+        return tier, score, features
+
+    def escalate(self, stage, tier):
+        """Tier to retry a failed stage on - None when it already ran on the strong tier."""
+        if tier == STRONG:
+            return None
+        MODEL_ROUTES.labels(f"{stage}_escalation", STRONG).inc()
+        return STRONG
@@ -0,0 +1,257 @@
+import re
+import time
+from collections import defaultdict
+
+from query_templates import TABLE_NAME_RE, STAT_ALIASES, LEAGUE_ALIASES, fold_accents
+from snapshots import ingest_version
+
+# nicknames and short forms users type -> canonical FBref spelling
+# extra rows can be added in MotherDuck with: CREATE TABLE name_aliases (alias TEXT, canonical TEXT)
+ALIASES = {
+    "spurs": "Tottenham",
+    "tottenham hotspur": "Tottenham",
+    "man utd": "Manchester Utd",
+    "man united": "Manchester Utd",
+    "manchester united": "Manchester Utd",
+    "man city": "Manchester City",
+    "newcastle": "Newcastle Utd",
+    "forest": "Nott'ham Forest",
+    "nottingham forest": "Nott'ham Forest",
+    "wolverhampton": "Wolves",
+    "psg": "Paris S-G",
+    "paris saint-germain": "Paris S-G",
+    "paris saint germain": "Paris S-G",
+    "bayern": "Bayern Munich",
+    "inter milan": "Inter",
+    "ac milan": "Milan",
+    "atletico": "Atlético Madrid",
+    "atleti": "Atlético Madrid",
+    "barca": "Barcelona",
+    "mo salah": "Mohamed Salah",
+    "vini": "Vinicius Júnior",
+    "vinicius": "Vinicius Júnior",
+    "kdb": "Kevin De Bruyne",
+    "trent": "Trent Alexander-Arnold",
+}
+
+# words that never start or make up a name mention
+STOPWORDS = {
+    "who", "what", "which", "how", "many", "much", "is", "are", "was", "were", "has", "have", "had",
+    "does", "did", "do", "the", "a", "an", "in", "of", "for", "and", "or", "to", "vs", "versus", "with",
+    "most", "top", "best", "this", "last", "season", "league", "player", "players", "team", "teams",
+    "compare", "than", "more", "less", "score", "scored", "stats", "me", "show", "give", "his", "their",
+    "between", "better", "good", "elite", "about", "so", "far", "per", "90", "total",
+}
+STAT_WORDS = {word for alias in STAT_ALIASES for word in alias.split()}
+LEAGUE_WORDS = {word for alias in LEAGUE_ALIASES for word in alias.split()}
+
+# candidate generation only walks the rarest trigrams of the query
+MAX_PROBE_GRAMS = 6
+MAX_SPAN_WORDS = 3
+# a fuzzy match has to beat the runner-up by this much - "palmer" scores the same against
+# Cole Palmer and Alex Palmer, and picking one would answer for the wrong player
+AMBIGUITY_MARGIN = 0.05
+
+
+def trigrams(folded: str):
+    """Padded per-word trigrams, e.g. "salah" -> {"  s", " sa", "sal", "ala", "lah", "ah "}."""
+    grams = set()
+    for word in folded.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _fold(text: str) -> str:
+    return re.sub(r"[^a-z0-9' ]+", " ", fold_accents(text)).replace("'", "").strip()
+
+
+class NameIndex:
+    """In-memory trigram index over every player name and team in the stats tables."""
+
+    def __init__(self, aliases=None):
+        self.names = []        # id -> canonical name
+        self.kinds = []        # id -> "player" | "team"
+        self.gram_sets = []    # id -> trigram set
+        self.ids = {}          # (kind, canonical) -> id
+        self.exact = {}        # folded full name -> id
+        self.last_names = defaultdict(set)  # folded last word -> ids
+        self.name_words = defaultdict(set)  # any folded word of a player name -> ids
+        self.postings = defaultdict(list)   # trigram -> ids
+        self.aliases = {}
+        self.loaded_tables = set()
+        self.version = None
+        self.refreshed_at = 0.0
+        for alias, canonical in (aliases if aliases is not None else ALIASES).items():
+            self.add_alias(alias, canonical)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_alias(self, alias: str, canonical: str):
+        self.aliases[_fold(alias)] = canonical
+
+    def add(self, kind: str, name: str):
+        """Index one name; re-adding an existing name is a no-op so rebuilds can be incremental."""
+        if not name or (kind, name) in self.ids:
+            return
+        folded = _fold(name)
+        if not folded:
+            return
+        name_id = len(self.names)
+        grams = trigrams(folded)
+        self.names.append(name)
+        self.kinds.append(kind)
+        self.gram_sets.append(grams)
+        self.ids[(kind, name)] = name_id
+        self.exact.setdefault(folded, name_id)
+        if kind == "player":
+            self.last_names[folded.split()[-1]].add(name_id)
+            for word in folded.split():
+                self.name_words[word].add(name_id)
+        for gram in grams:
+            self.postings[gram].append(name_id)
+
+    def load_tables(self, con, tables):
+        """Add names and teams from the given tables (e.g. the ones a fresh ingest created)."""
+        for table in tables:
+            if table in self.loaded_tables:
+                continue
+            rows = con.execute(f'SELECT DISTINCT name, team FROM main."{table}"').fetchall()
+            for name, team in rows:
+                self.add("player", name)
+                self.add("team", team)
+            self.loaded_tables.add(table)
+
+    def refresh(self, con):
+        """Pick up new tables, and new rows in known ones, without rebuilding the whole index.
+
+        A changed ingest version means a refresh rewrote some tables (promoted players,
+        January signings), so every table is read again - add() skips names already indexed.
+        """
+        version = ingest_version(con)
+        if version != self.version:
+            self.loaded_tables.clear()
+            self.version = version
+        tables = [t for t in con.execute("SHOW TABLES").fetchdf()["name"].tolist() if TABLE_NAME_RE.match(t)]
+        self.load_tables(con, [t for t in tables if t not in self.loaded_tables])
+        if "name_aliases" in tables:
+            for alias, canonical in con.execute("SELECT alias, canonical FROM name_aliases").fetchall():
+                self.add_alias(alias, canonical)
+        self.refreshed_at = time.time()
+
+    def maybe_refresh(self, con, max_age_s=300):
+        if time.time() - self.refreshed_at > max_age_s:
+            self.refresh(con)
+
+    def _exact(self, folded: str, kind=None):
+        canonical = self.aliases.get(folded)
+        if canonical:
+            for alias_kind in ("team", "player"):
+                name_id = self.ids.get((alias_kind, canonical))
+                if name_id is not None and kind in (None, alias_kind):
+                    return name_id
+        name_id = self.exact.get(folded)
+        if name_id is not None and kind in (None, self.kinds[name_id]):
+            return name_id
+        # a unique surname ("odegaard") is as good as the full name - but not one that is also
+        # somebody else's first name ("james": Reece James, James Maddison, ...)
+        ids = self._word_ids(folded, kind)
+        if len(ids) == 1 and ids[0] in self.last_names.get(folded, ()):
+            return ids[0]
+        return None
+
+    def _word_ids(self, folded: str, kind=None):
+        """Players with the single word folded anywhere in their name."""
+        if kind not in (None, "player") or " " in folded:
+            return []
+        return sorted(self.name_words.get(folded, ()))
+
+    def _ranked(self, folded: str, kind=None):
+        """[(id, score), ...] of the fuzzy candidates, best first."""
+        query = trigrams(folded)
+        probes = sorted((g for g in query if g in self.postings), key=lambda g: len(self.postings[g]))
+        candidates = set()
+        for gram in probes[:MAX_PROBE_GRAMS]:
+            candidates.update(self.postings[gram])
+
+        scored = []
+        for candidate in candidates:
+            if kind and self.kinds[candidate] != kind:
+                continue
+            grams = self.gram_sets[candidate]
+            overlap = len(query & grams)
+            # half containment (short queries like "odegaard" vs "martin odegaard"), half Dice
+            scored.append((candidate, 0.5 * overlap / len(query) + overlap / (len(query) + len(grams))))
+        scored.sort(key=lambda item: -item[1])
+        return scored
+
+    def lookup(self, text: str, kind=None, threshold=0.6):
+        """Return (canonical, kind, score) for the best match of text, or None below threshold
+        or when it is ambiguous - a word in several players' names, or a runner-up within
+        AMBIGUITY_MARGIN of the best score. candidates() lists the names in that case."""
+        folded = _fold(text)
+        if not folded:
+            return None
+        name_id = self._exact(folded, kind)
+        if name_id is not None:
+            return self.names[name_id], self.kinds[name_id], 1.0
+        if len(self._word_ids(folded, kind)) > 1:
+            return None
+
+        ranked = self._ranked(folded, kind)
+        if not ranked or ranked[0][1] < threshold:
+            return None
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < AMBIGUITY_MARGIN:
+            return None
+        best, best_score = ranked[0]
+        return self.names[best], self.kinds[best], round(best_score, 3)
+
+    def candidates(self, text: str, kind=None, threshold=0.6, limit=5):
+        """Canonical names text could mean when lookup() won't pick one, best first."""
+        folded = _fold(text)
+        if not folded:
+            return []
+        ids = self._word_ids(folded, kind)
+        if len(ids) > 1:
+            return [self.names[i] for i in ids][:limit]
+        ranked = [(i, score) for i, score in self._ranked(folded, kind) if score >= threshold]
+        if not ranked:
+            return []
+        return [self.names[i] for i, score in ranked if ranked[0][1] - score < AMBIGUITY_MARGIN][:limit]
+
+    def find_mentions(self, question: str, threshold=0.75):
+        """Find player/team names in a free-text question, longest spans first."""
+        words = _fold(question).split()
+        taken = [False] * len(words)
+        mentions = []
+        for size in range(MAX_SPAN_WORDS, 0, -1):
+            for start in range(len(words) - size + 1):
+                span = words[start:start + size]
+                if any(taken[start:start + size]) or span[0] in STOPWORDS or span[-1] in STOPWORDS:
+                    continue
+                if all(w in STOPWORDS or w in STAT_WORDS or w in LEAGUE_WORDS for w in span):
+                    continue
+                text = " ".join(span)
+                # single short words only resolve exactly, fuzzy matches on them are noise
+                found = self.lookup(text, threshold=threshold) if size > 1 or len(text) >= 5 else None
+                if found is None and size == 1:
+                    name_id = self._exact(text)
+                    found = (self.names[name_id], self.kinds[name_id], 1.0) if name_id is not None else None
+                if found:
+                    mentions.append((text,) + found)
+                    for i in range(start, start + size):
+                        taken[i] = True
+        return mentions
+
+
+def format_name_hints(mentions):
+    """Prompt lines telling the SQL model which exact values to filter on."""
+    if not mentions:
+        return ""
+    # quotes doubled so the hint is already a valid SQL literal ("Nott'ham Forest")
+    lines = []
+    for text, canonical, kind, _ in mentions:
+        literal = canonical.replace("'", "''")
+        lines.append(f"- \"{text}\" -> {'team' if kind == 'team' else 'name'} = '{literal}'")
+    return "\n\nResolved names (use these exact values in WHERE clauses):\n" + "\n".join(lines)
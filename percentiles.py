@@ -0,0 +1,69 @@
+from player_stats import load_player_table, IDENTITY_COLUMNS
+
+# where ingest.py writes the ranks - small enough for the LLM to read one row per player
+TABLE_NAME = "player_percentiles"
+# fewer minutes than this and a player's rates are noise - they are left out (and don't skew the rest)
+MIN_MINUTES = 450
+# stats where less is better - ranked the other way, so a high percentile always means "better than"
+LOWER_IS_BETTER = {
+    "yellow_cards", "red_cards", "challenges_lost", "error_shot", "miscontrols", "dispossessed",
+    "tackled_during_take_on", "goals_against", "goals_against_per90", "PK_conceded", "losses",
+    "average_shot_distance",
+}
+KEY_COLUMNS = ["player_id", "name", "team", "position", "position_group", "competition", "season", "minutes"]
+# peer groups: same position group in the same league, and the same position group across all leagues
+LEAGUE_GROUP = ["position_group", "competition", "season"]
+ALL_LEAGUES_GROUP = ["position_group", "season"]
+
+
+def stat_columns(players):
+    import pandas as pd
+    skip = set(IDENTITY_COLUMNS) | {"year_born"}
+    return [c for c in players.columns
+            if c not in skip and pd.api.types.is_numeric_dtype(players[c]) and players[c].notna().any()]
+
+
+def compute_percentiles(players):
+    """`<stat>_pct` (within league) and `<stat>_pct_all` (all leagues) for every stat, 0-100.
+
+    One groupby().rank() per peer group ranks every column at once.
+    """
+    import pandas as pd
+
+    stats = stat_columns(players)
+    values = players[stats].copy()
+    lower = [c for c in stats if c.removesuffix("_per90") in LOWER_IS_BETTER]
+    values[lower] = -values[lower]
+    values[LEAGUE_GROUP] = players[LEAGUE_GROUP]
+
+    # ties share the lowest rank: the defenders on 0 goals are "better than" nobody, not all of
+    # them at the 80th percentile because they make up 80% of the group
+    league = values.groupby(LEAGUE_GROUP)[stats].rank(pct=True, method="min")
+    everyone = values[stats].groupby([players[c] for c in ALL_LEAGUES_GROUP]).rank(pct=True, method="min")
+
+    def compact(ranks, suffix):
+        # UTINYINT-sized whole percentiles; NULL where the stat is missing
+        scaled = (ranks * 100).round().astype("UInt8")
+        scaled.columns = [f"{c}_{suffix}" for c in stats]
+        return scaled
+
+    result = pd.concat(
+        [players[KEY_COLUMNS].reset_index(drop=True),
+         compact(league, "pct").reset_index(drop=True),
+         compact(everyone, "pct_all").reset_index(drop=True)],
+        axis=1,
+    )
+    result["minutes"] = result["minutes"].round().astype("Int32")
+    return result
+
+
+def build_percentile_table(con, table_name=TABLE_NAME, min_minutes=MIN_MINUTES):
+    """(Re)create main.<table_name> from the current stats tables; returns its row count."""
+    players, _ = load_player_table(con, min_minutes, all_stats=True)
+    result = compute_percentiles(players)
+    con.register("percentiles_df", result)
+    try:
+        con.execute(f'CREATE OR REPLACE TABLE main."{table_name}" AS SELECT * FROM percentiles_df')
+    finally:
+        con.unregister("percentiles_df")
+    return len(result)
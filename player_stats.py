@@ -0,0 +1,129 @@
+import hashlib
+from collections import defaultdict
+
+from query_templates import TABLE_NAME_RE
+
+# pandas and numpy are imported inside the functions - chatbot imports this module (via
+# percentiles) for the table names, and pandas alone is a third of its import time
+
+# stat tables joined into one row per player (keeper stats only make sense within goalkeepers)
+STAT_TYPES = ["standard", "shooting", "passing", "defensive", "possession"]
+# per stat table: counting stats turned into per-90 rates, and stats that already are rates.
+# a column name that isn't in the table (e.g. "xG" in the CSV snapshots) is skipped
+PER90_COLUMNS = {
+    "standard": ["goals", "assists", "non-PK_goals", "expected_goals(xG)", "xG", "xG_nonpenalty",
+                 "progressive_carries", "progressive_passes"],
+    "shooting": ["shots", "shots_on_target"],
+    "passing": ["completed_passes", "pass_attempts", "progressive_passes_distance", "long_pass_attempts",
+                "expected_assists(xA)", "key_passes", "passes_into_final_third", "passes_into_penalty_area",
+                "crosses_into_penalty_area"],
+    "defensive": ["tackles", "tackles_won", "def3_tackles", "mid3_tackles", "att3_tackles", "blocks",
+                  "shots_blocked", "passes_blocked", "interceptions", "clearances"],
+    "possession": ["touches", "touches_defensive_pen_area", "touches_attacking_third", "touches_attacking_pen_area",
+                   "take_on_attempts", "successful_take_on", "ball_carries", "progressive_carry_distance",
+                   "carries_into_final_third", "carries_into_penalty_area", "miscontrols", "dispossessed",
+                   "progressive_passes_recieved"],
+}
+RATE_COLUMNS = {
+    "shooting": ["average_shot_distance", "shots_on_target_percentage"],
+    "passing": ["pass_completion_percentage", "long_pass_completion_percentage"],
+    "defensive": ["tackle_percentage"],
+    "possession": ["take_on_percentage"],
+}
+# FBref lists every position a player played ("DF,MF"); the first one is the main role
+POSITION_GROUPS = {"GK": "GK", "DF": "DF", "MF": "MF", "FW": "FW"}
+# taken from the standard table only
+BASE_COLUMNS = ["name", "nation", "position", "team", "age", "year_born", "minutes", "full_games", "season", "competition"]
+IDENTITY_COLUMNS = ["player_id", "name", "nation", "position", "position_group", "team", "age",
+                    "competition", "season", "minutes", "full_games"]
+
+
+def player_id(name, nation, year_born) -> str:
+    """Stable id for a player across teams, leagues and seasons."""
+    import pandas as pd
+    key = f"{name}|{nation or ''}|{'' if pd.isna(year_born) else int(year_born)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def numeric(series):
+    # older tables were loaded before convert_types and hold numbers as strings ("2,508")
+    import pandas as pd
+    return pd.to_numeric(series.astype("string").str.replace(",", "", regex=False), errors="coerce")
+
+
+def position_group(position) -> str:
+    first = str(position or "").split(",")[0].strip().upper()
+    return POSITION_GROUPS.get(first, "MF")
+
+
+def stat_partitions(con):
+    """{(competition, season): {stat_type: table}} for every ingested stats table."""
+    partitions = defaultdict(dict)
+    for table in con.execute("SHOW TABLES").fetchdf()["name"].tolist():
+        parsed = TABLE_NAME_RE.match(table)
+        if parsed:
+            stat_type, competition, start, end = parsed.groups()
+            partitions[(competition, f"{start}-{end}")][stat_type] = table
+    return partitions
+
+
+def load_player_table(con, min_minutes=0, all_stats=False):
+    """One row per player per team, league and season with every per-90 and rate feature
+    (and every other numeric stat of the five tables with all_stats=True).
+
+    Returns (DataFrame, feature columns). Per-90 columns are named `<stat>_per90`.
+    """
+    import numpy as np
+    import pandas as pd
+
+    frames = []
+    for (competition, season), tables in sorted(stat_partitions(con).items()):
+        if "standard" not in tables:
+            continue
+        players = None
+        taken = set()
+        for stat_type in STAT_TYPES:
+            table = tables.get(stat_type)
+            if not table:
+                continue
+            df = con.execute(f'SELECT * FROM main."{table}"').fetchdf()
+            if all_stats:
+                wanted = [c for c in df.columns if c not in BASE_COLUMNS and c not in taken]
+            else:
+                wanted = [c for c in PER90_COLUMNS.get(stat_type, []) + RATE_COLUMNS.get(stat_type, [])
+                          if c in df.columns and c not in taken]
+            taken.update(wanted)
+            if players is None:
+                base = [c for c in BASE_COLUMNS if c in df.columns and c not in ("season", "competition")]
+                players = df[base + wanted].copy()
+            else:
+                # a name + team appears once per table (a mid-season transfer gets one row per team)
+                df = df.drop_duplicates(subset=["name", "team"])
+                players = players.merge(df[["name", "team"] + wanted], on=["name", "team"], how="left")
+        players["competition"] = competition.replace("_", "-")
+        players["season"] = season
+        frames.append(players)
+    if not frames:
+        return pd.DataFrame(columns=IDENTITY_COLUMNS), []
+
+    players = pd.concat(frames, ignore_index=True)
+    for column in players.columns:
+        if column not in ("name", "nation", "position", "team", "competition", "season"):
+            players[column] = numeric(players[column]).astype("float64")
+    players = players[players["minutes"].fillna(0) >= min_minutes].reset_index(drop=True)
+    players["player_id"] = [player_id(*row) for row in players[["name", "nation", "year_born"]].itertuples(index=False)]
+    players["position_group"] = players["position"].map(position_group)
+
+    features = []
+    per90 = {}
+    nineties = players["full_games"].where(players["full_games"] > 0).to_numpy(dtype=np.float64, na_value=np.nan)
+    for stat_type in STAT_TYPES:
+        for column in PER90_COLUMNS.get(stat_type, []):
+            if column in players.columns:
+                per90[f"{column}_per90"] = players[column].to_numpy(dtype=np.float64, na_value=np.nan) / nineties
+                features.append(f"{column}_per90")
+        for column in RATE_COLUMNS.get(stat_type, []):
+            if column in players.columns:
+                features.append(column)
+    players = pd.concat([players, pd.DataFrame(per90, index=players.index)], axis=1)
+    return players, features
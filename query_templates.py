@@ -0,0 +1,440 @@
+import re
+import time
+import unicodedata
+
+# The current season, used when the question doesn't name one
+CURRENT_SEASON = "2024-2025"
+
+# league names users type -> competition fragment used in the ingest table names
+LEAGUE_ALIASES = {
+    "premier league": "Premier_League",
+    "premier-league": "Premier_League",
+    "prem": "Premier_League",
+    "epl": "Premier_League",
+    "la liga": "La_Liga",
+    "la-liga": "La_Liga",
+    "laliga": "La_Liga",
+    "serie a": "Serie_A",
+    "serie-a": "Serie_A",
+    "bundesliga": "Bundesliga",
+    "ligue 1": "Ligue_1",
+    "ligue-1": "Ligue_1",
+    "ligue1": "Ligue_1",
+}
+
+# stat words users type -> (stat_type table, column) from STAT_CONFIG
+# longer phrases are matched first so "expected goals" wins over "goals"
+STAT_ALIASES = {
+    "goal contributions": ("standard", "G+A"),
+    "goals and assists": ("standard", "G+A"),
+    "goals + assists": ("standard", "G+A"),
+    "g+a": ("standard", "G+A"),
+    "non penalty goals": ("standard", "non-PK_goals"),
+    "non-penalty goals": ("standard", "non-PK_goals"),
+    "penalty goals": ("standard", "PK_goals"),
+    "penalties scored": ("standard", "PK_goals"),
+    "expected goals": ("standard", "expected_goals(xG)"),
+    "xg": ("standard", "expected_goals(xG)"),
+    "npxg": ("standard", "xG_nonpenalty"),
+    "goals": ("standard", "goals"),
+    "assists": ("standard", "assists"),
+    "yellow cards": ("standard", "yellow_cards"),
+    "red cards": ("standard", "red_cards"),
+    "minutes": ("standard", "minutes"),
+    "appearances": ("standard", "matches"),
+    "starts": ("standard", "starts"),
+    "progressive carries": ("standard", "progressive_carries"),
+    "progressive passes": ("standard", "progressive_passes"),
+    "goals conceded": ("keeper", "goals_against"),
+    "goals against": ("keeper", "goals_against"),
+    "clean sheets": ("keeper", "clean_sheets"),
+    "saves": ("keeper", "saves"),
+    "save percentage": ("keeper", "save_percentage"),
+    "tackles won": ("defensive", "tackles_won"),
+    "tackles": ("defensive", "tackles"),
+    "interceptions": ("defensive", "interceptions"),
+    "blocks": ("defensive", "blocks"),
+    "clearances": ("defensive", "clearances"),
+    "shots on target": ("shooting", "shots_on_target"),
+    "shots": ("shooting", "shots"),
+    "expected assists": ("passing", "expected_assists(xA)"),
+    "xa": ("passing", "expected_assists(xA)"),
+    "key passes": ("passing", "key_passes"),
+    "completed passes": ("passing", "completed_passes"),
+    "passes completed": ("passing", "completed_passes"),
+    "pass completion": ("passing", "pass_completion_percentage"),
+    "touches": ("possession", "touches"),
+    "successful take ons": ("possession", "successful_take_on"),
+    "successful dribbles": ("possession", "successful_take_on"),
+    "dribbles": ("possession", "successful_take_on"),
+}
+
+# table names written by ingest.py: {stat_type}_{competition}_{season}
+TABLE_NAME_RE = re.compile(
+    r"^(?:main\.)?(standard|keeper|defensive|shooting|passing|possession)_(.+)_(\d{4})_(\d{4})$"
+)
+
+SEASON_RE = re.compile(r"\b(20\d\d)\s*[-/]\s*(?:20)?(\d\d)\b")
+TOP_N_RE = re.compile(r"\b(?:top|best|first)\s+(\d{1,2})\b|\b(\d{1,2})\s+(?:players|best|highest|most)\b")
+RANK_DESC_RE = re.compile(r"\b(?:most|top|highest|best|leading|leaders?|leads)\b")
+RANK_ASC_RE = re.compile(r"\b(?:fewest|least|lowest|worst)\b")
+TEAM_RANK_RE = re.compile(r"\b(?:teams?|clubs?|sides?)\b")
+COMPARE_RE = re.compile(r"^(?:compare\s+)?(.+?)\s+(?:and|with|to|vs\.?|versus)\s+(.+)$")
+HOW_MANY_RE = re.compile(
+    r"^how many\s+(?P<stat>.+?)\s+(?:does|did|has|have|do)\s+(?P<entity>.+?)"
+    r"(?:\s+(?:score|scored|get|got|have|had|make|made|record|recorded|provide|provided|keep|kept))?$"
+)
+POSSESSIVE_STAT_RE = re.compile(r"^(?:what (?:is|are|were)\s+)?(?P<entity>.+?)'s\s+(?P<stat>.+)$")
+SEASON_LINE_RE = re.compile(
+    r"^(?:(?:show|give|get)(?: me)?\s+)?(?P<entity>.+?)(?:'s)?\s+"
+    r"(?:stats|statistics|season|numbers|season stats|stat line)$"
+    r"|^how (?:did|has|is) (?P<entity2>.+?) (?:do|doing|done|perform|performing|performed|play|playing|played)$"
+)
+
+# filler words stripped from entity text after stats/leagues/seasons are removed
+FILLER_RE = re.compile(
+    r"\b(?:this|last|current|season|in|the|for|of|at|so far|stats|statistics|league|"
+    r"total|totals|overall|all|leagues|five|5|big|europe|european|who|which|player|players|"
+    r"what|are|is|was|were|how|me|show|give|score|scored|get|got|have|had|make|made|"
+    r"record|recorded|provide|provided|keep|kept)\b"
+)
+
+# qualifiers no template can express - positions, ages, rates, other seasons, opposition.
+# A question still holding one once its parsed parts are stripped goes to the LLM instead
+# of getting a league-wide answer
+QUALIFIER_RE = re.compile(
+    r"\b(?:per|p90|90s?|ratio|rate|average|avg|percent|percentage|"
+    r"defenders?|midfielders?|forwards?|strikers?|attackers?|wingers?|full ?backs?|cent(?:re|er) ?backs?|"
+    r"under|over|u\d\d|aged?|young|younger|youngest|older|oldest|teenagers?|"
+    r"last|previous|since|career|ever|all time|history|"
+    r"concede|conceded|allowed|against|home|away)\b"
+)
+KEEPER_WORDS_RE = re.compile(r"\b(?:goal ?keepers?|keepers?|gks?)\b")
+
+DEFAULT_TOP_N = 10
+MAX_TOP_N = 50
+
+# columns returned when a question asks for a player's whole season line
+SEASON_LINE_STAT_TYPE = "standard"
+
+
+# letters that NFKD doesn't decompose into base letter + accent
+FOLD_MAP = str.maketrans({"ø": "o", "æ": "ae", "œ": "oe", "ß": "ss", "đ": "d", "ł": "l", "ı": "i", "ð": "d", "þ": "th"})
+
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip accents, e.g. "Ødegaard" -> "odegaard"."""
+    text = unicodedata.normalize("NFKD", text.lower().translate(FOLD_MAP))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, fold accents and tidy punctuation so the patterns stay simple."""
+    text = fold_accents(text)
+    text = text.replace("’", "'").replace("‘", "'")
+    text = re.sub(r"[?!.,;:]+(\s|$)", r"\1", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _num(column: str) -> str:
+    # ingest stores scraped values as text ("2,508"), so cast defensively
+    return f"TRY_CAST(REPLACE(CAST(\"{column}\" AS VARCHAR), ',', '') AS DOUBLE)"
+
+
+def _find_alias(text: str, aliases: dict):
+    """Return (value, text with the alias removed) for the longest alias found in text."""
+    for alias in sorted(aliases, key=len, reverse=True):
+        pattern = r"(?<![\w+])" + re.escape(alias) + r"(?![\w+])"
+        match = re.search(pattern, text)
+        if match:
+            return aliases[alias], (text[:match.start()] + " " + text[match.end():]).strip()
+    return None, text
+
+
+def _clean_entity(text: str) -> str:
+    text = SEASON_RE.sub(" ", text)
+    _, text = _find_alias(text, LEAGUE_ALIASES)
+    _, text = _find_alias(text, STAT_ALIASES)
+    text = text.replace("'s", " ")
+    text = FILLER_RE.sub(" ", text)
+    return re.sub(r"\s+", " ", text).strip(" '\"-")
+
+
+class TemplateLibrary:
+    """Parameterized SQL for the frequent question shapes, filled by a local parser.
+
+    Questions that don't fit a template return None from match() and go to chain_scrape.
+    """
+
+    def __init__(self, schema_info: dict, teams=None):
+        # (stat_type, competition, season) -> quoted table name
+        self.tables = {}
+        for full_name in schema_info:
+            parsed = TABLE_NAME_RE.match(full_name)
+            if parsed:
+                stat_type, competition, start, end = parsed.groups()
+                table = full_name.split(".")[-1]
+                self.tables[(stat_type, competition, f"{start}-{end}")] = f'main."{table}"'
+        self.teams = {t.lower() for t in (teams or [])}
+        # optional callable text -> (canonical, "player" | "team") or None, see name_index.py
+        self.resolver = None
+        self.stats = {
+            "matched": 0,
+            "fallback": 0,
+            "by_template": {},
+            "template_ms_total": 0.0,
+            "llm_ms_total": 0.0,
+            "llm_timed": 0,
+        }
+
+    def load_teams(self, con):
+        """Read the distinct team names so team totals can be told apart from players."""
+        branches = [
+            f"SELECT DISTINCT team FROM {table}"
+            for (stat_type, _, _), table in self.tables.items()
+            if stat_type == "standard"
+        ]
+        if branches:
+            rows = con.execute(" UNION ".join(branches)).fetchall()
+            self.teams = {str(r[0]).lower() for r in rows if r[0]}
+
+    def _tables_for(self, stat_type, competition, season):
+        return [
+            table for (t_stat, t_comp, t_season), table in sorted(self.tables.items())
+            if t_stat == stat_type and t_season == season and (competition is None or t_comp == competition)
+        ]
+
+    def _entity_filter(self, entity: str):
+        """(kind, SQL predicate, parameter) for a player or team mentioned in the question.
+
+        None when the resolver can't pin the name to one player or team ("palmer", "city") -
+        the template declines and the LLM gets to ask which one was meant.
+        """
+        if self.resolver:
+            resolved = self.resolver(entity)
+            if not resolved:
+                return None
+            canonical, kind = resolved
+            return (kind, "team = ?", canonical) if kind == "team" else (kind, "name = ?", canonical)
+        if entity in self.teams:
+            return "team", "lower(team) = ?", entity
+        return "player", "strip_accents(lower(name)) LIKE ?", f"%{entity}%"
+
+    def _parse_common(self, question: str):
+        season_match = SEASON_RE.search(question)
+        season = f"{season_match.group(1)}-{season_match.group(1)[:2]}{season_match.group(2)}" if season_match else CURRENT_SEASON
+        competition, _ = _find_alias(question, LEAGUE_ALIASES)
+        stat, _ = _find_alias(question, STAT_ALIASES)
+        return season, competition, stat
+
+    def _residue(self, q: str, stat):
+        """The question minus the season, league and stat a template can fill in."""
+        text = SEASON_RE.sub(" ", q)
+        _, text = _find_alias(text, LEAGUE_ALIASES)
+        _, text = _find_alias(text, STAT_ALIASES)
+        if stat and stat[0] == "keeper":
+            text = KEEPER_WORDS_RE.sub(" ", text)
+        return text
+
+    def _mentions_team(self, text: str) -> bool:
+        return any(re.search(r"(?<!\w)" + re.escape(fold_accents(team)) + r"(?!\w)", text) for team in self.teams)
+
+    def match(self, question: str):
+        """Parse a question into (template name, sql, params), or None if no template fits."""
+        q = normalize_question(question)
+        season, competition, stat = self._parse_common(q)
+        if QUALIFIER_RE.search(self._residue(q, stat)):
+            return None
+
+        built = (
+            self._match_compare(q, season, competition, stat)
+            or self._match_top_n(q, season, competition, stat)
+            or self._match_how_many(q, season, competition, stat)
+            or self._match_season_line(q, season, competition)
+        )
+        return built
+
+    def _match_top_n(self, q, season, competition, stat):
+        if not stat:
+            return None
+        descending = bool(RANK_DESC_RE.search(q))
+        ascending = bool(RANK_ASC_RE.search(q))
+        if not (descending or ascending):
+            return None
+        # "the most goals for Arsenal" - the top-n templates rank the whole league
+        if self._mentions_team(self._residue(q, stat)):
+            return None
+        stat_type, column = stat
+        tables = self._tables_for(stat_type, competition, season)
+        if not tables:
+            return None
+
+        n_match = TOP_N_RE.search(q)
+        n = int(next(g for g in n_match.groups() if g)) if n_match else DEFAULT_TOP_N
+        n = max(1, min(n, MAX_TOP_N))
+
+        order = "ASC" if ascending and not descending else "DESC"
+        if TEAM_RANK_RE.search(q):
+            branches = [
+                f'SELECT team, competition, SUM({_num(column)}) AS "{column}" FROM {table} GROUP BY team, competition'
+                for table in tables
+            ]
+            sql = " UNION ALL ".join(branches) + f' ORDER BY "{column}" {order} NULLS LAST LIMIT ?'
+            return "top_n_teams", sql, [n]
+
+        branches = [
+            f'SELECT name, team, competition, {_num(column)} AS "{column}" FROM {table}'
+            for table in tables
+        ]
+        sql = " UNION ALL ".join(branches) + f' ORDER BY "{column}" {order} NULLS LAST LIMIT ?'
+        return "top_n", sql, [n]
+
+    def _match_compare(self, q, season, competition, stat):
+        if not (q.startswith("compare ") or re.search(r"\b(?:vs\.?|versus)\b", q)):
+            return None
+        match = COMPARE_RE.match(q)
+        if not match:
+            return None
+        first, second = _clean_entity(match.group(1)), _clean_entity(match.group(2))
+        if not first or not second:
+            return None
+
+        stat_type, column = stat if stat else (SEASON_LINE_STAT_TYPE, None)
+        tables = self._tables_for(stat_type, competition, season)
+        if not tables:
+            return None
+
+        first_filter, second_filter = self._entity_filter(first), self._entity_filter(second)
+        if first_filter is None or second_filter is None:
+            return None
+        first_kind, first_sql, first_param = first_filter
+        second_kind, second_sql, second_param = second_filter
+        if first_kind == "team" or second_kind == "team":
+            return None
+        projection = f'name, team, competition, {_num(column)} AS "{column}"' if column else "*"
+        branches = [f"SELECT {projection} FROM {table} WHERE {first_sql} OR {second_sql}" for table in tables]
+        params = [first_param, second_param] * len(tables)
+        return "compare_players", " UNION ALL ".join(branches), params
+
+    def _match_how_many(self, q, season, competition, stat):
+        if not stat:
+            return None
+        match = HOW_MANY_RE.match(q) or POSSESSIVE_STAT_RE.match(q)
+        if not match:
+            return None
+        entity = _clean_entity(match.group("entity"))
+        if not entity:
+            return None
+
+        stat_type, column = stat
+        tables = self._tables_for(stat_type, competition, season)
+        if not tables:
+            return None
+
+        entity_filter = self._entity_filter(entity)
+        if entity_filter is None:
+            return None
+        kind, entity_sql, entity_param = entity_filter
+        if kind == "team":
+            branches = [
+                f'SELECT team, competition, SUM({_num(column)}) AS "{column}" FROM {table} '
+                f"WHERE {entity_sql} GROUP BY team, competition"
+                for table in tables
+            ]
+            return "team_total", " UNION ALL ".join(branches), [entity_param] * len(tables)
+
+        branches = [
+            f'SELECT name, team, competition, {_num(column)} AS "{column}" FROM {table} WHERE {entity_sql}'
+            for table in tables
+        ]
+        return "player_stat", " UNION ALL ".join(branches), [entity_param] * len(tables)
+
+    def _match_season_line(self, q, season, competition):
+        match = SEASON_LINE_RE.match(q)
+        if not match:
+            return None
+        entity = _clean_entity(match.group("entity") or match.group("entity2") or "")
+        if not entity:
+            return None
+        tables = self._tables_for(SEASON_LINE_STAT_TYPE, competition, season)
+        if not tables:
+            return None
+        entity_filter = self._entity_filter(entity)
+        if entity_filter is None:
+            return None
+        kind, entity_sql, entity_param = entity_filter
+        if kind == "team":
+            return None
+        branches = [f"SELECT * FROM {table} WHERE {entity_sql}" for table in tables]
+        return "season_line", " UNION ALL ".join(branches), [entity_param] * len(tables)
+
+    def run(self, con, matched):
+        """Execute a matched template as a prepared statement; returns records JSON like run_sql."""
+        name, sql, params = matched
+        df = con.execute(sql, params).fetchdf()
+        return df.to_json(orient="records")
+
+    def record(self, template_name, elapsed_ms=None):
+        """Track coverage and latency; template_name is None for questions that went to the LLM."""
+        if template_name:
+            self.stats["matched"] += 1
+            self.stats["by_template"][template_name] = self.stats["by_template"].get(template_name, 0) + 1
+            self.stats["template_ms_total"] += elapsed_ms or 0.0
+        else:
+            self.stats["fallback"] += 1
+            if elapsed_ms is not None:
+                self.stats["llm_ms_total"] += elapsed_ms
+                self.stats["llm_timed"] += 1
+
+    def coverage_report(self):
+        """How much traffic the templates answered and the average latency they saved."""
+        matched, fallback = self.stats["matched"], self.stats["fallback"]
+        total = matched + fallback
+        avg_template = self.stats["template_ms_total"] / matched if matched else None
+        timed = self.stats["llm_timed"]
+        avg_llm = self.stats["llm_ms_total"] / timed if timed else None
+        saved = avg_llm - avg_template if avg_template is not None and avg_llm is not None else None
+        return {
+            "questions": total,
+            "template_hits": matched,
+            "coverage": round(matched / total, 3) if total else 0.0,
+            "by_template": dict(self.stats["by_template"]),
+            "avg_template_ms": round(avg_template, 1) if avg_template is not None else None,
+            "avg_llm_ms": round(avg_llm, 1) if avg_llm is not None else None,
+            "avg_saved_ms": round(saved, 1) if saved is not None else None,
+        }
+
+
+if __name__ == "__main__":
+    # Offline coverage report over logged user questions:
+    #   python query_templates.py                 -> reads user questions from chat_history
+    #   python query_templates.py questions.txt   -> one question per line
+    import json
+    import os
+    import sys
+    import duckdb
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    con = duckdb.connect(f"md:fbref_soccer_stats?motherduck_token={os.getenv('MOTHERDUCK_TOKEN')}")
+    tables = con.execute("SHOW TABLES").fetchdf()["name"].tolist()
+    library = TemplateLibrary({f"main.{t}": {} for t in tables})
+    library.load_teams(con)
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = [r[0] for r in con.execute("SELECT content FROM chat_history WHERE role = 'user'").fetchall()]
+
+    for question in questions:
+        start = time.perf_counter()
+        matched = library.match(question)
+        if matched:
+            library.run(con, matched)
+            library.record(matched[0], (time.perf_counter() - start) * 1000)
+        else:
+            library.record(None)
+        print(f"{matched[0] if matched else '-':>16}  {question}")
+
+    print(json.dumps(library.coverage_report(), indent=2))
@@ -90,23 +90,18 @@ def _read_url_content(url: str):
         html_content = response.text
         return html_content
 
-def scrape_fbref(stat_type='standard', season='2024-2025', competition='Premier-League'):
+def build_fbref_url(stat_type='standard', season='2024-2025', competition='Premier-League'):
     config = STAT_CONFIG[stat_type]
     competition_id = LEAGUE_ID_MAP.get(competition)
-    url = config['url_template'].format(season=season, competition=competition, competition_id=competition_id)
+    return config['url_template'].format(season=season, competition=competition, competition_id=competition_id)
+
+def parse_fbref_table(html_content, stat_type='standard', season='2024-2025', competition='Premier-League'):
+    """Parse an FBref stats page into {column: [values]} using the STAT_CONFIG column layout."""
+    config = STAT_CONFIG[stat_type]
     div_id = config['div_id']
     columns = config['columns']
 
-    options = Options()
-    options.add_argument("--headless")
-
-    # driver = webdriver.Chrome(options=options)
-    # driver.get(url)
-    time.sleep(3)
-    html_content = _read_url_content(url)
     soup = BeautifulSoup(html_content, 'lxml')
-    # soup = BeautifulSoup(driver.page_source, 'lxml')
-    # driver.quit()
 
     # create a list of each column in the dictionary
     players_info = {col: [] for col in columns if col}
@@ -142,16 +137,66 @@ def scrape_fbref(stat_type='standard', season='2024-2025', competition='Premier-
         for col in players_info:
             players_info[col].append(row.get(col, None))
 
-    df = pd.DataFrame(players_info)
+    return players_info
+
+# columns that stay text - everything else scraped is a number
+TEXT_COLUMNS = {'name', 'nation', 'position', 'team', 'season', 'competition'}
+
+# numeric columns with decimals - every other number is a count
+DOUBLE_COLUMNS = {
+    "full_games", "expected_goals(xG)", "xG", "xG_nonpenalty", "xGA", "xGnp+xGA", "expected_assists(xA)",
+    "goals_against_per90", "save_percentage", "clean_sheet_percentage", "PK_save_percentage",
+    "tackle_percentage", "shots_on_target_percentage", "shots_per_90", "goals_per_shot",
+    "goals_per_shot_on_target", "average_shot_distance", "shots_from_free_kicks", "xG_nonpenalty_per_shot",
+    "goals-xG", "nonpenalty_goals-xG_nonpenalty", "pass_completion_percentage",
+    "short_pass_completion_percentage", "medium_pass_completion_percentage",
+    "long_pass_completion_percentage", "take_on_percentage",
+}
+
+def column_type(column) -> str:
+    if column in TEXT_COLUMNS:
+        return "VARCHAR"
+    return "DOUBLE" if column in DOUBLE_COLUMNS else "BIGINT"
+
+def cast_column_sql(expression, column):
+    """SQL version of convert_types() for one column: a scraped string in, the stored type out."""
+    sql_type = column_type(column)
+    if sql_type == "VARCHAR":
+        return expression
+    value = f"replace({expression}, ',', '')"
+    if column == "age":
+        value = f"split_part({value}, '-', 1)"
+    return f"TRY_CAST({value} AS {sql_type})"
+
+def text_number_casts(column_types):
+    """cast AS column for every number a table still stores as the scraped text - the
+    REPLACE list that brings a table loaded before convert_types() existed in line."""
+    casts = []
+    for column, data_type in column_types.items():
+        if data_type == "VARCHAR" and column_type(column) != "VARCHAR":
+            quoted = '"' + column.replace('"', '""') + '"'
+            casts.append(f"{cast_column_sql(quoted, column)} AS {quoted}")
+    return casts
+
+def convert_types(df):
+    """Turn the scraped strings ("2,508", "24-123", "") into numeric columns."""
+    for col in df.columns:
+        if col in TEXT_COLUMNS:
+            continue
+        values = df[col].astype('string').str.replace(',', '', regex=False)
+        if col == 'age':
+            # FBref ages are "years-days"
+            values = values.str.split('-').str[0]
+        df[col] = pd.to_numeric(values, errors='coerce')
+    return df
+
+def scrape_fbref(stat_type='standard', season='2024-2025', competition='Premier-League'):
+    df = scrape_fbref_df(stat_type=stat_type, season=season, competition=competition)
     return df.to_string(index=False)
 
 
 def scrape_fbref_df(stat_type='standard', season='2024-2025', competition='Premier-League'):
-    config = STAT_CONFIG[stat_type]
-    competition_id = LEAGUE_ID_MAP.get(competition)
-    url = config['url_template'].format(season=season, competition=competition, competition_id=competition_id)
-    div_id = config['div_id']
-    columns = config['columns']
+    url = build_fbref_url(stat_type, season, competition)
 
     options = Options()
     options.add_argument("--headless")
@@ -159,50 +204,13 @@ def scrape_fbref_df(stat_type='standard', season='2024-2025', competition='Premi
     # driver.get(url)
     time.sleep(3)
     html_content = _read_url_content(url)
-    soup = BeautifulSoup(html_content, 'lxml')
     # soup = BeautifulSoup(driver.page_source, 'lxml')
     # driver.quit()
 
-    # create a list of each column in the dictionary
-    players_info = {col: [] for col in columns if col}
-    players_info.update({'season': [], 'competition': []})
-
-    players = soup.find('div', id=div_id).find('tbody').find_all('tr')
-
-    for player in players:
-        if 'class' in player.attrs and 'thead' in player['class']:
-            continue
-
-        tds = player.find_all('td')
-        row = {}
-
-        for i, col in enumerate(columns):
-            if not col:
-                continue
-
-            if i < len(tds):
-                if col == 'nation':
-                    nation_text = tds[i].get_text(separator=" ").strip()
-                    row[col] = nation_text.split()[-1] if nation_text else None
-                else:
-                    a_tag = tds[i].find('a')
-                    row[col] = a_tag.text.strip() if a_tag else tds[i].text.strip()
-            else:
-                row[col] = None
-
-        # Add metadata
-        row['season'] = season
-        row['competition'] = competition
-
-        for col in players_info:
-            players_info[col].append(row.get(col, None))
-
-    df = pd.DataFrame(players_info)
+    df = pd.DataFrame(parse_fbref_table(html_content, stat_type, season, competition))
     return df
 
 
-df_bundesliga_defense = scrape_fbref_df('defensive', '2024-2025', 'Bundesliga')
-print(df_bundesliga_defense)
-
-
-
+if __name__ == "__main__":
+    df_bundesliga_defense = scrape_fbref_df('defensive', '2024-2025', 'Bundesliga')
+    print(df_bundesliga_defense)
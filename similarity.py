@@ -0,0 +1,229 @@
+import json
+import os
+import re
+import time
+import warnings
+
+import numpy as np
+
+from player_stats import load_player_table
+from query_templates import fold_accents
+
+# players with fewer minutes have too little data for a stable per-90 profile
+MIN_MINUTES = 450
+# neighbours stored per player by precompute_neighbors()
+NEIGHBORS_K = 20
+METRICS = ("cosine", "euclidean")
+# where ingest.py writes the index and the app looks for it first
+INDEX_PATH = os.getenv("SIMILARITY_INDEX_PATH", "data/similarity_index.npz")
+META_COLUMNS = ["player_id", "name", "team", "competition", "season", "position", "position_group", "minutes"]
+# per-90 values shown next to each match - the query player's most distinctive features
+SHOWN_FEATURES = 6
+
+
+def name_tokens(name) -> str:
+    """Folded name words between spaces, e.g. ' bukayo saka ', so searching for ' saka '
+    only matches whole words ("Son" must not find Dean Henderson)."""
+    return " " + " ".join(re.findall(r"\w+", fold_accents(str(name)))) + " "
+
+
+def match_names(tokens, name):
+    """Indexes into tokens (name_tokens of each player) matching name: the full name, else
+    names containing every word of it in any order ("Heung-min Son") - never part of a word."""
+    query = name_tokens(name)
+    words = query.split()
+    if not words:
+        return np.array([], dtype=np.int64)
+    matches = np.flatnonzero(tokens == query)
+    if not len(matches):
+        found = np.ones(len(tokens), dtype=bool)
+        for word in words:
+            found &= np.char.find(tokens, f" {word} ") >= 0
+        matches = np.flatnonzero(found)
+    return matches
+
+
+class SimilarityIndex:
+    """Player style vectors for "who plays like X?".
+
+    Every per-90 and rate stat is z-scored within the player's position group, so a
+    defender's 2 tackles per 90 weigh the same as a winger's 2 take-ons. The vectors sit
+    in one contiguous float32 matrix (row i = player i), and a query is one matrix
+    product against all of it.
+    """
+
+    def __init__(self, meta, features, raw, vectors, version="0", neighbors=None, short=None):
+        self.meta = meta
+        self.features = list(features)
+        self.raw = raw
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(self.vectors, axis=1)
+        self.unit = np.ascontiguousarray(self.vectors / np.where(norms > 0, norms, 1)[:, None])
+        self.sq_norms = norms.astype(np.float32) ** 2
+        self.version = version
+        self.neighbors = neighbors
+        self.tokens = np.array([name_tokens(name) for name in meta["name"]], dtype=str)
+        # players under the minutes cutoff: name -> minutes, so a miss can say why
+        self.short = short or {"name": np.array([], dtype=str), "minutes": np.array([], dtype=np.float64)}
+        self.short_tokens = np.array([name_tokens(name) for name in self.short["name"]], dtype=str)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, con, version="0", min_minutes=MIN_MINUTES):
+        players, features = load_player_table(con)
+        minutes = players["minutes"].fillna(0) if len(players) else players["minutes"]
+        short = {
+            "name": players.loc[minutes < min_minutes, "name"].astype(str).to_numpy(),
+            "minutes": players.loc[minutes < min_minutes, "minutes"].fillna(0).to_numpy(dtype=np.float64),
+        }
+        players = players[minutes >= min_minutes].reset_index(drop=True)
+        raw = players[features].to_numpy(dtype=np.float64, na_value=np.nan) if features else np.zeros((len(players), 0))
+        vectors = np.zeros_like(raw)
+        groups = players["position_group"].to_numpy()
+        for group in np.unique(groups):
+            rows = groups == group
+            block = raw[rows]
+            # a stat nobody in the group has (shot distance for keepers) is all NaN - fine, it becomes 0
+            with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+                warnings.simplefilter("ignore", RuntimeWarning)
+                mean = np.nanmean(block, axis=0)
+                std = np.nanstd(block, axis=0)
+                z = (block - mean) / np.where(std > 0, std, np.nan)
+            # missing stats (and stats with no spread in the group) count as average
+            vectors[rows] = np.nan_to_num(z, nan=0.0, posinf=0.0, neginf=0.0)
+        meta = {column: players[column].to_numpy() for column in META_COLUMNS}
+        meta["minutes"] = meta["minutes"].astype(np.float64)
+        return cls(meta, features, raw.astype(np.float32), vectors, version, short=short)
+
+    def find(self, name, competition=None):
+        """Row of the best match for a player name (most minutes if several), or None."""
+        matches = match_names(self.tokens, name)
+        if competition:
+            in_competition = matches[self.meta["competition"][matches] == competition]
+            matches = in_competition if len(in_competition) else matches
+        if not len(matches):
+            return None
+        return int(matches[np.argmax(self.meta["minutes"][matches])])
+
+    def short_minutes(self, name):
+        """Minutes of a player left out for being under the cutoff (most if several), or None."""
+        matches = match_names(self.short_tokens, name)
+        if not len(matches):
+            return None
+        return int(self.short["minutes"][matches].max())
+
+    def scores(self, rows, metric="cosine"):
+        """(len(rows), n) similarity of each query row to every player - higher is closer."""
+        if metric == "cosine":
+            return self.unit[rows] @ self.unit.T
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab, all from one matrix product
+        d2 = self.sq_norms[rows][:, None] + self.sq_norms[None, :] - 2 * (self.vectors[rows] @ self.vectors.T)
+        return -np.sqrt(np.maximum(d2, 0))
+
+    def top_k(self, rows, k=5, metric="cosine", same_position=True, competition=None):
+        """[(row, score), ...] of the k nearest players for each query row, in one batch."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if (self.neighbors is not None and metric == "cosine" and same_position and not competition
+                and k <= self.neighbors.shape[1]):
+            return [[(int(j), float(self.unit[i] @ self.unit[j])) for j in self.neighbors[i, :k] if j >= 0] for i in rows]
+
+        scores = self.scores(rows, metric)
+        ids = self.meta["player_id"]
+        # never the query player - including their row for another team after a transfer
+        scores[ids[rows][:, None] == ids[None, :]] = -np.inf
+        if same_position:
+            groups = self.meta["position_group"]
+            scores[groups[rows][:, None] != groups[None, :]] = -np.inf
+        if competition:
+            scores[:, self.meta["competition"] != competition] = -np.inf
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in rows]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for i, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[i, candidates])]
+            results.append([(int(j), float(scores[i, j])) for j in ordered if np.isfinite(scores[i, j])])
+        return results
+
+    def precompute_neighbors(self, k=NEIGHBORS_K, block=1024):
+        """Store the k nearest (cosine, same position group) players of every player."""
+        neighbors = np.full((len(self), k), -1, dtype=np.int32)
+        self.neighbors = None
+        for start in range(0, len(self), block):
+            rows = np.arange(start, min(start + block, len(self)))
+            for row, matches in zip(rows, self.top_k(rows, k)):
+                neighbors[row, :len(matches)] = [j for j, _ in matches]
+        self.neighbors = neighbors
+        return self
+
+    def describe(self, row, score=None, shown=()):
+        record = {column: self.meta[column][row] for column in ("name", "team", "competition", "season", "position")}
+        record["minutes"] = int(self.meta["minutes"][row])
+        if score is not None:
+            record["similarity"] = round(score, 3)
+        for feature in shown:
+            value = self.raw[row, self.features.index(feature)]
+            record[feature] = None if np.isnan(value) else round(float(value), 2)
+        return record
+
+    def similar(self, name, k=5, metric="cosine", competition=None, same_position=True):
+        """Records for the player followed by the k closest matches (a run_sql-style tool result)."""
+        row = self.find(name, competition)
+        if row is None:
+            return None
+        # show the stats that make this player distinctive, so the answer can say why they match
+        shown = [self.features[i] for i in np.argsort(-np.abs(self.vectors[row]))[:SHOWN_FEATURES]]
+        matches = self.top_k([row], k, metric, same_position, competition)[0]
+        return [self.describe(row, shown=shown)] + [self.describe(j, score, shown) for j, score in matches]
+
+    def save(self, path=INDEX_PATH):
+        arrays = {f"meta_{column}": np.asarray(values) for column, values in self.meta.items()}
+        arrays.update({f"short_{column}": np.asarray(values) for column, values in self.short.items()})
+        if self.neighbors is not None:
+            arrays["neighbors"] = self.neighbors
+        np.savez(path, features=np.array(self.features), raw=self.raw, vectors=self.vectors,
+                 version=np.array(self.version), **{k: v.astype(str) if v.dtype == object else v for k, v in arrays.items()})
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as data:
+            meta = {key[len("meta_"):]: data[key] for key in data.files if key.startswith("meta_")}
+            short = {key[len("short_"):]: data[key] for key in data.files if key.startswith("short_")} or None
+            neighbors = data["neighbors"] if "neighbors" in data.files else None
+            return cls(meta, data["features"].tolist(), data["raw"], data["vectors"], str(data["version"]), neighbors, short)
+
+
+def load_or_build(con, version, path=INDEX_PATH):
+    """The index ingest saved if it matches the current data, otherwise a fresh one."""
+    start = time.perf_counter()
+    index = None
+    if path and os.path.exists(path):
+        try:
+            index = SimilarityIndex.load(path)
+        except Exception as e:
+            print(f"Similarity index at {path} unreadable: {e}")
+        if index is not None and index.version != version:
+            index = None
+    if index is None:
+        index = SimilarityIndex.build(con, version).precompute_neighbors()
+    print(f"Similarity index: {len(index)} players x {len(index.features)} features "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return index
+
+
+def similar_players_json(index, player, k=5, metric="cosine", competition=None, same_position=True):
+    if index is None:
+        return "Similarity index is still loading - use run_sql for this question."
+    if metric not in METRICS:
+        metric = "cosine"
+    records = index.similar(player, max(1, min(int(k), 25)), metric, competition or None, same_position)
+    if records is None:
+        minutes = index.short_minutes(player)
+        if minutes is not None:
+            return (f"{player} has only played {minutes} minutes - under the {MIN_MINUTES} minutes "
+                    f"needed for a style comparison, so there are no similar players to report.")
+        return f"No player named {player!r} in the stats tables - check the spelling or use run_sql."
+    return json.dumps(records)
@@ -0,0 +1,194 @@
+import re
+import threading
+
+from metrics import SINGLEFLIGHT
+
+
+def normalize_sql(sql: str) -> str:
+    """Key for identical queries that differ only in whitespace or a trailing semicolon."""
+    return re.sub(r"\s+", " ", sql.strip().rstrip(";")).strip()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run fn once per key while it is in flight; concurrent callers with the same key share the result.
+
+    At most max_waiters callers queue behind one call - later ones run fn themselves.
+    """
+
+    def __init__(self, name, max_waiters=64, wait_timeout=120):
+        self.name = name
+        self.max_waiters = max_waiters
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Returns (result, shared) where shared is True if another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            elif call.waiters < self.max_waiters:
+                call.waiters += 1
+                leader = False
+            else:
+                call = None
+
+        if call is None:
+            SINGLEFLIGHT.labels(self.name, "overflow").inc()
+            return fn(), False
+
+        if not leader:
+            if call.done.wait(self.wait_timeout):
+                SINGLEFLIGHT.labels(self.name, "shared").inc()
+                if call.error is not None:
+                    raise call.error
+                return call.result, True
+            # the leader is stuck - do the work ourselves rather than time out the request
+            SINGLEFLIGHT.labels(self.name, "timeout").inc()
+            return fn(), False
+
+        SINGLEFLIGHT.labels(self.name, "leader").inc()
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class _Broadcast:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.tokens = []
+        self.finished = False
+        self.error = None
+        self.subscribers = 0
+
+
+class StreamFlight:
+    """Fan one token stream out to every concurrent request with the same key.
+
+    The first request (the leader) runs the stream; later ones replay what has been
+    produced so far and then follow along live. At most max_subscribers follow one leader.
+    """
+
+    def __init__(self, name, max_subscribers=64, wait_timeout=120):
+        self.name = name
+        self.max_subscribers = max_subscribers
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._streams = {}
+
+    def stream(self, key, make_stream):
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is None:
+                broadcast = self._streams[key] = _Broadcast()
+                leader = True
+            elif broadcast.subscribers < self.max_subscribers:
+                broadcast.subscribers += 1
+                leader = False
+            else:
+                broadcast = None
+
+        if broadcast is None:
+            SINGLEFLIGHT.labels(self.name, "overflow").inc()
+            return make_stream()
+        if leader:
+            SINGLEFLIGHT.labels(self.name, "leader").inc()
+            return self._lead(key, broadcast, make_stream())
+        SINGLEFLIGHT.labels(self.name, "shared").inc()
+        return self._follow(broadcast)
+
+    def _lead(self, key, broadcast, tokens):
+        handed_off = False
+        try:
+            for token in tokens:
+                self._publish(broadcast, token)
+                yield token
+        except GeneratorExit:
+            # the leader's client disconnected - that is no error for the requests following it,
+            # so a background thread finishes the stream for them
+            with self._lock:
+                handed_off = broadcast.subscribers > 0
+            if handed_off:
+                SINGLEFLIGHT.labels(self.name, "handoff").inc()
+                threading.Thread(
+                    target=self._drain, args=(key, broadcast, tokens), name=f"{self.name}-drain", daemon=True
+                ).start()
+            raise
+        except Exception as e:
+            # followers see the leader's error
+            broadcast.error = e
+            raise
+        finally:
+            if not handed_off:
+                self._finish(key, broadcast)
+
+    def _drain(self, key, broadcast, tokens):
+        try:
+            for token in tokens:
+                self._publish(broadcast, token)
+                with self._lock:
+                    if not broadcast.subscribers:
+                        # every follower went away too - stop paying for the stream
+                        break
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            close = getattr(tokens, "close", None)
+            if close:
+                close()
+            self._finish(key, broadcast)
+
+    def _publish(self, broadcast, token):
+        with broadcast.cond:
+            broadcast.tokens.append(token)
+            broadcast.cond.notify_all()
+
+    def _finish(self, key, broadcast):
+        with self._lock:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+        with broadcast.cond:
+            broadcast.finished = True
+            broadcast.cond.notify_all()
+
+    def _follow(self, broadcast):
+        try:
+            yield from self._replay(broadcast)
+        finally:
+            with self._lock:
+                broadcast.subscribers -= 1
+
+    def _replay(self, broadcast):
+        sent = 0
+        while True:
+            with broadcast.cond:
+                if sent >= len(broadcast.tokens) and not broadcast.finished:
+                    broadcast.cond.wait(self.wait_timeout)
+                pending = broadcast.tokens[sent:]
+                finished = broadcast.finished
+                if not pending and not finished:
+                    raise TimeoutError("shared answer stream stalled")
+            for token in pending:
+                yield token
+            sent += len(pending)
+            if finished and sent >= len(broadcast.tokens):
+                if broadcast.error is not None:
+                    raise broadcast.error
+                return
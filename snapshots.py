@@ -0,0 +1,204 @@
+import hashlib
+import json
+from datetime import datetime
+
+# delta tables live outside main, so the schema the LLM sees only gets the *_history views
+SNAPSHOT_SCHEMA = "snapshots"
+# columns that identify a player row within one partition (a mid-season transfer gives two rows)
+KEY_COLUMNS = ["name", "team", "nation", "year_born"]
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def table_exists(con, schema, table) -> bool:
+    return bool(con.execute(
+        "SELECT 1 FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+        [schema, table],
+    ).fetchall())
+
+
+def ensure_snapshot_tables(con):
+    con.execute(f"CREATE SCHEMA IF NOT EXISTS {SNAPSHOT_SCHEMA}")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SNAPSHOT_SCHEMA}.versions (
+            table_name TEXT,
+            version INTEGER,
+            taken_at TIMESTAMP,
+            changed_rows INTEGER,
+            removed_rows INTEGER,
+            total_rows INTEGER
+        )
+    """)
+
+
+def _columns(con, schema, table):
+    rows = con.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = ? AND table_name = ? ORDER BY ordinal_position",
+        [schema, table],
+    ).fetchall()
+    return [r[0] for r in rows if r[0] not in ("_version", "_deleted")]
+
+
+def _plain_select(con, table_name):
+    """Columns of main.table_name with ENUM columns (see categoricals.py) cast back to text - the
+    delta tables must take values the enum doesn't have yet."""
+    rows = con.execute(
+        "SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = 'main' AND table_name = ? ORDER BY ordinal_position",
+        [table_name],
+    ).fetchall()
+    return ", ".join(
+        f"CAST({quote(c)} AS VARCHAR) AS {quote(c)}" if t.startswith("ENUM") else quote(c) for c, t in rows
+    )
+
+
+def _latest_state_sql(delta, key, version_filter=""):
+    """Newest surviving row per key in a delta table."""
+    return f"""
+        SELECT * EXCLUDE (_version, _deleted) FROM (
+            SELECT * FROM {delta}
+            {version_filter}
+            QUALIFY row_number() OVER (PARTITION BY {key} ORDER BY _version DESC) = 1
+        )
+        WHERE NOT _deleted
+    """
+
+
+def _create_views(con, table_name, key):
+    """{table}_history view (one row per change, for trend questions) and {table}_as_of(ts) macro."""
+    delta = f"{SNAPSHOT_SCHEMA}.{quote(table_name)}"
+    literal = table_name.replace("'", "''")
+    con.execute(f"""
+        CREATE OR REPLACE VIEW main.{quote(table_name + '_history')} AS
+        SELECT d.* EXCLUDE (_version, _deleted), v.taken_at AS snapshot_at, d._deleted AS removed
+        FROM {delta} d
+        JOIN {SNAPSHOT_SCHEMA}.versions v ON v.table_name = '{literal}' AND v.version = d._version
+    """)
+    version_filter = f"""WHERE _version <= (
+        SELECT max(version) FROM {SNAPSHOT_SCHEMA}.versions WHERE table_name = '{literal}' AND taken_at <= as_of
+    )"""
+    con.execute(f"""
+        CREATE OR REPLACE MACRO main.{quote(table_name + '_as_of')}(as_of) AS TABLE
+        {_latest_state_sql(delta, key, version_filter)}
+    """)
+
+
+def _record_version(con, table_name, version, taken_at, changed, removed):
+    total = con.execute(f"SELECT count(*) FROM main.{quote(table_name)}").fetchone()[0]
+    con.execute(
+        f"INSERT INTO {SNAPSHOT_SCHEMA}.versions VALUES (?, ?, ?, ?, ?, ?)",
+        [table_name, version, taken_at, changed, removed, total],
+    )
+
+
+def record_snapshot(con, table_name, df, taken_at=None, convert=None):
+    """Make df the current contents of main.table_name and keep the previous state as history.
+
+    Only rows that differ from the previous snapshot (plus a tombstone per vanished row) go
+    into snapshots.<table_name>, so storage grows with the amount of change, not with how
+    often the season is re-scraped. convert is the function that typed df (ingest passes
+    convert_types); a main table from before snapshots is run through it too, so its
+    "2,508" strings diff equal to 2508. Returns (version, changed_rows, removed_rows);
+    version is None when nothing changed.
+    """
+    taken_at = taken_at or datetime.now()
+    ensure_snapshot_tables(con)
+    delta = f"{SNAPSHOT_SCHEMA}.{quote(table_name)}"
+    main_table = f"main.{quote(table_name)}"
+
+    con.register("snapshot_df", df)
+    con.execute("BEGIN TRANSACTION")
+    try:
+        created = not table_exists(con, SNAPSHOT_SCHEMA, table_name)
+        if created:
+            # first snapshot of this partition: seed the deltas with what main already holds
+            # (a table loaded before snapshots existed), otherwise with df itself
+            seed = main_table if table_exists(con, "main", table_name) else "snapshot_df"
+            seed_columns = _plain_select(con, table_name) if seed == main_table else "*"
+            if seed == main_table and convert is not None:
+                baseline = convert(con.execute(f"SELECT {seed_columns} FROM {main_table}").fetchdf())
+                con.register("baseline_df", baseline)
+                con.execute(f"CREATE OR REPLACE TABLE {main_table} AS SELECT * FROM baseline_df")
+                con.unregister("baseline_df")
+                seed_columns = "*"
+            con.execute(f"CREATE TABLE {delta} AS SELECT {seed_columns}, 1 AS _version, false AS _deleted FROM {seed}")
+            if seed == "snapshot_df":
+                con.execute(f"CREATE TABLE {main_table} AS SELECT * FROM snapshot_df")
+            _record_version(con, table_name, 1, taken_at, len(df) if seed == "snapshot_df" else 0, 0)
+
+        columns = _columns(con, SNAPSHOT_SCHEMA, table_name)
+        key = ", ".join(quote(c) for c in KEY_COLUMNS if c in columns) or ", ".join(quote(c) for c in columns)
+        incoming_columns = set(df.columns)
+        # scraped columns the partition didn't have before are ignored; missing ones become NULL
+        select_incoming = ", ".join(
+            quote(c) if c in incoming_columns else f"NULL AS {quote(c)}" for c in columns
+        )
+        column_list = ", ".join(quote(c) for c in columns)
+        version = con.execute(
+            f"SELECT max(version) + 1 FROM {SNAPSHOT_SCHEMA}.versions WHERE table_name = ?", [table_name]
+        ).fetchone()[0]
+
+        current = _latest_state_sql(delta, key)
+        changed = con.execute(f"""
+            INSERT INTO {delta}
+            SELECT *, {version}, false FROM (
+                SELECT {select_incoming} FROM snapshot_df
+                EXCEPT
+                SELECT {column_list} FROM ({current})
+            )
+        """).fetchone()[0]
+        key_match = " AND ".join(
+            f"i.{quote(c)} IS NOT DISTINCT FROM c.{quote(c)}" for c in KEY_COLUMNS if c in columns
+        ) or "false"
+        removed = con.execute(f"""
+            INSERT INTO {delta} ({key}, _version, _deleted)
+            SELECT {key}, {version}, true FROM ({current}) c
+            WHERE NOT EXISTS (SELECT 1 FROM (SELECT {select_incoming} FROM snapshot_df) i WHERE {key_match})
+        """).fetchone()[0]
+
+        if changed or removed:
+            con.execute(f"CREATE OR REPLACE TABLE {main_table} AS SELECT * FROM snapshot_df")
+            _record_version(con, table_name, version, taken_at, changed, removed)
+        elif created and seed == "snapshot_df":
+            version, changed = 1, len(df)
+        else:
+            version = None
+        _create_views(con, table_name, key)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("snapshot_df")
+    return version, changed, removed
+
+
+def ingest_version(con) -> str:
+    """Short fingerprint of every partition's latest snapshot version - changes whenever an
+    ingest refresh changed data, so it can key caches and ETags."""
+    if not table_exists(con, SNAPSHOT_SCHEMA, "versions"):
+        return "0"
+    rows = con.execute(f"""
+        SELECT table_name, max(version) FROM {SNAPSHOT_SCHEMA}.versions GROUP BY table_name ORDER BY table_name
+    """).fetchall()
+    return hashlib.sha1(json.dumps(rows).encode("utf-8")).hexdigest()[:16]
+
+
+def snapshotted_tables(con) -> set:
+    """Names of the tables ingest keeps snapshots of - the only ones ingest_version follows."""
+    if not table_exists(con, SNAPSHOT_SCHEMA, "versions"):
+        return set()
+    return {row[0] for row in con.execute(f"SELECT DISTINCT table_name FROM {SNAPSHOT_SCHEMA}.versions").fetchall()}
+
+
+def snapshot_sizes(con):
+    """Per partition: versions kept, delta rows stored and rows one full copy per version would take."""
+    ensure_snapshot_tables(con)
+    report = {}
+    for table_name, versions, full_rows in con.execute(f"""
+        SELECT table_name, count(*), sum(total_rows) FROM {SNAPSHOT_SCHEMA}.versions GROUP BY table_name
+    """).fetchall():
+        delta_rows = con.execute(f"SELECT count(*) FROM {SNAPSHOT_SCHEMA}.{quote(table_name)}").fetchone()[0]
+        report[table_name] = {"versions": versions, "delta_rows": delta_rows, "full_copy_rows": int(full_rows)}
+    return report
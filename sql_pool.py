@@ -0,0 +1,29 @@
+import queue
+from contextlib import contextmanager
+
+
+class CursorPool:
+    """Fixed-size pool of DuckDB cursors sharing one database connection.
+
+    Each cursor is its own connection to the same database, so queries on different
+    threads don't serialize on the parent connection's lock.
+    """
+
+    def __init__(self, con, size: int = 8):
+        self.con = con
+        self.size = size
+        self._cursors = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._cursors.put(con.cursor())
+
+    @contextmanager
+    def connection(self, timeout=None):
+        cursor = self._cursors.get(timeout=timeout)
+        try:
+            yield cursor
+        finally:
+            self._cursors.put(cursor)
+
+    def close(self):
+        while not self._cursors.empty():
+            self._cursors.get_nowait().close()
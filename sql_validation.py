@@ -0,0 +1,197 @@
+import difflib
+import json
+import re
+import threading
+
+import duckdb
+
+# prefix of a run_sql result for a query the shadow catalog rejected (nothing was sent to MotherDuck)
+VALIDATION_ERROR = "SQL validation error"
+
+QUOTED_RE = re.compile(r'"([^"]+)"')
+STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+FUNCTION_RE = re.compile(r"Function with name (\w+) does not exist", re.IGNORECASE)
+# catalog inspection statements go straight through - the shadow catalog can't answer them
+UNCHECKED_RE = re.compile(r"^\s*(?:show|describe|summarize|pragma|set|use)\b", re.IGNORECASE)
+# longest error text passed back to the model
+MAX_ERROR_CHARS = 400
+# prefix of the error for a statement that could change data or reach outside the database
+READ_ONLY_ERROR = "Only read-only queries are allowed"
+# SELECT also covers SHOW / DESCRIBE / SUMMARIZE / table-valued PRAGMAs
+READ_ONLY_STATEMENTS = {"SELECT", "EXPLAIN"}
+# table functions and replacement scans that read files or URLs (SELECT * FROM 'x.csv')
+EXTERNAL_ACCESS_RE = re.compile(
+    r"\b(?:read_\w+|\w+_scan|glob|sniff_csv|getenv|query_table|query)\s*\(|\b(?:from|join)\s+'",
+    re.IGNORECASE,
+)
+
+# functions that read settings, secrets or the environment - the MotherDuck token lives there
+DENIED_FUNCTIONS = {"current_setting", "duckdb_settings", "duckdb_secrets", "which_secret", "getenv"}
+# catalog metadata (duckdb_databases() has the database file path, duckdb_tables() and
+# information_schema list chat_history) - table functions by prefix, views by schema or name
+DENIED_FUNCTION_PREFIXES = ("duckdb_", "pragma_")
+SYSTEM_SCHEMAS = {"information_schema", "pg_catalog"}
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _references(node, functions, tables):
+    if isinstance(node, dict):
+        if node.get("class") == "FUNCTION" and "function_name" in node:
+            functions.add(node["function_name"].lower())
+        elif node.get("type") == "BASE_TABLE" and "table_name" in node:
+            schema = (node.get("schema_name") or "").lower()
+            tables.add(f"{schema}.{node['table_name']}" if schema in SYSTEM_SCHEMAS else node["table_name"])
+        for value in node.values():
+            _references(value, functions, tables)
+    elif isinstance(node, list):
+        for value in node:
+            _references(value, functions, tables)
+    return functions, tables
+
+
+def read_only_error(sql: str):
+    """None for a single read-only statement, otherwise why it was refused.
+
+    Shared by run_sql and the export API - both run arbitrary SQL on the same cursors.
+    """
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error as e:
+        return str(e).split("\nLINE ")[0].strip()[:MAX_ERROR_CHARS]
+    if len(statements) != 1:
+        return f"{READ_ONLY_ERROR} (got {len(statements)} statements, expected one)"
+    kind = statements[0].type.name
+    if kind not in READ_ONLY_STATEMENTS:
+        return f"{READ_ONLY_ERROR} (got a {kind} statement)"
+    # blank out string literals so 'from ' inside a value doesn't count
+    if EXTERNAL_ACCESS_RE.search(STRING_LITERAL_RE.sub("''", sql)):
+        return f"{READ_ONLY_ERROR} (the query reads a file or URL)"
+    return None
+
+
+class ShadowCatalog:
+    """Empty in-memory copy of the database schema for binding and planning generated SQL locally.
+
+    EXPLAIN on empty tables runs the parser, binder and planner but reads no data, so a
+    wrong table name, misquoted column or VARCHAR-vs-number comparison fails here in well
+    under a millisecond instead of after a round trip to MotherDuck.
+
+    Binding happens with file, URL and extension access switched off and the configuration
+    locked, so a query that would reach outside the database fails here - however the call
+    is spelled (comments, quoted paths) - instead of relying on the regex in read_only_error.
+    """
+
+    def __init__(self, schema_info: dict, database=None):
+        self.con = duckdb.connect()
+        if database:
+            # queries sometimes qualify tables with the MotherDuck database name
+            self.con.execute(f"ATTACH ':memory:' AS {quote(database)}")
+            self.con.execute(f"USE {quote(database)}")
+        self._lock = threading.Lock()
+        self.tables = {}
+        for full_name, columns in schema_info.items():
+            schema, _, table = full_name.rpartition(".")
+            schema = schema or "main"
+            if schema != "main":
+                self.con.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(schema)}")
+            column_ddl = ", ".join(f"{quote(c)} {t}" for c, t in columns.items())
+            try:
+                self.con.execute(f"CREATE TABLE {quote(schema)}.{quote(table)} ({column_ddl})")
+            except duckdb.Error as e:
+                print(f"Shadow catalog skipped {full_name}: {e}")
+                continue
+            self.tables[table] = dict(columns)
+        # ingest's <table>_as_of(ts) table macros (snapshots.py) aren't in the schema JSON; they
+        # return the table's own columns, so a stand-in over the empty table binds the same
+        for full_name in schema_info:
+            schema, _, table = full_name.rpartition(".")
+            if table in self.tables and f"{table}_history" in self.tables:
+                self.con.execute(
+                    f"CREATE MACRO {quote(schema or 'main')}.{quote(table + '_as_of')}(as_of) AS TABLE "
+                    f"SELECT * FROM {quote(schema or 'main')}.{quote(table)}"
+                )
+        # sqlite_master, duckdb_tables, pg_tables, ... - the built-in catalog views that resolve
+        # without a schema (information_schema ones always need it)
+        self.system_views = {row[0] for row in self.con.execute(
+            "SELECT view_name FROM duckdb_views() WHERE internal AND schema_name <> 'information_schema'"
+        ).fetchall()}
+        self.con.execute("SET enable_external_access = false")
+        self.con.execute("SET lock_configuration = true")
+
+    def references(self, sql: str):
+        """(functions, tables) the query calls and reads, from DuckDB's own parse tree.
+
+        Function names are lower-cased; tables include CTE names, which is fine for callers
+        that only need to know what isn't a known table. Views in information_schema and
+        pg_catalog come back schema-qualified.
+        """
+        with self._lock:
+            tree = json.loads(self.con.execute("SELECT json_serialize_sql(?)", [sql.strip().rstrip(";")]).fetchone()[0])
+        return _references(tree, set(), set())
+
+    def validate(self, sql: str, strict=False, params=None):
+        """None if the query binds and plans, otherwise the error plus suggestions.
+
+        strict (the export API) also binds SHOW / DESCRIBE / SUMMARIZE, so they can only
+        see the tables in this catalog. params fill the query's ? placeholders.
+        """
+        if not strict and UNCHECKED_RE.match(sql):
+            return None
+        functions, tables = self.references(sql)
+        denied = sorted(functions & DENIED_FUNCTIONS)
+        if denied:
+            return f"{READ_ONLY_ERROR} (the query reads settings or the environment: {', '.join(denied)})"
+        metadata = sorted(f for f in functions if f.startswith(DENIED_FUNCTION_PREFIXES)) + sorted(
+            t for t in tables
+            if t not in self.tables and (t.partition(".")[0] in SYSTEM_SCHEMAS or t in self.system_views)
+        )
+        if metadata:
+            return f"{READ_ONLY_ERROR} (the query reads the database catalog: {', '.join(metadata)})"
+        try:
+            with self._lock:
+                self.con.execute("EXPLAIN " + sql.strip().rstrip(";"), params or None)
+        except duckdb.Error as e:
+            # drop DuckDB's "LINE 1: EXPLAIN ..." pointer - the model never wrote the EXPLAIN
+            message = str(e).split("\nLINE ")[0].split("\n\tCandidate functions")[0].strip()[:MAX_ERROR_CHARS]
+            suggestions = self.suggestions(message)
+            return message + ("\n" + "\n".join(suggestions) if suggestions else "")
+        return None
+
+    def suggestions(self, message: str):
+        hints = []
+        lowered = message.lower()
+        names = QUOTED_RE.findall(message)
+        if "table with name" in lowered or "does not exist" in lowered:
+            for name in names[:1]:
+                close = difflib.get_close_matches(name, list(self.tables), n=3, cutoff=0.5)
+                if close:
+                    hints.append(f"Closest tables: {', '.join('main.' + quote(t) for t in close)}")
+        if "column" in lowered and "not found" in lowered:
+            all_columns = sorted({c for columns in self.tables.values() for c in columns})
+            for name in names[:1]:
+                close = difflib.get_close_matches(name, all_columns, n=3, cutoff=0.5)
+                if close:
+                    hints.append(f"Closest columns: {', '.join(quote(c) for c in close)}"
+                                 " - quote names with special characters, e.g. \"expected_goals(xG)\"")
+        function = FUNCTION_RE.search(message)
+        if function:
+            # expected_goals(xG) without quotes parses as a call to expected_goals()
+            quoted = sorted({c for columns in self.tables.values() for c in columns
+                             if c.startswith(function.group(1) + "(")})
+            if quoted:
+                hints.append(f"Quote the column name: {', '.join(quote(c) for c in quoted)}")
+        if "varchar" in lowered and ("argument types" in lowered or "conversion" in lowered or "cast" in lowered):
+            hints.append("Stat columns stored as VARCHAR need TRY_CAST(REPLACE(col, ',', '') AS DOUBLE) "
+                         "before comparing, summing or ordering numerically.")
+        return hints
+
+
+def format_feedback(failures):
+    """Text appended to the question for the single regeneration attempt - failures are (sql, error)."""
+    lines = ["", "", "Your previous SQL failed validation against the schema or errored when it ran. Fix it and call run_sql again."]
+    for sql, error in failures:
+        lines += [f"SQL: {sql}", f"Error: {error}"]
+    return "\n".join(lines)
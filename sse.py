@@ -0,0 +1,82 @@
+import json
+import time
+import zlib
+
+# frame pieces encoded once; the JSON matches json.dumps({'type': 'token', 'content': ...})
+TOKEN_PREFIX = b'data: {"type": "token", "content": '
+FRAME_SUFFIX = b"}\n\n"
+END_OF_STREAM = b"event: end-of-stream\ndata: close\n\n"
+
+
+def sse_event(payload) -> bytes:
+    return b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n"
+
+
+def status_event(content: str) -> bytes:
+    return sse_event({"type": "status", "content": content})
+
+
+def token_frame(text: str) -> bytes:
+    return TOKEN_PREFIX + json.dumps(text).encode("utf-8") + FRAME_SUFFIX
+
+
+class TokenFrames:
+    """Coalesce streamed tokens into `token` frames by time or size window.
+
+    The first token goes out on its own so time-to-first-token is unchanged; after that
+    tokens are held until window_ms has passed since the oldest buffered one or
+    max_bytes are buffered. The window is checked as tokens arrive, so a stalled model
+    delays the tail of the buffer until its next token or flush().
+    """
+
+    def __init__(self, window_ms=30, max_bytes=512):
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.parts = []       # every token, joined once at the end
+        self.pending = []     # tokens not yet framed
+        self.pending_bytes = 0
+        self.pending_since = None
+        self.frames = 0
+        self.bytes_sent = 0
+
+    def add(self, token: str):
+        """Buffer a token; returns a frame (bytes) when the window is full, otherwise None."""
+        self.parts.append(token)
+        self.pending.append(token)
+        self.pending_bytes += len(token)
+        now = time.perf_counter()
+        if self.pending_since is None:
+            self.pending_since = now
+        if self.frames == 0 or self.pending_bytes >= self.max_bytes or now - self.pending_since >= self.window:
+            return self.flush()
+        return None
+
+    def flush(self):
+        if not self.pending:
+            return None
+        frame = token_frame("".join(self.pending))
+        self.pending = []
+        self.pending_bytes = 0
+        self.pending_since = None
+        self.frames += 1
+        self.bytes_sent += len(frame)
+        return frame
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+def accepts_gzip(accept_encoding) -> bool:
+    return "gzip" in (accept_encoding or "").lower()
+
+
+def gzip_stream(frames, level=6):
+    """gzip an SSE stream, sync-flushing after every frame so the client still sees it right away."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for frame in frames:
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+        chunk = compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
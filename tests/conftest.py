@@ -0,0 +1,50 @@
+import duckdb
+import pytest
+
+from name_index import NameIndex
+
+STANDARD_TABLE = "standard_Premier_League_2024_2025"
+
+# (name, team, position, minutes, goals, assists) - enough names to hit the awkward cases:
+# shared surnames, a surname that is someone else's first name, accents, an apostrophe
+PLAYERS = [
+    ("Cole Palmer", "Chelsea", "FW,MF", 3199, 15, 8),
+    ("Alex Palmer", "Ipswich Town", "GK", 1800, 0, 0),
+    ("Reece James", "Chelsea", "DF", 1100, 1, 2),
+    ("James Maddison", "Tottenham", "MF", 2100, 9, 6),
+    ("Bukayo Saka", "Arsenal", "FW", 1700, 6, 10),
+    ("Martin Ødegaard", "Arsenal", "MF", 2400, 3, 8),
+    ("Gabriel Jesus", "Arsenal", "FW", 600, 3, 0),
+    ("Gabriel Martinelli", "Arsenal", "FW", 2300, 8, 5),
+    ("Mohamed Salah", "Liverpool", "FW", 3371, 29, 18),
+    ("Erling Haaland", "Manchester City", "FW", 2750, 22, 3),
+    ("Jamie Vardy", "Leicester City", "FW", 2600, 9, 3),
+    ("Chris Wood", "Nott'ham Forest", "FW", 2900, 20, 3),
+]
+
+
+@pytest.fixture
+def stats_con():
+    """In-memory DuckDB with one season of standard stats, shaped like the ingest tables."""
+    con = duckdb.connect()
+    con.execute(f"""
+        CREATE TABLE main."{STANDARD_TABLE}" (
+            name VARCHAR, nation VARCHAR, team VARCHAR, competition VARCHAR, position VARCHAR,
+            age VARCHAR, year_born VARCHAR, minutes VARCHAR, full_games VARCHAR, goals VARCHAR, assists VARCHAR
+        )
+    """)
+    # numbers as text ("2,508"), like tables loaded before convert_types
+    con.executemany(
+        f'INSERT INTO main."{STANDARD_TABLE}" VALUES (?, \'ENG\', ?, \'Premier League\', ?, \'25\', \'1999\', ?, ?, ?, ?)',
+        [(name, team, position, f"{minutes:,}", str(round(minutes / 90, 1)), str(goals), str(assists))
+         for name, team, position, minutes, goals, assists in PLAYERS],
+    )
+    yield con
+    con.close()
+
+
+@pytest.fixture
+def name_index(stats_con):
+    index = NameIndex()
+    index.refresh(stats_con)
+    return index
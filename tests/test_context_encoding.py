@@ -0,0 +1,61 @@
+import json
+
+from context_encoding import encode_context, encode_records, format_cell
+from tests.conftest import STANDARD_TABLE
+
+
+def decode(text):
+    """Expand an encode_records() block back into rows of cell strings."""
+    constants, dictionaries, rows = {}, {}, []
+    lines = text.splitlines()
+    while " = " in lines[0] and lines[0].endswith(" (all rows)") or " codes: " in lines[0]:
+        line = lines.pop(0)
+        if " codes: " in line:
+            column, _, legend = line.partition(" codes: ")
+            dictionaries[column] = dict(entry.split("=", 1) for entry in legend.split(", "))
+        else:
+            column, _, value = line.removesuffix(" (all rows)").partition(" = ")
+            constants[column] = value
+    header = lines[0].split(" | ")
+    for line in lines[1:]:
+        cells = dict(zip(header, line.split(" | ")))
+        row = {c: dictionaries[c].get(v, v) if c in dictionaries else v for c, v in cells.items()}
+        rows.append({**constants, **row})
+    return rows
+
+
+def query_records(con, sql):
+    return json.loads(con.execute(sql).fetchdf().to_json(orient="records"))
+
+
+def test_encoding_round_trips(stats_con):
+    records = query_records(stats_con, f"""
+        SELECT name, team, competition, CAST(goals AS DOUBLE) AS goals, NULL AS xg
+        FROM main."{STANDARD_TABLE}" WHERE team IN ('Arsenal', 'Chelsea') ORDER BY name
+    """)
+    encoded = encode_records(records)
+
+    assert "competition = Premier League (all rows)" in encoded
+    assert "xg" not in encoded  # all-null column dropped
+    assert "team codes: T1=Arsenal, T2=Chelsea" in encoded
+    expected = [{c: format_cell(v) for c, v in r.items() if c != "xg"} for r in records]
+    assert decode(encoded) == expected
+
+
+def test_unique_strings_are_not_coded(stats_con):
+    records = query_records(stats_con, f'SELECT name FROM main."{STANDARD_TABLE}"')
+    assert "codes:" not in encode_records(records)
+
+
+def test_context_header_and_passthrough():
+    assert encode_context('[{"a": 1.2345}, {"a": 2.0}]') == "2 rows\na\n1.23\n2"
+    # SQL errors and other plain text go to the prompt unchanged
+    assert encode_context("SQL validation error: no such table") == "SQL validation error: no such table"
+
+
+def test_merged_results_get_one_block_per_query():
+    context = json.dumps({"results": [
+        {"sql": "SELECT 1", "data": [{"x": 1}]},
+        {"sql": "SELECT bad", "data": "Binder Error"},
+    ]})
+    assert encode_context(context) == "## query 1: SELECT 1\n1 rows\nx\n1\n\n## query 2: SELECT bad\nBinder Error"
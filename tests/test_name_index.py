@@ -0,0 +1,51 @@
+import pytest
+
+from name_index import NameIndex, format_name_hints
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Cole Palmer", "Cole Palmer"),
+    ("odegaard", "Martin Ødegaard"),       # accent folded, unique surname
+    ("Ødegaard", "Martin Ødegaard"),
+    ("martin odegard", "Martin Ødegaard"),  # typo, fuzzy
+    ("saka", "Bukayo Saka"),
+    ("mo salah", "Mohamed Salah"),          # alias
+    ("spurs", "Tottenham"),
+    ("forest", "Nott'ham Forest"),
+])
+def test_lookup_resolves(name_index, text, expected):
+    assert name_index.lookup(text)[0] == expected
+
+
+@pytest.mark.parametrize("text, candidates", [
+    ("palmer", ["Alex Palmer", "Cole Palmer"]),          # shared surname
+    ("james", ["Reece James", "James Maddison"]),        # one's surname, the other's first name
+    ("gabriel", ["Gabriel Jesus", "Gabriel Martinelli"]),
+    ("city", ["Manchester City", "Leicester City"]),     # tied fuzzy scores
+])
+def test_ambiguous_names_are_not_picked(name_index, text, candidates):
+    assert name_index.lookup(text) is None
+    assert sorted(name_index.candidates(text)) == sorted(candidates)
+
+
+def test_kind_filter(name_index):
+    assert name_index.lookup("arsenal", kind="player") is None
+    assert name_index.lookup("arsenal", kind="team")[:2] == ("Arsenal", "team")
+
+
+def test_find_mentions_skips_ambiguous_words(name_index):
+    mentions = name_index.find_mentions("Compare Salah and Palmer")
+    assert [canonical for _, canonical, _, _ in mentions] == ["Mohamed Salah"]
+
+
+def test_name_hints_are_valid_sql_literals(name_index):
+    hints = format_name_hints(name_index.find_mentions("how many goals did forest score"))
+    assert "team = 'Nott''ham Forest'" in hints
+
+
+def test_refresh_is_incremental(stats_con):
+    index = NameIndex()
+    index.refresh(stats_con)
+    size = len(index)
+    index.refresh(stats_con)
+    assert len(index) == size
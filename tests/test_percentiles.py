@@ -0,0 +1,58 @@
+import pandas as pd
+
+from percentiles import compute_percentiles
+
+
+def defenders(goals, yellow_cards, competition="Premier-League"):
+    n = len(goals)
+    return pd.DataFrame({
+        "player_id": [f"{competition}-{i}" for i in range(n)],
+        "name": [f"Defender {i}" for i in range(n)],
+        "team": ["Arsenal"] * n,
+        "position": ["DF"] * n,
+        "position_group": ["DF"] * n,
+        "competition": [competition] * n,
+        "season": ["2024-2025"] * n,
+        "minutes": [900.0] * n,
+        "goals": goals,
+        "yellow_cards": yellow_cards,
+    })
+
+
+def test_ties_share_the_lowest_rank():
+    # four defenders on 0 goals are "better than" nobody - not all at the 80th percentile
+    ranked = compute_percentiles(defenders([0.0, 0.0, 0.0, 0.0, 2.0], [1.0] * 5))
+    assert ranked["goals_pct"].tolist() == [20, 20, 20, 20, 100]
+    # everyone tied: the same (lowest) rank for all
+    assert ranked["yellow_cards_pct"].tolist() == [20] * 5
+
+
+def test_lower_is_better_is_ranked_the_other_way():
+    ranked = compute_percentiles(defenders([0.0] * 4, [0.0, 1.0, 1.0, 5.0]))
+    assert ranked["yellow_cards_pct"].tolist() == [100, 50, 50, 25]
+
+
+def test_missing_stats_stay_null():
+    ranked = compute_percentiles(defenders([1.0, None, 3.0], [0.0, 0.0, 0.0]))
+    assert ranked["goals_pct"].isna().tolist() == [False, True, False]
+    assert ranked.loc[2, "goals_pct"] == 100
+
+
+def test_league_and_all_league_peer_groups():
+    players = pd.concat([defenders([0.0, 1.0], [0.0, 0.0]), defenders([2.0, 3.0], [0.0, 0.0], "La-Liga")],
+                        ignore_index=True)
+    ranked = compute_percentiles(players)
+    assert ranked["goals_pct"].tolist() == [50, 100, 50, 100]
+    assert ranked["goals_pct_all"].tolist() == [25, 50, 75, 100]
+
+
+def test_build_percentile_table(stats_con):
+    from percentiles import build_percentile_table
+
+    assert build_percentile_table(stats_con, min_minutes=0) == 12
+    rows = dict(stats_con.execute("""
+        SELECT name, assists_pct FROM player_percentiles WHERE position_group = 'FW'
+    """).fetchall())
+    # forwards on 0, 3, 3, 3, 5, 8, 10, 18 assists: the three on 3 all get 2/8
+    assert rows["Erling Haaland"] == rows["Jamie Vardy"] == rows["Chris Wood"] == 25
+    assert rows["Mohamed Salah"] == 100
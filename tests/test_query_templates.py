@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from query_templates import TemplateLibrary
+from tests.conftest import STANDARD_TABLE
+
+
+@pytest.fixture
+def library(stats_con, name_index):
+    library = TemplateLibrary({f"main.{STANDARD_TABLE}": {}})
+    library.load_teams(stats_con)
+
+    def resolve(text):
+        found = name_index.lookup(text)
+        return found[:2] if found else None
+
+    library.resolver = resolve
+    return library
+
+
+def test_compare_resolves_both_players(library, stats_con):
+    matched = library.match("Compare Saka vs Salah goals")
+    assert matched[0] == "compare_players"
+    assert matched[2] == ["Bukayo Saka", "Mohamed Salah"]
+    rows = json.loads(library.run(stats_con, matched))
+    assert {row["name"] for row in rows} == {"Bukayo Saka", "Mohamed Salah"}
+
+
+@pytest.mark.parametrize("question", [
+    "Compare Saka vs Palmer",
+    "Compare Salah and Palmer",
+    "how many goals did james score",
+    "gabriel 2024-25 season",
+])
+def test_shared_name_falls_back_to_llm(library, question):
+    assert library.match(question) is None
+
+
+def test_how_many_for_team_sums_the_squad(library, stats_con):
+    matched = library.match("how many goals did arsenal score")
+    assert matched[0] == "team_total"
+    rows = json.loads(library.run(stats_con, matched))
+    assert rows[0]["goals"] == 20
+
+
+def test_top_n(library, stats_con):
+    matched = library.match("top 3 goals")
+    assert matched[0] == "top_n"
+    rows = json.loads(library.run(stats_con, matched))
+    assert [row["name"] for row in rows] == ["Mohamed Salah", "Erling Haaland", "Chris Wood"]
+
+
+def test_unrelated_question_has_no_template(library):
+    assert library.match("who is the best young winger to sign this summer?") is None
+
+
+def test_full_name_picks_one_of_the_shared_first_names(library):
+    matched = library.match("gabriel jesus 2024-25 season")
+    assert matched[0] == "season_line"
+    assert matched[2] == ["Gabriel Jesus"]
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+import pytest
+
+from snapshots import SNAPSHOT_SCHEMA, ingest_version, record_snapshot
+
+TABLE = "standard_Premier_League_2024_2025"
+WEEK_1 = datetime(2024, 8, 20)
+WEEK_2 = datetime(2024, 8, 27)
+WEEK_3 = datetime(2024, 9, 3)
+
+
+def frame(*rows):
+    return pd.DataFrame(rows, columns=["name", "team", "nation", "year_born", "goals"])
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    yield con
+    con.close()
+
+
+def as_of(con, ts):
+    rows = con.execute(f'SELECT name, team, goals FROM main."{TABLE}_as_of"(?) ORDER BY name, team', [ts]).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def test_as_of_returns_each_refresh(con):
+    record_snapshot(con, TABLE, frame(("Cole Palmer", "Chelsea", "ENG", 2002, 1),
+                                      ("Bukayo Saka", "Arsenal", "ENG", 2001, 0)), WEEK_1)
+    record_snapshot(con, TABLE, frame(("Cole Palmer", "Chelsea", "ENG", 2002, 3),
+                                      ("Bukayo Saka", "Arsenal", "ENG", 2001, 0)), WEEK_2)
+
+    assert as_of(con, WEEK_1) == [("Bukayo Saka", "Arsenal", 0), ("Cole Palmer", "Chelsea", 1)]
+    assert as_of(con, WEEK_2) == [("Bukayo Saka", "Arsenal", 0), ("Cole Palmer", "Chelsea", 3)]
+    # between refreshes the older state still holds
+    assert as_of(con, datetime(2024, 8, 25)) == as_of(con, WEEK_1)
+    # only the changed row is stored again
+    assert con.execute(f'SELECT count(*) FROM {SNAPSHOT_SCHEMA}."{TABLE}"').fetchone()[0] == 3
+
+
+def test_unchanged_refresh_adds_no_version(con):
+    players = frame(("Cole Palmer", "Chelsea", "ENG", 2002, 1))
+    assert record_snapshot(con, TABLE, players, WEEK_1)[0] == 1
+    version = ingest_version(con)
+    assert record_snapshot(con, TABLE, players, WEEK_2) == (None, 0, 0)
+    assert ingest_version(con) == version
+
+
+def test_vanished_rows_get_a_tombstone(con):
+    record_snapshot(con, TABLE, frame(("Cole Palmer", "Chelsea", "ENG", 2002, 1),
+                                      ("Joao Felix", "Chelsea", "POR", 1999, 0)), WEEK_1)
+    # loaned out: gone from the table from week 2, back in week 3
+    assert record_snapshot(con, TABLE, frame(("Cole Palmer", "Chelsea", "ENG", 2002, 1)), WEEK_2) == (2, 0, 1)
+    record_snapshot(con, TABLE, frame(("Cole Palmer", "Chelsea", "ENG", 2002, 1),
+                                      ("Joao Felix", "Chelsea", "POR", 1999, 0)), WEEK_3)
+
+    assert [name for name, _, _ in as_of(con, WEEK_1)] == ["Cole Palmer", "Joao Felix"]
+    assert [name for name, _, _ in as_of(con, WEEK_2)] == ["Cole Palmer"]
+    assert [name for name, _, _ in as_of(con, WEEK_3)] == ["Cole Palmer", "Joao Felix"]
+    assert con.execute(f'SELECT count(*) FROM main."{TABLE}"').fetchone()[0] == 2
+
+    history = con.execute(f"""
+        SELECT snapshot_at, removed FROM main."{TABLE}_history" WHERE name = 'Joao Felix' ORDER BY snapshot_at
+    """).fetchall()
+    assert history == [(WEEK_1, False), (WEEK_2, True), (WEEK_3, False)]
+
+
+def test_transfer_keeps_one_row_per_team(con):
+    record_snapshot(con, TABLE, frame(("Jadon Sancho", "Manchester Utd", "ENG", 2000, 0)), WEEK_1)
+    record_snapshot(con, TABLE, frame(("Jadon Sancho", "Manchester Utd", "ENG", 2000, 0),
+                                      ("Jadon Sancho", "Chelsea", "ENG", 2000, 1)), WEEK_2)
+    assert as_of(con, WEEK_2) == [("Jadon Sancho", "Chelsea", 1), ("Jadon Sancho", "Manchester Utd", 0)]
+
+
+def test_shadow_catalog_binds_as_of_queries(con):
+    from sql_validation import ShadowCatalog
+
+    record_snapshot(con, TABLE, frame(("Cole Palmer", "Chelsea", "ENG", 2002, 1)), WEEK_1)
+    schema = {}
+    for table in (TABLE, f"{TABLE}_history"):
+        rows = con.execute(f'DESCRIBE main."{table}"').fetchall()
+        schema[f"main.{table}"] = {row[0]: row[1] for row in rows}
+    catalog = ShadowCatalog(schema)
+
+    sql = f"""SELECT name, goals FROM main."{TABLE}_as_of"(TIMESTAMP '2024-08-21') ORDER BY goals DESC"""
+    assert catalog.validate(sql) is None
+    assert con.execute(sql).fetchall() == [("Cole Palmer", 1)]
+    assert "not found" in catalog.validate(f"""SELECT assists FROM main."{TABLE}_as_of"(TIMESTAMP '2024-08-21')""")